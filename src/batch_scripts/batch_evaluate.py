@@ -3,11 +3,14 @@ import json
 import pandas as pd
 from pathlib import Path
 from dialog_evaluator import DialogEvaluator
+from manifest import get_manifest, fingerprint
+from results_store import get_default_store
 
 # === Base paths ===
 BASE = Path.cwd()
 EXPERIMENTS_DIR = BASE / "experiments"
 PROMPT_EVAL = BASE / "prompts" / "prompt_evaluate_strict.txt"
+STRUCTURED_OUTPUT = False  # True: puntuaciones restringidas y validadas contra SCORES_SCHEMA
 
 # === Model folders and fixed model names ===
 MODELS = {
@@ -17,6 +20,10 @@ MODELS = {
 
 print(f" Model folders found: {list(MODELS.keys())}")
 
+store = get_default_store()
+store.refresh()
+
+evaluator = None  # sigue en None si no existe ninguna carpeta de modelo
 for folder_name, model_name in MODELS.items():
     model_path = EXPERIMENTS_DIR / folder_name
     if not model_path.exists():
@@ -25,40 +32,43 @@ for folder_name, model_name in MODELS.items():
 
     print(f"\n Evaluating model: {model_name}")
 
-    evaluator = DialogEvaluator(model_name=model_name, backend="groq")
-
-    for category_dir in sorted(model_path.glob("*")):  # tone, rol, subplot
-        if not category_dir.is_dir():
-            continue
-        print(f"📁 Category: {category_dir.name}")
-
-        for variant_dir in sorted(category_dir.glob("*")):  # tone_humor, rol_friends...
-            if not variant_dir.is_dir():
-                continue
-
-            print(f"\n Evaluating variant: {variant_dir.relative_to(BASE)}")
-
-            # Crear subcarpetas si no existen
-            for subfolder in ["generated_dialogs", "specifications", "evaluated_dialogs", "specifications_failed"]:
-                os.makedirs(variant_dir / subfolder, exist_ok=True)
-
-            gen_dir = variant_dir / "generated_dialogs"
-            spec_dir = variant_dir / "specifications"
-            eval_dir = variant_dir / "evaluated_dialogs"
-
-            print(f" Checking generated dialogs in: {gen_dir}")
-            dialog_files = list(gen_dir.glob("dialog_*_gen.txt"))
-            print(f" Dialog files found: {len(dialog_files)}")
-
-            rows = []
-
-            for gen_file in dialog_files:
-                dialog_id = gen_file.stem.replace("_gen", "")
-                try:
-                    generated_dialog = gen_file.read_text().strip()
-                    spec_path = spec_dir / f"{dialog_id}_spec.json"
-                    spec_json = json.loads(spec_path.read_text()) if spec_path.exists() else {}
-
+    evaluator = DialogEvaluator(model_name=model_name, backend="groq", structured_output=STRUCTURED_OUTPUT)
+
+    # Variantes con diálogos generados, desde el catálogo (sin recorrer carpetas)
+    for _, category, variant in store.variants("dialog", model=folder_name, folder="generated_dialogs"):
+        if variant is None:
+            continue  # validation/ no tiene variantes
+        variant_dir = model_path / category / variant  # tone/tone_humor, rol/rol_friends...
+        print(f"\n Evaluating variant: {variant_dir.relative_to(BASE)}")
+
+        # Crear subcarpetas si no existen
+        for subfolder in ["generated_dialogs", "specifications", "evaluated_dialogs", "specifications_failed"]:
+            os.makedirs(variant_dir / subfolder, exist_ok=True)
+
+        spec_dir = variant_dir / "specifications"
+        eval_dir = variant_dir / "evaluated_dialogs"
+
+        dialog_files = store.find("dialog", model=folder_name, axis=category, variant=variant, folder="generated_dialogs")
+        print(f" Dialog files found: {len(dialog_files)}")
+
+        rows = []
+        skipped = 0
+        manifest = get_manifest(variant_dir)
+
+        for gen_file in dialog_files:
+            dialog_id = gen_file.stem.replace("_gen", "")
+            try:
+                generated_dialog = gen_file.read_text().strip()
+                spec_path = spec_dir / f"{dialog_id}_spec.json"
+                spec_json = json.loads(spec_path.read_text()) if spec_path.exists() else {}
+                eval_json_path = eval_dir / f"{dialog_id}_eval.json"
+
+                # Solo se reevalúa si cambió el diálogo, la spec, el prompt o el modelo
+                inputs = fingerprint(model=model_name, dialog=gen_file, spec=spec_path, prompt=PROMPT_EVAL)
+                if manifest.is_fresh(eval_json_path, inputs):
+                    eval_result = json.loads(eval_json_path.read_text())
+                    skipped += 1
+                else:
                     eval_result = evaluator.evaluate(
                         generated_dialog=generated_dialog,
                         specification=spec_json,
@@ -66,34 +76,39 @@ for folder_name, model_name in MODELS.items():
                         prompt_path=PROMPT_EVAL
                     )
 
-                    eval_json_path = eval_dir / f"{dialog_id}_eval.json"
                     with open(eval_json_path, "w", encoding="utf-8") as f:
                         json.dump(eval_result, f, indent=2)
-
-                    row = {
-                        "ID": dialog_id,
-                        "Generated Dialog": generated_dialog,
-                        "Specification": json.dumps(spec_json, indent=2),
-                        "Fluency (auto)": eval_result.get("fluency", ""),
-                        "Coherence (auto)": eval_result.get("coherence", ""),
-                        "Realism (auto)": eval_result.get("realism", ""),
-                        "Fidelity (auto)": eval_result.get("fidelity_to_specification", ""),
-                        "Engagement (auto)": eval_result.get("engagement", ""),
-                        "Originality (auto)": eval_result.get("originality", ""),
-                        "Comments": eval_result.get("comments", "") 
-                    }
-                    rows.append(row)
-
-                except Exception as e:
-                    print(f"❌ Error evaluating {dialog_id}: {e}")
-
-            if rows:
-                df = pd.DataFrame(rows)
-                out_xlsx = eval_dir / f"evaluation_full_{folder_name}_{variant_dir.name}.xlsx"
-
-                df.to_excel(out_xlsx, index=False)
-                print(f"✅ Saved Excel to: {out_xlsx}")
-            else:
-                print("⚠️ No dialogs evaluated in this variant.")
+                    manifest.record(eval_json_path, inputs, stage="evaluate")
+
+                row = {
+                    "ID": dialog_id,
+                    "Generated Dialog": generated_dialog,
+                    "Specification": json.dumps(spec_json, indent=2),
+                    "Fluency (auto)": eval_result.get("fluency", ""),
+                    "Coherence (auto)": eval_result.get("coherence", ""),
+                    "Realism (auto)": eval_result.get("realism", ""),
+                    "Fidelity (auto)": eval_result.get("fidelity_to_specification", ""),
+                    "Engagement (auto)": eval_result.get("engagement", ""),
+                    "Originality (auto)": eval_result.get("originality", ""),
+                    "Comments": eval_result.get("comments", "") 
+                }
+                rows.append(row)
+
+            except Exception as e:
+                print(f"❌ Error evaluating {dialog_id}: {e}")
+
+        print(f" Up to date (not re-evaluated): {skipped}")
+
+        if rows:
+            df = pd.DataFrame(rows)
+            out_xlsx = eval_dir / f"evaluation_full_{folder_name}_{variant_dir.name}.xlsx"
+
+            df.to_excel(out_xlsx, index=False)
+            print(f"✅ Saved Excel to: {out_xlsx}")
+        else:
+            print("⚠️ No dialogs evaluated in this variant.")
+
+if evaluator and evaluator.cache:
+    print(f" Cache: {evaluator.cache.stats()}")
 
 print(f"\n Evaluación finalizada.")
@@ -1,7 +1,11 @@
 import os
 import json
 import time
-from dialog_generator import DialogGenerator
+import asyncio
+from pathlib import Path
+from dialog_generator import DialogGenerator, RECOVERY_TIERS
+from rate_limiter import is_rate_limit_error, extract_wait_time
+from manifest import get_manifest, fingerprint
 
 # Model identifiers and base folder names
 MODELS = {
@@ -34,55 +38,106 @@ EXPERIMENTS = [
 REAL_DIALOG_DIR = "data/real_dialogs"
 real_dialogs = sorted(f for f in os.listdir(REAL_DIALOG_DIR) if f.endswith(".txt"))
 
+# Modo asíncrono: todas las combinaciones modelo × variante × diálogo a la vez,
+# con concurrencia acotada y un token bucket por modelo (ver rate_limiter.py)
+ASYNC_MODE = True
+MAX_CONCURRENCY = 8
+MAX_DIALOGS = 15
+# Salida estructurada: la spec se restringe al esquema JSON (response_format en Groq,
+# gramática GBNF en local) y se valida antes de guardarla
+STRUCTURED_OUTPUT = False
+
 def ensure_dirs(path):
-    for sub in ["specifications", "evaluated_dialogs", "specifications_failed"]:
+    for sub in ["specifications", "generated_dialogs", "evaluated_dialogs", "specifications_failed"]:
         os.makedirs(os.path.join(path, sub), exist_ok=True)
 
-def is_rate_limit_error(e):
-    try:
-        err = json.loads(str(e).replace("'", '"'))
-        return err.get("error", {}).get("code") == "rate_limit_exceeded"
-    except:
-        return False
-
-def extract_wait_time(e):
-    try:
-        err = json.loads(str(e).replace("'", '"'))
-        msg = err["error"]["message"]
-        for part in msg.split():
-            if part.endswith("s") and "m" in part:
-                mins, secs = part.replace("s", "").split("m")
-                return int(mins) * 60 + float(secs)
-        return 90
-    except:
-        return 90
-
-for model_name, base_id in MODELS.items():
-    for exp in EXPERIMENTS:
-        for variant in exp["variants"]:
-            base_dir = os.path.join(base_id, exp["name"], variant)
-            ensure_dirs(base_dir)
-
-            prompt_dialog_path = os.path.join(exp["prompt_dir"], f"prompt_generate_dialog_{variant}.txt")
-            prompt_spec_path = os.path.join(
-                exp["prompt_dir"],
-                f"prompt_generate_specification_{variant}.txt" if exp.get("spec_prompt_per_variant") else exp["spec_prompt"]
-            )
-
-            generator = DialogGenerator(model_name=model_name, backend="groq")
-
-            for idx, filename in enumerate(real_dialogs, start=1):
-                if idx > 15:
-                    break
-
-                dialog_id = f"dialog_{idx:03d}"
-
-                while True:
-                    try:
-                        with open(os.path.join(REAL_DIALOG_DIR, filename), "r") as f:
-                            real_dialog = f.read()
-
-                        spec, raw_output = generator.generate_specification(
+def iter_variants():
+    for model_name, base_id in MODELS.items():
+        for exp in EXPERIMENTS:
+            for variant in exp["variants"]:
+                base_dir = os.path.join(base_id, exp["name"], variant)
+                ensure_dirs(base_dir)
+
+                prompt_dialog_path = os.path.join(exp["prompt_dir"], f"prompt_generate_dialog_{variant}.txt")
+                prompt_spec_path = os.path.join(
+                    exp["prompt_dir"],
+                    f"prompt_generate_specification_{variant}.txt" if exp.get("spec_prompt_per_variant") else exp["spec_prompt"]
+                )
+                yield model_name, exp, variant, base_dir, prompt_spec_path, prompt_dialog_path
+
+def iter_real_dialogs():
+    for idx, filename in enumerate(real_dialogs, start=1):
+        if idx > MAX_DIALOGS:
+            break
+        with open(os.path.join(REAL_DIALOG_DIR, filename), "r") as f:
+            yield f"dialog_{idx:03d}", f.read()
+
+def spec_path(base_dir, dialog_id):
+    return os.path.join(base_dir, "specifications", f"{dialog_id}_spec.json")
+
+def dialog_path(base_dir, dialog_id):
+    return os.path.join(base_dir, "generated_dialogs", f"{dialog_id}_gen.txt")
+
+# Huellas de entrada de cada artefacto (ver manifest.py): si no cambian, no se recalcula
+def spec_inputs(model_name, real_dialog, prompt_spec_path):
+    return fingerprint(model=model_name, real_dialog=real_dialog, prompt=Path(prompt_spec_path))
+
+def dialog_inputs(model_name, spec, prompt_dialog_path):
+    return fingerprint(model=model_name, spec=spec, prompt=Path(prompt_dialog_path))
+
+def load_fresh_spec(base_dir, dialog_id, inputs):
+    path = spec_path(base_dir, dialog_id)
+    if get_manifest(base_dir).is_fresh(path, inputs):
+        with open(path, "r") as f:
+            return json.load(f)
+    return None
+
+def save_spec(base_dir, dialog_id, spec, inputs, stage="generate"):
+    # stage: nivel de recuperación que produjo la spec (direct, local_repair, format_fix, regenerate)
+    path = spec_path(base_dir, dialog_id)
+    with open(path, "w") as f:
+        json.dump(spec, f, indent=2)
+    get_manifest(base_dir).record(path, inputs, stage=stage)
+
+def save_dialog(base_dir, dialog_id, dialog, inputs):
+    path = dialog_path(base_dir, dialog_id)
+    with open(path, "w") as f:
+        f.write(dialog.strip())
+    get_manifest(base_dir).record(path, inputs, stage="generate")
+
+def save_failed(base_dir, dialog_id, raw_output, inputs):
+    fail_dir = os.path.join(base_dir, "specifications_failed")
+    os.makedirs(fail_dir, exist_ok=True)
+    fail_path = os.path.join(fail_dir, f"{dialog_id}_spec.txt")
+    if raw_output:
+        try:
+            with open(fail_path, "w", encoding="utf-8") as f:
+                f.write(raw_output.strip())
+            # repair_failed_specs.py hereda esta huella al reparar la spec
+            get_manifest(base_dir).record(fail_path, inputs, stage="failed")
+            print(f"📁 Raw output saved to: {fail_path}")
+        except Exception:
+            print("⚠️ Could not save failed output.")
+
+def print_recovery_stats(generators):
+    for generator in generators:
+        stats = generator.recovery_stats
+        print(f"🩹 Spec recovery ({generator.model_name}): " +
+              " | ".join(f"{tier} {stats[tier]}" for tier in RECOVERY_TIERS) +
+              f" | ~{stats['tokens_saved']} tokens saved vs. regenerating")
+
+def run_sequential():
+    for model_name, exp, variant, base_dir, prompt_spec_path, prompt_dialog_path in iter_variants():
+        generator = DialogGenerator(model_name=model_name, backend="groq", structured_output=STRUCTURED_OUTPUT)
+
+        for dialog_id, real_dialog in iter_real_dialogs():
+            raw_output = None
+            s_inputs = spec_inputs(model_name, real_dialog, prompt_spec_path)
+            while True:
+                try:
+                    spec = load_fresh_spec(base_dir, dialog_id, s_inputs)
+                    if spec is None:
+                        spec, raw_output, tier = generator.generate_specification_with_recovery(
                             real_dialog,
                             prompt_path=prompt_spec_path,
                             base_dir=base_dir,
@@ -90,37 +145,82 @@ for model_name, base_id in MODELS.items():
                         )
 
                         if spec is None:
-                            raise ValueError("❌ Spec generation failed due to JSON parsing error.")
-
-                        spec_path = os.path.join(base_dir, "specifications", f"{dialog_id}_spec.json")
-                        with open(spec_path, "w") as f:
-                            json.dump(spec, f, indent=2)
-
-                        dialog = generator.generate_dialog(spec, prompt_path=prompt_dialog_path)
-                        dialog_path = os.path.join(base_dir, "generated_dialogs", f"{dialog_id}_gen.txt")
-                        with open(dialog_path, "w") as f:
-                            f.write(dialog.strip())
-
-                        print(f"✅ {dialog_id}_gen.txt generated for {model_name} | {exp['name']} | {variant}")
-                        break  # ✅ Éxito → salimos del while
-
-                    except Exception as e:
-                        if is_rate_limit_error(e):
-                            wait_time = extract_wait_time(e)
-                            print(f"⏳ Rate limit hit. Waiting {wait_time:.1f} seconds before retry...")
-                            time.sleep(wait_time + 2)
-                            continue  # 🔁 Volvemos a intentar después de esperar
-
-                        else:
-                            print(f"❌ Failed to generate {dialog_id} ({variant}): {e}")
-                            fail_dir = os.path.join(base_dir, "specifications_failed")
-                            os.makedirs(fail_dir, exist_ok=True)
-                            fail_path = os.path.join(fail_dir, f"{dialog_id}_spec.txt")
-                            if 'raw_output' in locals() and raw_output:
-                                try:
-                                    with open(fail_path, "w", encoding="utf-8") as f:
-                                        f.write(raw_output.strip())
-                                    print(f"📁 Raw output saved to: {fail_path}")
-                                except Exception:
-                                    print("⚠️ Could not save failed output.")
-                            break  # ❌ Otro tipo de error → salimos del while
+                            raise ValueError("❌ Spec generation failed after format-fix and regeneration.")
+
+                        save_spec(base_dir, dialog_id, spec, s_inputs, stage=tier)
+
+                    d_inputs = dialog_inputs(model_name, spec, prompt_dialog_path)
+                    if get_manifest(base_dir).is_fresh(dialog_path(base_dir, dialog_id), d_inputs):
+                        print(f"⏭️ {dialog_id}_gen.txt up to date for {model_name} | {exp['name']} | {variant}")
+                        break
+
+                    dialog = generator.generate_dialog(spec, prompt_path=prompt_dialog_path)
+                    save_dialog(base_dir, dialog_id, dialog, d_inputs)
+
+                    print(f"✅ {dialog_id}_gen.txt generated for {model_name} | {exp['name']} | {variant}")
+                    break  # ✅ Éxito → salimos del while
+
+                except Exception as e:
+                    if is_rate_limit_error(e):
+                        wait_time = extract_wait_time(e)
+                        print(f"⏳ Rate limit hit. Waiting {wait_time:.1f} seconds before retry...")
+                        time.sleep(wait_time + 2)
+                        continue  # 🔁 Volvemos a intentar después de esperar
+
+                    else:
+                        print(f"❌ Failed to generate {dialog_id} ({variant}): {e}")
+                        save_failed(base_dir, dialog_id, raw_output, s_inputs)
+                        break  # ❌ Otro tipo de error → salimos del while
+
+        print_recovery_stats([generator])
+
+async def generate_one_async(generator, exp, variant, base_dir, prompt_spec_path, prompt_dialog_path, dialog_id, real_dialog):
+    raw_output = None
+    s_inputs = spec_inputs(generator.model_name, real_dialog, prompt_spec_path)
+    try:
+        spec = load_fresh_spec(base_dir, dialog_id, s_inputs)
+        if spec is None:
+            spec, raw_output, tier = await generator.agenerate_specification_with_recovery(
+                real_dialog,
+                prompt_path=prompt_spec_path,
+                base_dir=base_dir,
+                dialog_id=dialog_id
+            )
+            if spec is None:
+                raise ValueError("❌ Spec generation failed after format-fix and regeneration.")
+            save_spec(base_dir, dialog_id, spec, s_inputs, stage=tier)
+
+        d_inputs = dialog_inputs(generator.model_name, spec, prompt_dialog_path)
+        if get_manifest(base_dir).is_fresh(dialog_path(base_dir, dialog_id), d_inputs):
+            return
+
+        dialog = await generator.agenerate_dialog(spec, prompt_path=prompt_dialog_path)
+        save_dialog(base_dir, dialog_id, dialog, d_inputs)
+        print(f"✅ {dialog_id}_gen.txt generated for {generator.model_name} | {exp['name']} | {variant}")
+    except Exception as e:
+        print(f"❌ Failed to generate {dialog_id} ({variant}): {e}")
+        save_failed(base_dir, dialog_id, raw_output, s_inputs)
+
+async def run_async():
+    # Un generador por modelo: comparte conexiones, semáforo y limitador
+    generators = {
+        model_name: DialogGenerator(model_name=model_name, backend="groq", max_concurrency=MAX_CONCURRENCY,
+                                    structured_output=STRUCTURED_OUTPUT)
+        for model_name in MODELS
+    }
+    dialogs = list(iter_real_dialogs())
+    tasks = []
+    for model_name, exp, variant, base_dir, prompt_spec_path, prompt_dialog_path in iter_variants():
+        for dialog_id, real_dialog in dialogs:
+            tasks.append(generate_one_async(
+                generators[model_name], exp, variant, base_dir,
+                prompt_spec_path, prompt_dialog_path, dialog_id, real_dialog
+            ))
+    await asyncio.gather(*tasks)
+    print_recovery_stats(generators.values())
+
+if __name__ == "__main__":
+    if ASYNC_MODE:
+        asyncio.run(run_async())
+    else:
+        run_sequential()
@@ -0,0 +1,45 @@
+import sys
+import argparse
+from pathlib import Path
+from work_queue import DEFAULT_QUEUE_PATH
+from experiment_matrix import MatrixExecutor, run_configs, run_queue, CONFORMANCE_MODES
+
+# Lanza uno o varios experimentos declarados en configs/experiments como un único
+# lote: los trabajos se expanden, se eliminan duplicados entre experimentos y se
+# ejecutan con un límite global de concurrencia y el limitador de Groq por modelo.
+CONFIG_DIR = Path("configs") / "experiments"
+BACKEND = "groq"
+MAX_CONCURRENCY = 8
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run declarative experiment matrices")
+    parser.add_argument("configs", nargs="*", help="Config files (default: every file in configs/experiments)")
+    parser.add_argument("--backend", default=BACKEND)
+    parser.add_argument("--max-concurrency", type=int, default=MAX_CONCURRENCY)
+    parser.add_argument("--dry-run", action="store_true", help="Only expand and count the jobs")
+    parser.add_argument("--structured", action="store_true", help="Schema-constrained, validated evaluation scores")
+    parser.add_argument("--queue", nargs="?", const=DEFAULT_QUEUE_PATH, default=None,
+                        help="Track jobs in a crash-safe SQLite queue (resumable, several workers)")
+    parser.add_argument("--worker", action="store_true", help="Only consume jobs already in --queue")
+    parser.add_argument("--adaptive", action="store_true",
+                        help="Sample repetitions in rounds and stop each cell once its score interval is tight")
+    parser.add_argument("--conformance", choices=CONFORMANCE_MODES,
+                        help="Structural check before the judge (overrides the configs; default: report)")
+    args = parser.parse_args(argv)
+
+    if args.worker:
+        executor = MatrixExecutor(backend=args.backend, max_concurrency=args.max_concurrency,
+                                  structured_output=args.structured)
+        run_queue(executor, args.queue or DEFAULT_QUEUE_PATH)
+        print(f"📊 {executor.stats}")
+        return
+
+    configs = args.configs or sorted(str(p) for p in CONFIG_DIR.glob("*.json"))
+    run_configs(configs, backend=args.backend, max_concurrency=args.max_concurrency, dry_run=args.dry_run,
+                queue_path=args.queue, adaptive=args.adaptive, conformance=args.conformance,
+                structured_output=args.structured)
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
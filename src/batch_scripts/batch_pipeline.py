@@ -0,0 +1,198 @@
+import json
+import asyncio
+import pandas as pd
+from pathlib import Path
+from dialog_generator import DialogGenerator
+from dialog_evaluator import DialogEvaluator
+from manifest import get_manifest, fingerprint
+from conformance import check_dialog, summary, reason
+from batch_generate import (
+    MODELS, iter_variants, iter_real_dialogs, spec_path, dialog_path,
+    spec_inputs, dialog_inputs, load_fresh_spec, save_spec, save_dialog, save_failed, print_recovery_stats
+)
+
+# Pipeline por elementos: cada diálogo real fluye spec → reparación → diálogo →
+# evaluación → fila de resultados a través de colas acotadas, con todas las etapas
+# en marcha a la vez. La latencia total pasa a ser max(etapa) en lugar de la suma,
+# y los primeros resultados aparecen en segundos.
+QUEUE_SIZE = 32
+WORKERS = {"spec": 8, "dialog": 8, "evaluate": 8}
+MAX_CONCURRENCY = 8
+STRUCTURED_OUTPUT = False  # True: spec y puntuaciones restringidas al esquema JSON (ver schemas.py)
+EVAL_PROMPT = Path("prompts") / "prompt_evaluate_strict.txt"
+# Comprobación estructural antes del juez: "report" | "reject" | "regenerate" (ver experiment_matrix.py)
+CONFORMANCE = "report"
+MAX_REGENERATIONS = 1
+RESULTS_PATH = Path("experiments") / "pipeline_results.jsonl"
+
+
+async def spec_stage(item, generator):
+    s_inputs = spec_inputs(generator.model_name, item["real_dialog"], item["prompt_spec_path"])
+    spec = load_fresh_spec(item["base_dir"], item["dialog_id"], s_inputs)
+    if spec is not None:
+        return spec
+
+    # Reparación local → format-fix con el modelo barato → regeneración, sin esperar a otra pasada
+    spec, raw_output, tier = await generator.agenerate_specification_with_recovery(
+        item["real_dialog"],
+        prompt_path=item["prompt_spec_path"],
+        base_dir=item["base_dir"],
+        dialog_id=item["dialog_id"]
+    )
+    if spec is not None:
+        save_spec(item["base_dir"], item["dialog_id"], spec, s_inputs, stage=tier)
+        return spec
+
+    save_failed(item["base_dir"], item["dialog_id"], raw_output, s_inputs)
+    return None
+
+
+async def dialog_stage(item, generator):
+    d_inputs = dialog_inputs(generator.model_name, item["spec"], item["prompt_dialog_path"])
+    path = dialog_path(item["base_dir"], item["dialog_id"])
+    if get_manifest(item["base_dir"]).is_fresh(path, d_inputs):
+        with open(path, "r") as f:
+            return f.read()
+    dialog = await generator.agenerate_dialog(item["spec"], prompt_path=item["prompt_dialog_path"])
+    for attempt in range(1, MAX_REGENERATIONS + 1 if CONFORMANCE == "regenerate" else 1):
+        report = check_dialog(dialog, item["spec"])
+        if report["ok"]:
+            break
+        print(f"🔁 {item['dialog_id']} ({item['variant']}, {item['model_name']}): {reason(report)} → regenerating")
+        dialog = await generator.aregenerate_dialog(item["spec"], prompt_path=item["prompt_dialog_path"], attempt=attempt)
+    save_dialog(item["base_dir"], item["dialog_id"], dialog, d_inputs)
+    return dialog.strip()
+
+
+async def evaluate_stage(item, evaluator):
+    base_dir = Path(item["base_dir"])
+    eval_json_path = base_dir / "evaluated_dialogs" / f"{item['dialog_id']}_eval.json"
+    inputs = fingerprint(
+        model=evaluator.model_name,
+        dialog=Path(dialog_path(item["base_dir"], item["dialog_id"])),
+        spec=Path(spec_path(item["base_dir"], item["dialog_id"])),
+        prompt=EVAL_PROMPT
+    )
+    structure = summary(check_dialog(item["dialog"], item["spec"]))
+    if CONFORMANCE in ("reject", "regenerate") and not structure["ok"]:
+        print(f"🚫 {item['dialog_id']} ({item['variant']}, {item['model_name']}): {reason(structure)} → not sent to the judge")
+        return None
+    manifest = get_manifest(base_dir)
+    if manifest.is_fresh(eval_json_path, inputs):
+        return json.loads(eval_json_path.read_text())
+
+    eval_result = await evaluator.aevaluate(
+        generated_dialog=item["dialog"],
+        specification=item["spec"],
+        reference_dialog="",
+        prompt_path=EVAL_PROMPT
+    )
+    eval_result["structure"] = structure
+    with open(eval_json_path, "w", encoding="utf-8") as f:
+        json.dump(eval_result, f, indent=2)
+    manifest.record(eval_json_path, inputs, stage="evaluate")
+    return eval_result
+
+
+def result_row(item):
+    eval_result = item["eval"]
+    return {
+        "ID": item["dialog_id"],
+        "Model": item["model_name"],
+        "Category": item["exp"]["name"],
+        "Variant": item["variant"],
+        "Generated Dialog": item["dialog"],
+        "Specification": json.dumps(item["spec"], indent=2),
+        "Fluency (auto)": eval_result.get("fluency", ""),
+        "Coherence (auto)": eval_result.get("coherence", ""),
+        "Realism (auto)": eval_result.get("realism", ""),
+        "Fidelity (auto)": eval_result.get("fidelity_to_specification", ""),
+        "Engagement (auto)": eval_result.get("engagement", ""),
+        "Originality (auto)": eval_result.get("originality", ""),
+        "Comments": eval_result.get("comments", ""),
+        "Structural score": eval_result.get("structure", {}).get("structural_score", ""),
+        "Structural issues": ", ".join(eval_result.get("structure", {}).get("issues", []))
+    }
+
+
+async def worker(name, stage, key, clients, in_q, out_q):
+    while True:
+        item = await in_q.get()
+        try:
+            result = await stage(item, clients[item["model_name"]])
+            if result is not None:
+                item[key] = result
+                await out_q.put(item)
+        except Exception as e:
+            print(f"❌ [{name}] {item['dialog_id']} ({item['variant']}, {item['model_name']}): {e}")
+        finally:
+            in_q.task_done()
+
+
+async def writer(results_q, rows_by_variant):
+    RESULTS_PATH.parent.mkdir(parents=True, exist_ok=True)
+    with open(RESULTS_PATH, "a", encoding="utf-8") as out:
+        while True:
+            item = await results_q.get()
+            try:
+                row = result_row(item)
+                out.write(json.dumps(row, ensure_ascii=False) + "\n")
+                out.flush()
+                rows_by_variant.setdefault(item["base_dir"], []).append(row)
+                print(f"✅ {item['dialog_id']} | {item['model_name']} | {item['variant']} → evaluated")
+            except Exception as e:
+                # Un fallo aquí no puede parar al único escritor: los evaluadores se
+                # quedarían bloqueados en la cola llena y el join no terminaría nunca
+                print(f"❌ [writer] {item.get('dialog_id')} ({item.get('variant')}, {item.get('model_name')}): {e}")
+            finally:
+                results_q.task_done()
+
+
+async def run_pipeline():
+    clients = {"backend": "groq", "max_concurrency": MAX_CONCURRENCY, "structured_output": STRUCTURED_OUTPUT}
+    generators = {m: DialogGenerator(model_name=m, **clients) for m in MODELS}
+    evaluators = {m: DialogEvaluator(model_name=m, **clients) for m in MODELS}
+
+    spec_q = asyncio.Queue(QUEUE_SIZE)
+    dialog_q = asyncio.Queue(QUEUE_SIZE)
+    eval_q = asyncio.Queue(QUEUE_SIZE)
+    results_q = asyncio.Queue(QUEUE_SIZE)
+    rows_by_variant = {}
+
+    tasks = []
+    tasks += [asyncio.create_task(worker("spec", spec_stage, "spec", generators, spec_q, dialog_q)) for _ in range(WORKERS["spec"])]
+    tasks += [asyncio.create_task(worker("dialog", dialog_stage, "dialog", generators, dialog_q, eval_q)) for _ in range(WORKERS["dialog"])]
+    tasks += [asyncio.create_task(worker("evaluate", evaluate_stage, "eval", evaluators, eval_q, results_q)) for _ in range(WORKERS["evaluate"])]
+    tasks.append(asyncio.create_task(writer(results_q, rows_by_variant)))
+
+    dialogs = list(iter_real_dialogs())
+    for model_name, exp, variant, base_dir, prompt_spec_path, prompt_dialog_path in iter_variants():
+        for dialog_id, real_dialog in dialogs:
+            await spec_q.put({
+                "model_name": model_name,
+                "exp": exp,
+                "variant": variant,
+                "base_dir": base_dir,
+                "prompt_spec_path": prompt_spec_path,
+                "prompt_dialog_path": prompt_dialog_path,
+                "dialog_id": dialog_id,
+                "real_dialog": real_dialog
+            })
+
+    # Cada etapa pasa el elemento a la siguiente antes de marcarlo como hecho,
+    # así que basta con vaciar las colas en orden
+    for q in (spec_q, dialog_q, eval_q, results_q):
+        await q.join()
+    for task in tasks:
+        task.cancel()
+
+    for base_dir, rows in rows_by_variant.items():
+        model_folder = Path(base_dir).parts[1]
+        out_xlsx = Path(base_dir) / "evaluated_dialogs" / f"evaluation_full_{model_folder}_{Path(base_dir).name}.xlsx"
+        pd.DataFrame(sorted(rows, key=lambda r: r["ID"])).to_excel(out_xlsx, index=False)
+        print(f"✅ Saved Excel to: {out_xlsx}")
+    print_recovery_stats(generators.values())
+
+
+if __name__ == "__main__":
+    asyncio.run(run_pipeline())
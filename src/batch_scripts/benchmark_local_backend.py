@@ -0,0 +1,45 @@
+import os
+import sys
+import time
+from local_model import LocalModelService, DEFAULT_LOCAL_MODEL_PATH, physical_cores
+
+# Benchmark de rendimiento del backend local: tokens/s para cada combinación
+# de slots paralelos × hilos por slot, con prompts reales de especificación.
+MODEL_PATH = sys.argv[1] if len(sys.argv) > 1 else DEFAULT_LOCAL_MODEL_PATH
+PROMPT_PATH = "prompts/prompt_generate_specification.txt"
+REAL_DIALOG_DIR = "data/real_dialogs"
+N_PROMPTS = 8
+MAX_TOKENS = 256
+
+cores = physical_cores()
+CONFIGS = [
+    {"n_slots": 1, "n_threads": 4},           # configuración histórica
+    {"n_slots": 1, "n_threads": cores},
+    {"n_slots": 2, "n_threads": max(1, cores // 2)},
+    {"n_slots": 4, "n_threads": max(1, cores // 4)},
+]
+
+with open(PROMPT_PATH, "r") as f:
+    template = f.read()
+real_dialogs = sorted(f for f in os.listdir(REAL_DIALOG_DIR) if f.endswith(".txt"))[:N_PROMPTS]
+batch = []
+for filename in real_dialogs:
+    with open(os.path.join(REAL_DIALOG_DIR, filename), "r") as f:
+        batch.append([{"role": "user", "content": template.replace("{REAL_DIALOG_HERE}", f.read())}])
+
+print(f"🖥️ Physical cores detected: {cores}")
+results = []
+for config in CONFIGS:
+    service = LocalModelService(MODEL_PATH, **config)
+    start = time.perf_counter()
+    responses = service.chat_completion_batch(batch, max_tokens=MAX_TOKENS, temperature=0.7)
+    elapsed = time.perf_counter() - start
+    completion_tokens = sum(r["usage"]["completion_tokens"] for r in responses)
+    prompt_tokens = sum(r["usage"]["prompt_tokens"] for r in responses)
+    results.append((config, elapsed, prompt_tokens, completion_tokens))
+    print(f"✅ slots={config['n_slots']} threads={config['n_threads']}: "
+          f"{completion_tokens / elapsed:.1f} gen tok/s | {(prompt_tokens + completion_tokens) / elapsed:.1f} total tok/s | {elapsed:.1f}s")
+    del service
+
+best = max(results, key=lambda r: r[3] / r[1])
+print(f"\n🏁 Best: slots={best[0]['n_slots']} threads={best[0]['n_threads']} ({best[3] / best[1]:.1f} gen tok/s)")
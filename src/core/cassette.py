@@ -0,0 +1,275 @@
+import os
+import json
+import time
+import zlib
+import atexit
+import sqlite3
+import hashlib
+import threading
+from collections import defaultdict
+from llm_backends import ChatBackend, register_backend
+from schemas import schema_key
+
+# Grabación y reproducción de llamadas al LLM ("cassettes"): en modo record cada
+# petición que llega al backend (mensajes, modelo, temperatura, semilla, params)
+# se guarda con su respuesta, comprimida, en un SQLite; el backend `replay` las
+# sirve por hash de la petición, sin red ni cuota. Si un prompt cambia, la
+# petición no está grabada y se informa de dónde difiere del más parecido.
+#
+#   LLM_CASSETTE_MODE=record LLM_CACHE_BYPASS=1 python src/batch_scripts/...   # graba
+#   LLM_CASSETTE_MODE=replay python src/batch_scripts/...                      # reproduce
+#   python src/core/cassette.py stats [path]
+#
+# Peticiones idénticas (mismo prompt sin semilla) se graban y se sirven por orden de
+# llegada. Con max_concurrency > 1 ese orden no es estable: la reproducción devuelve
+# las mismas respuestas, pero no siempre a la misma llamada. Para salidas idénticas
+# por diálogo, grabar con semilla o con max_concurrency=1.
+
+DEFAULT_CASSETTE_PATH = os.getenv("LLM_CASSETTE", "cassettes/llm_calls.sqlite")
+CASSETTE_MODE = os.getenv("LLM_CASSETTE_MODE", "")  # "" | "record" | "replay"
+MISS_LOG = 20  # misses detallados en el resumen final
+
+
+class CassetteMiss(LookupError):
+    pass
+
+
+def _opaque(value):
+    # Objetos no serializables (p. ej. gramáticas GBNF de llama.cpp): solo cuenta el tipo
+    return f"<{type(value).__name__}>"
+
+
+def request_payload(model_name, messages, temperature=None, seed=None, **params):
+    return {"model": model_name, "messages": messages, "temperature": temperature, "seed": seed, "params": params}
+
+
+def request_key(payload):
+    raw = json.dumps(payload, sort_keys=True, ensure_ascii=False, default=_opaque)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+def _pack(data):
+    return zlib.compress(json.dumps(data, ensure_ascii=False, default=_opaque).encode("utf-8"), 6)
+
+
+def _unpack(blob):
+    return json.loads(zlib.decompress(blob).decode("utf-8"))
+
+
+def _prompt_text(payload):
+    return "\n".join(str(m.get("content", "")) for m in payload["messages"])
+
+
+class Cassette:
+    def __init__(self, path=DEFAULT_CASSETTE_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(
+            "CREATE TABLE IF NOT EXISTS calls ("
+            " key TEXT NOT NULL,"
+            " occurrence INTEGER NOT NULL,"
+            " model TEXT NOT NULL,"
+            " request BLOB NOT NULL,"
+            " response BLOB NOT NULL,"
+            " created_at REAL NOT NULL,"
+            " PRIMARY KEY (key, occurrence));"
+            "CREATE TABLE IF NOT EXISTS backends ("
+            " model TEXT PRIMARY KEY,"
+            " backend TEXT NOT NULL,"
+            " supports_n INTEGER NOT NULL);"
+            "CREATE TABLE IF NOT EXISTS structured ("
+            " model TEXT NOT NULL,"
+            " schema TEXT NOT NULL,"
+            " params BLOB NOT NULL,"
+            " PRIMARY KEY (model, schema));"
+        )
+        self._conn.commit()
+        self._responses = None
+        self._served = defaultdict(int)
+        self.hits = 0
+        self.misses = []
+
+    # === Grabación
+    def record(self, payload, response):
+        key = request_key(payload)
+        with self._lock:
+            # La numeración sigue tras la última ocurrencia grabada (de esta sesión o de
+            # otra anterior) en la misma sentencia: dos sesiones no se pisan
+            self._conn.execute(
+                "INSERT INTO calls (key, occurrence, model, request, response, created_at)"
+                " SELECT ?, COALESCE(MAX(occurrence) + 1, 0), ?, ?, ?, ? FROM calls WHERE key = ?",
+                (key, payload["model"], _pack(payload), _pack(response), time.time(), key)
+            )
+            self._conn.commit()
+
+    def record_backend(self, model_name, backend, supports_n):
+        with self._lock:
+            self._conn.execute("INSERT OR REPLACE INTO backends (model, backend, supports_n) VALUES (?, ?, ?)",
+                               (model_name, backend, int(bool(supports_n))))
+            self._conn.commit()
+
+    def record_structured(self, model_name, schema, params):
+        with self._lock:
+            self._conn.execute("INSERT OR REPLACE INTO structured (model, schema, params) VALUES (?, ?, ?)",
+                               (model_name, schema_key(schema), _pack(params)))
+            self._conn.commit()
+
+    # === Reproducción: todo el cassette se carga en memoria la primera vez
+    def _load(self):
+        with self._lock:
+            if self._responses is None:
+                responses = defaultdict(list)
+                rows = self._conn.execute("SELECT key, response FROM calls ORDER BY key, occurrence")
+                for key, blob in rows:
+                    responses[key].append(blob)
+                self._responses = responses
+        return self._responses
+
+    def replay(self, payload):
+        responses = self._load()
+        key = request_key(payload)
+        with self._lock:
+            occurrence = self._served[key]
+            self._served[key] += 1
+            recorded = responses.get(key, [])
+            if occurrence < len(recorded):
+                self.hits += 1
+                return _unpack(recorded[occurrence])
+        reason = self.explain_miss(payload, key, len(recorded))
+        with self._lock:
+            self.misses.append(reason)
+        raise CassetteMiss(f"🎞️ Cassette miss ({self.path}): {reason}")
+
+    def explain_miss(self, payload, key, recorded):
+        # Si la petición existe pero se pidió más veces de las grabadas, lo dice; si no,
+        # busca el prompt grabado del mismo modelo con el prefijo común más largo
+        if recorded:
+            return f"{payload['model']} request {key[:12]} was recorded {recorded} time(s) and requested once more"
+        prompt = _prompt_text(payload)
+        best, best_len = None, -1
+        with self._lock:
+            rows = self._conn.execute("SELECT request FROM calls WHERE model = ?", (payload["model"],)).fetchall()
+        for (blob,) in rows:
+            candidate = _unpack(blob)
+            common = len(os.path.commonprefix([prompt, _prompt_text(candidate)]))
+            if common > best_len:
+                best, best_len = candidate, common
+        if best is None:
+            return f"no recordings for model {payload['model']} (request {key[:12]})"
+        recorded_prompt = _prompt_text(best)
+        if recorded_prompt == prompt:
+            changed = [k for k in ("temperature", "seed", "params") if best[k] != payload[k]]
+            return (f"{payload['model']} request {key[:12]}: same prompt as a recording, "
+                    f"but different {', '.join(changed) or 'messages'}")
+        line = prompt.count("\n", 0, best_len) + 1
+        return (f"{payload['model']} request {key[:12]}: prompt differs from the closest recording at line {line}: "
+                f"recorded {recorded_prompt[best_len:best_len + 60]!r} vs now {prompt[best_len:best_len + 60]!r}")
+
+    def backend_info(self, model_name):
+        with self._lock:
+            row = self._conn.execute("SELECT backend, supports_n FROM backends WHERE model = ?", (model_name,)).fetchone()
+        return {"backend": row[0], "supports_n": bool(row[1])} if row else {"backend": None, "supports_n": False}
+
+    def structured_params(self, model_name, schema):
+        with self._lock:
+            row = self._conn.execute("SELECT params FROM structured WHERE model = ? AND schema = ?",
+                                     (model_name, schema_key(schema))).fetchone()
+        return _unpack(row[0]) if row else {}
+
+    def stats(self):
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT c.model, b.backend, COUNT(DISTINCT c.key), COUNT(*) FROM calls c "
+                "LEFT JOIN backends b ON b.model = c.model GROUP BY c.model ORDER BY c.model"
+            ).fetchall()
+        return [{"model": m, "backend": b, "requests": k, "responses": n} for m, b, k, n in rows]
+
+    def report(self):
+        if not self.hits and not self.misses:
+            return
+        print(f"🎞️ Cassette {self.path}: {self.hits} replayed, {len(self.misses)} misses")
+        for reason in self.misses[:MISS_LOG]:
+            print(f"   ❌ {reason}")
+        if len(self.misses) > MISS_LOG:
+            print(f"   ... and {len(self.misses) - MISS_LOG} more")
+
+
+_cassettes = {}
+_cassettes_lock = threading.Lock()
+
+
+def get_cassette(path=DEFAULT_CASSETTE_PATH):
+    with _cassettes_lock:
+        if path not in _cassettes:
+            _cassettes[path] = Cassette(path)
+            atexit.register(_cassettes[path].report)
+        return _cassettes[path]
+
+
+class RecordingBackend(ChatBackend):
+    # Envuelve el backend real: cada respuesta se guarda en el cassette antes de devolverla
+    def __init__(self, inner, cassette):
+        self.inner = inner
+        self.name = inner.name
+        self.model_name = inner.model_name
+        self.supports_n = inner.supports_n
+        self.cassette = cassette
+        cassette.record_backend(self.model_name, inner.name, inner.supports_n)
+
+    def chat_completion(self, messages, temperature=None, seed=None, **params):
+        response = self.inner.chat_completion(messages, temperature=temperature, seed=seed, **params)
+        self.cassette.record(request_payload(self.model_name, messages, temperature, seed, **params), response)
+        return response
+
+    def structured_params(self, schema):
+        params = self.inner.structured_params(schema)
+        self.cassette.record_structured(self.model_name, schema, params)
+        return params
+
+    def warm_prefix(self, prefix):
+        self.inner.warm_prefix(prefix)
+
+
+@register_backend("replay")
+class ReplayBackend(ChatBackend):
+    # Sirve las respuestas grabadas; se comporta como el backend que las grabó (n, params de esquema)
+    def __init__(self, model_name=None, cassette_path=None, **_):
+        self.model_name = model_name
+        self.cassette = get_cassette(cassette_path or DEFAULT_CASSETTE_PATH)
+        self.supports_n = self.cassette.backend_info(model_name)["supports_n"]
+
+    def chat_completion(self, messages, temperature=None, seed=None, **params):
+        response = self.cassette.replay(request_payload(self.model_name, messages, temperature, seed, **params))
+        # El TTFT grabado no describe esta ejecución
+        response.pop("x_ttft", None)
+        return response
+
+    def structured_params(self, schema):
+        return self.cassette.structured_params(self.model_name, schema)
+
+
+def wrap_backend(backend, mode=CASSETTE_MODE, path=DEFAULT_CASSETTE_PATH):
+    # LLMClient: en modo record envuelve el backend real
+    if mode == "record" and not isinstance(backend, (RecordingBackend, ReplayBackend)):
+        return RecordingBackend(backend, get_cassette(path))
+    return backend
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Inspect an LLM call cassette.")
+    parser.add_argument("command", nargs="?", default="stats", choices=["stats"])
+    parser.add_argument("path", nargs="?", default=DEFAULT_CASSETTE_PATH)
+    args = parser.parse_args()
+
+    if not os.path.exists(args.path):
+        raise SystemExit(f"⚠️ Cassette not found: {args.path}")
+    rows = Cassette(args.path).stats()
+    print(f"🎞️ {args.path} ({os.path.getsize(args.path) / 1e6:.1f} MB)")
+    for row in rows:
+        print(f"   {row['model']:<28} {row['backend'] or '?':<8} {row['requests']:>6} requests  {row['responses']:>6} responses")
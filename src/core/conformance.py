@@ -0,0 +1,216 @@
+import re
+import ast
+import json
+
+# Comprobación estructural de un diálogo generado frente a su spec, sin LLM:
+# turnos P1:/P2:, número de turnos frente a "turns", hablantes frente a
+# "participants", alternancia y texto sobrante (encabezados tipo "Here is the
+# generated dialog:" o comentarios al final). Tarda microsegundos, así que el
+# pipeline puede descartar o regenerar diálogos rotos antes de pagar al juez.
+#
+#   PYTHONPATH=src/core python src/core/conformance.py --folder ablation_outputs --failed
+
+# P1: texto | **P1:** texto | P2 (pausing): texto
+TURN_RE = re.compile(r"^\s*[*_]*\s*P(\d+)\s*(?:\([^)]*\))?\s*[*_]*\s*:\s*[*_]*\s*(.*)$")
+SEPARATOR_RE = re.compile(r"^\s*(?:[-*_=]{3,}|```\w*)\s*$")
+TURNS_RE = re.compile(r"""["']?turns["']?\s*:\s*(\d+)""")
+PARTICIPANTS_RE = re.compile(r"""["']?participants["']?\s*:\s*(\d+)""")
+
+DEFAULT_PARTICIPANTS = 2
+TURN_TOLERANCE = 1  # turnos de más o de menos que no cuentan como fallo
+MIN_SCORE = 0.6
+# Fallos que invalidan el diálogo aunque la nota estructural pase el umbral
+HARD_ISSUES = ["no_turns", "missing_speaker", "extra_speaker"]
+WEIGHTS = {"turns": 1.0, "speakers": 1.0, "alternation": 1.0, "format": 1.0}
+# Claves del informe que se guardan junto a las notas del juez
+REPORT_KEYS = ["structural_score", "ok", "issues", "turns", "expected_turns", "speakers", "expected_speakers",
+               "repeated_speaker", "preamble_lines", "trailing_lines", "unlabeled_lines", "empty_turns"]
+
+
+def parse_spec(spec):
+    # La spec llega como dict, JSON o repr de Python (spec_format "python"); si no se
+    # puede leer se rescatan "turns" y "participants" con una expresión regular
+    if isinstance(spec, dict):
+        return spec
+    if not spec:
+        return {}
+    for parse in (json.loads, ast.literal_eval):
+        try:
+            parsed = parse(spec)
+            if isinstance(parsed, dict):
+                return parsed
+        except (ValueError, SyntaxError, TypeError):
+            pass
+    found = {}
+    for key, pattern in (("turns", TURNS_RE), ("participants", PARTICIPANTS_RE)):
+        match = pattern.search(spec)
+        if match:
+            found[key] = int(match.group(1))
+    return found
+
+
+def _int(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def parse_turns(dialog):
+    # Turnos [(hablante, texto)] y líneas sin etiqueta: antes del primer turno (preámbulo),
+    # tras una línea en blanco entre turnos (sueltas) o al final (comentarios). Una línea
+    # pegada a un turno se toma como continuación de ese turno.
+    turns, preamble, stray = [], [], []
+    after_blank = False
+    for line in dialog.splitlines():
+        if not line.strip() or SEPARATOR_RE.match(line):
+            after_blank = True
+            continue
+        match = TURN_RE.match(line)
+        if match:
+            turns.append(["P" + match.group(1), match.group(2).strip()])
+        elif not turns:
+            preamble.append(line.strip())
+        elif after_blank or stray and stray[-1][0] == len(turns):
+            stray.append((len(turns), line.strip()))
+        else:
+            turns[-1][1] = (turns[-1][1] + " " + line.strip()).strip()
+        after_blank = False
+    trailing = [text for position, text in stray if position == len(turns)]
+    unlabeled = [text for position, text in stray if position < len(turns)]
+    return [tuple(t) for t in turns], preamble, unlabeled, trailing
+
+
+def check_dialog(dialog, spec=None, min_score=MIN_SCORE, hard_issues=HARD_ISSUES):
+    spec = parse_spec(spec)
+    turns, preamble, unlabeled, trailing = parse_turns(dialog or "")
+    n = len(turns)
+    participants = _int(spec.get("participants")) or DEFAULT_PARTICIPANTS
+    expected_speakers = [f"P{i}" for i in range(1, participants + 1)]
+    speakers = sorted({speaker for speaker, _ in turns}, key=lambda s: int(s[1:]))
+    issues = []
+
+    # "turns" se usa en el corpus unas veces como intervenciones y otras como pares
+    # P1/P2: se compara con la lectura más cercana
+    expected_turns = _int(spec.get("turns"))
+    turn_error = None
+    if expected_turns:
+        readings = [expected_turns, expected_turns * participants]
+        closest = min(readings, key=lambda t: abs(n - t))
+        turn_error = abs(n - closest) / closest
+        if abs(n - closest) > TURN_TOLERANCE:
+            issues.append("turn_count")
+    if not n:
+        issues.append("no_turns")
+
+    missing = [s for s in expected_speakers if s not in speakers]
+    extra = [s for s in speakers if s not in expected_speakers]
+    if n and missing:
+        issues.append("missing_speaker")
+    if extra:
+        issues.append("extra_speaker")
+
+    repeated = sum(1 for a, b in zip(turns, turns[1:]) if a[0] == b[0])
+    if repeated:
+        issues.append("repeated_speaker")
+    empty = sum(1 for _, text in turns if not text)
+    if empty:
+        issues.append("empty_turn")
+    for issue, lines in (("preamble", preamble), ("unlabeled_lines", unlabeled), ("trailing_text", trailing)):
+        if lines:
+            issues.append(issue)
+
+    union = set(speakers) | set(expected_speakers)
+    components = {
+        "turns": 1.0 if turn_error is None else max(0.0, 1.0 - turn_error),
+        "speakers": len(set(speakers) & set(expected_speakers)) / len(union) if n else 0.0,
+        "alternation": 1.0 - repeated / (n - 1) if n > 1 else float(n),
+        "format": (n - empty) / (n + len(preamble) + len(unlabeled) + len(trailing)) if n else 0.0,
+    }
+    score = sum(WEIGHTS[k] * v for k, v in components.items()) / sum(WEIGHTS.values())
+    return {
+        "structural_score": round(score, 4),
+        "ok": score >= min_score and not any(issue in hard_issues for issue in issues),
+        "issues": issues,
+        "components": {k: round(v, 4) for k, v in components.items()},
+        "turns": n,
+        "expected_turns": expected_turns,
+        "turn_error": None if turn_error is None else round(turn_error, 4),
+        "speakers": speakers,
+        "expected_speakers": expected_speakers,
+        "missing_speakers": missing,
+        "extra_speakers": extra,
+        "repeated_speaker": repeated,
+        "empty_turns": empty,
+        "preamble_lines": len(preamble),
+        "unlabeled_lines": len(unlabeled),
+        "trailing_lines": len(trailing),
+        "preamble": preamble[:3],
+        "trailing": trailing[:3],
+    }
+
+
+def summary(report):
+    # Versión compacta para guardar junto a las notas del juez
+    return {key: report[key] for key in REPORT_KEYS}
+
+
+def reason(report):
+    return ", ".join(report["issues"]) or f"structural score {report['structural_score']}"
+
+
+if __name__ == "__main__":
+    import time
+    import argparse
+    from collections import Counter
+    from results_store import get_default_store
+
+    parser = argparse.ArgumentParser(description="Structural conformance of generated dialogs against their specs.")
+    parser.add_argument("--folder", help="only dialogs in this folder (e.g. generated_dialogs, ablation_outputs)")
+    parser.add_argument("--model")
+    parser.add_argument("--min-score", type=float, default=MIN_SCORE)
+    parser.add_argument("--failed", action="store_true", help="list every dialog that fails the check")
+    parser.add_argument("--out", help="write one row per dialog to this CSV/XLSX file")
+    args = parser.parse_args()
+
+    store = get_default_store()
+    store.refresh()
+    filters = {k: v for k, v in (("folder", args.folder), ("model", args.model)) if v}
+    where, params = store._where("dialog", filters)
+    dialogs = list(store.iter_query(f"SELECT path, model, axis, variant, run, dialog_id, content FROM artifacts{where}", params))
+    # La spec de cada diálogo: misma variante y mismo dialog_id, o la carpeta specs/ del eje
+    # (casos límite); sin spec solo se comprueban hablantes, alternancia y formato
+    where, params = store._where("spec", filters)
+    specs = {}
+    for row in store.iter_query(f"SELECT model, axis, variant, dialog_id, content FROM artifacts{where}", params):
+        specs[row["model"], row["axis"], row["variant"], row["dialog_id"]] = row["content"]
+
+    start = time.perf_counter()
+    rows, issues = [], Counter()
+    for row in dialogs:
+        spec = specs.get((row["model"], row["axis"], row["variant"], row["dialog_id"]),
+                         specs.get((row["model"], row["axis"], None, row["dialog_id"])))
+        report = check_dialog(row["content"] or "", spec, args.min_score)
+        issues.update(report["issues"])
+        rows.append({"path": row["path"], "model": row["model"], "axis": row["axis"], "variant": row["variant"],
+                     "has_spec": spec is not None, **summary(report)})
+        if args.failed and not report["ok"]:
+            print(f"❌ {row['path']}: {reason(report)}")
+    elapsed = time.perf_counter() - start
+
+    passed = sum(r["ok"] for r in rows)
+    print(f"📐 {len(rows)} dialogs checked in {elapsed * 1000:.1f} ms: {passed} ok, {len(rows) - passed} rejected")
+    for issue, count in issues.most_common():
+        print(f"   {issue:<18} {count}")
+    if args.out:
+        import pandas as pd
+
+        frame = pd.DataFrame(rows)
+        frame["issues"] = frame["issues"].str.join(", ")
+        frame["speakers"] = frame["speakers"].str.join(", ")
+        frame["expected_speakers"] = frame["expected_speakers"].str.join(", ")
+        if args.out.endswith(".xlsx"):
+            frame.to_excel(args.out, index=False)
+        else:
+            frame.to_csv(args.out, index=False)
+        print(f"✅ Conformance report saved to {args.out}")
@@ -1,72 +1,52 @@
-import os
-import re
-import ast
-import json
-from pathlib import Path
-
-class DialogEvaluator:
-    def __init__(self, model_name="llama3-8b-8192", backend="groq", env_path=None):
-        self.backend = backend
-        self.model_name = model_name
-
-        if self.backend == "groq":
-            from openai import OpenAI
-            key = os.getenv("GROQ_API_KEY")
-            if env_path:
-                with open(env_path) as f:
-                    for line in f:
-                        if "GROQ_API_KEY" in line:
-                            key = line.strip().split("=")[1]
-                            break
-            if not key:
-                raise ValueError("GROQ_API_KEY not found. Provide via .env or env_path.")
-            self.client = OpenAI(api_key=key, base_url="https://api.groq.com/openai/v1")
-
-        elif self.backend == "local":
-            from llama_cpp import Llama
-            self.pipeline = Llama(
-                model_path="/content/llama-2-7b-chat.Q4_K_M.gguf",
-                n_ctx=2048,
-                n_threads=4,
-                chat_format="llama-2",
-                n_gpu_layers=20
-            )
-
-    def _load_prompt(self, path):
-        with open(path, "r") as f:
-            return f.read()
+from llm_backends import DEFAULT_TIMEOUT
+from llm_client import LLMClient
+from json_repair import parse_json
+from schemas import SCORES_SCHEMA
+
+class DialogEvaluator(LLMClient):
+    def __init__(self, model_name="llama3-8b-8192", backend="groq", env_path=None, cache=True, seed=None,
+                 model_path=None, timeout=DEFAULT_TIMEOUT, max_concurrency=8, max_retries=5, structured_output=False):
+        super().__init__(backend=backend, model_name=model_name, env_path=env_path, model_path=model_path,
+                         max_concurrency=max_concurrency, max_retries=max_retries,
+                         cache=cache, seed=seed, timeout=timeout, structured_output=structured_output)
 
     def extract_json(self, text):
-        match = re.search(r'\{.*', text, re.DOTALL)
-        if match:
-            partial = match.group()
-            if partial.count('{') > partial.count('}'):
-                partial += '}' * (partial.count('{') - partial.count('}'))
-            try:
-                return ast.literal_eval(partial)
-            except Exception as e:
-                print("❌ Error parsing JSON:\n", partial)
-                raise e
-        raise ValueError("No valid dictionary found in response.")
+        try:
+            return parse_json(text)
+        except ValueError:
+            print("❌ Error parsing JSON:\n", text)
+            raise
 
-    def evaluate(self, generated_dialog, reference_dialog=None, specification=None, prompt_path="prompts/prompt_evaluate.txt"):
+    def _fill_prompt(self, generated_dialog, reference_dialog, specification, prompt_path):
         prompt = self._load_prompt(prompt_path)
         prompt = prompt.replace("{GENERATED_DIALOG_HERE}", generated_dialog)
         prompt = prompt.replace("{REFERENCE_DIALOG_HERE}", reference_dialog if reference_dialog else "")
         prompt = prompt.replace("{SPECIFICATION_HERE}", str(specification) if specification else "")
+        return prompt
 
-        if self.backend == "groq":
-            response = self.client.chat.completions.create(
-                model=self.model_name,
-                messages=[{"role": "user", "content": prompt}],
-                temperature=0
-            )
-            output = response.choices[0].message.content
-        else:
-            response = self.pipeline.create_chat_completion(
-                messages=[{"role": "user", "content": prompt}]
-            )
-            output = response["choices"][0]["message"]["content"]
-
+    def _parse_scores(self, output, call=None):
         print("🟡 Model output for evaluation:\n", output)
-        return self.extract_json(output)
+        try:
+            scores = self.extract_json(output)
+            errors = self._validate(scores, SCORES_SCHEMA)
+            if errors:
+                raise ValueError("Scores do not match schema: " + "; ".join(errors))
+            self._parsed(call, True)
+            return scores
+        except Exception as e:
+            self._parsed(call, False)
+            # La salida cruda viaja con el error (lista de fallos de la cola de trabajos)
+            e.raw_output = output
+            raise
+
+    def evaluate(self, generated_dialog, reference_dialog=None, specification=None, prompt_path="prompts/prompt_evaluate.txt"):
+        prompt = self._fill_prompt(generated_dialog, reference_dialog, specification, prompt_path)
+        call = self._call("evaluation", prompt_path, parse=True)
+        output = self._complete(prompt, temperature=0, schema=self._output_schema(SCORES_SCHEMA), call=call)
+        return self._parse_scores(output, call)
+
+    async def aevaluate(self, generated_dialog, reference_dialog=None, specification=None, prompt_path="prompts/prompt_evaluate.txt"):
+        prompt = self._fill_prompt(generated_dialog, reference_dialog, specification, prompt_path)
+        call = self._call("evaluation", prompt_path, parse=True)
+        output = await self._complete_async(prompt, temperature=0, schema=self._output_schema(SCORES_SCHEMA), call=call)
+        return self._parse_scores(output, call)
@@ -1,154 +1,195 @@
 import os
-import re
-import json
-import subprocess
-
-class DialogGenerator:
-    def __init__(self, backend="groq", model_name="llama3-8b-8192", env_path=None, model_path=None, auto_model=False):
-        self.backend = backend
-        self.model_name = model_name
-
-        if self.backend == "groq":
-            from openai import OpenAI
-            key = os.getenv("GROQ_API_KEY")
-            if env_path:
-                with open(env_path) as f:
-                    for line in f:
-                        if "GROQ_API_KEY" in line:
-                            key = line.strip().split("=")[1]
-                            break
-            if not key:
-                raise ValueError("GROQ_API_KEY not found. Provide via .env or env_path.")
-            self.client = OpenAI(api_key=key, base_url="https://api.groq.com/openai/v1")
-
-        elif self.backend == "local":
-            if auto_model:
-                self.model_path = self._download_model_if_needed()
-            else:
-                if not model_path:
-                    raise ValueError("No model_path provided and auto_model is False.")
-                self.model_path = model_path
-            self._install_llama_cpp()
-            from llama_cpp import Llama
-            self.pipeline = Llama(
-                model_path=self.model_path,
-                n_ctx=2048,
-                n_threads=4,
-                chat_format="llama-2",
-                n_gpu_layers=20
-            )
-
-    def _install_llama_cpp(self):
-        try:
-            import llama_cpp
-        except ImportError:
-            print("🔧 Installing llama-cpp-python...")
-            subprocess.run(["pip", "install", "llama-cpp-python"], check=True)
-
-    def _download_model_if_needed(self):
-        model_filename = "llama-2-7b-chat.Q4_K_M.gguf"
-        model_path = f"/content/{model_filename}"
-        if not os.path.exists(model_path):
-            print("⬇️ Downloading LLaMA 2 7B Chat model...")
-            subprocess.run([
-                "wget", "-O", model_path,
-                "https://huggingface.co/TheBloke/Llama-2-7B-Chat-GGUF/resolve/main/llama-2-7b-chat.Q4_K_M.gguf"
-            ], check=True)
-        else:
-            print("✅ Model already exists.")
-        return model_path
-
-    def _load_prompt(self, path):
-        with open(path, "r") as f:
-            return f.read()
+from llm_client import LLMClient
+from json_repair import parse_json, try_parse_json, strict_json, find_start
+from rate_limiter import estimate_tokens
+from schemas import SPEC_SCHEMA
+
+# Recuperación escalonada de specs mal formadas, de más barata a más cara:
+# direct (JSON válido) → local_repair (parser tolerante) → format_fix (solo el bloque
+# roto, con un prompt corto, al modelo más barato) → regenerate (prompt completo otra vez)
+FORMAT_FIX_PROMPT = "prompts/prompt_fix_json.txt"
+FORMAT_FIX_MODEL = os.getenv("FORMAT_FIX_MODEL", "llama3-8b-8192")
+MAX_REGENERATIONS = 1
+RECOVERY_TIERS = ["direct", "local_repair", "format_fix", "regenerate", "failed"]
+EXPECTED_SPEC_TOKENS = 256
+# Diálogos que no pasan la comprobación estructural (conformance.py): el intento N usa
+# la semilla seed + N * paso, lejos de las semillas de las demás repeticiones
+DIALOG_REGENERATION_SEED_STEP = 1000
+
+
+class DialogGenerator(LLMClient):
+    def __init__(self, *args, format_fix_model=FORMAT_FIX_MODEL, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.format_fix_model = format_fix_model
+        self._fixer = None
+        # Qué nivel resolvió cada spec y tokens estimados ahorrados frente a regenerar
+        self.recovery_stats = {tier: 0 for tier in RECOVERY_TIERS}
+        self.recovery_stats["tokens_saved"] = 0
 
     def extract_json(self, text):
-        start = text.find("{")
-        end = text.rfind("}")
-        if start == -1 or end == -1:
-            raise ValueError("No JSON block found.")
-    
-        block = text[start:end+1]
-    
-        # Correcciones básicas
-        block = block.replace("“", '"').replace("”", '"').replace("’", "'")
-        block = block.replace('\\"', '"')
-        block = re.sub(r'("P\\d)(:\s*\")', r'\1"\2', block)
-    
         try:
-            return json.loads(block)
-        except json.JSONDecodeError:
-            print("❌ First JSON parse failed, trying repair...")
-    
-            repaired = self.try_repair(block)  # ← Usamos el método de abajo
-            if repaired:
-                return repaired
-            print("❌ Final repair failed.\n", block)
+            return parse_json(text)
+        except ValueError:
+            print("❌ JSON repair failed.\n", text)
             raise
-    def try_repair(self, block):
-        try:
-            # Correcciones avanzadas
-            block = re.sub(r',\s*}', '}', block)  # elimina comas antes de }
-            block = re.sub(r',\s*]', ']', block)  # elimina comas antes de ]
-            block = re.sub(r'(\w+):', r'"\1":', block)  # comillas en keys sin comillas
-            block = re.sub(r'“|”', '"', block)
-            block = re.sub(r'\["([^"]+)"\s+in\s+[^"\]]+\]', r'["\1"]', block)
-            block = re.sub(r'(")(\s*])', r'\1,\2', block)
-    
-            # Reparación de listas de tonos, metas, etc.
-            block = re.sub(r'\n+', ' ', block)
-            block = re.sub(r'\s+', ' ', block)
-    
-            return json.loads(block)
-        except Exception:
-            return None
 
+    def try_repair(self, block):
+        return try_parse_json(block)
 
-    def generate_specification(self, real_dialog, prompt_path="prompts/...", base_dir=None, dialog_id=None):
-        prompt = self._load_prompt(prompt_path)
-        prompt_filled = prompt.replace("{REAL_DIALOG_HERE}", real_dialog)
-
-        if self.backend == "groq":
-            response = self.client.chat.completions.create(
-                model=self.model_name,
-                messages=[{"role": "user", "content": prompt_filled}],
-                temperature=0.7
-            )
-            output = response.choices[0].message.content
-        else:
-            response = self.pipeline.create_chat_completion(
-                messages=[{"role": "user", "content": prompt_filled}]
-            )
-            output = response["choices"][0]["message"]["content"]
-
+    def _parse_specification(self, output, base_dir=None, dialog_id=None, call=None):
         print("🟡 Model output for specification:\n", output)
 
+        try:
+            parsed = self.extract_json(output)
+        except Exception as e:
+            self._save_raw_output(output, base_dir, dialog_id)
+            self._parsed(call, False)
+            return None, output
+        errors = self._validate(parsed, SPEC_SCHEMA)
+        if errors:
+            print("❌ Specification does not match schema:\n", "\n".join(errors))
+            self._save_raw_output(output, base_dir, dialog_id)
+            self._parsed(call, False)
+            return None, output
+        self._parsed(call, True)
+        return parsed, output
+
+    def _save_raw_output(self, output, base_dir, dialog_id):
+        # Solo las salidas que no se pudieron leer: repair_failed_specs.py repara lo que hay aquí
         if base_dir and dialog_id:
             raw_path = os.path.join(base_dir, "specifications_failed", f"{dialog_id}_raw_output.txt")
             os.makedirs(os.path.dirname(raw_path), exist_ok=True)
             with open(raw_path, "w", encoding="utf-8") as f:
                 f.write(output)
 
-        try:
-            parsed = self.extract_json(output)
-            return parsed, output
-        except Exception as e:
-            return None, output
-
+    def _fill_specification_prompt(self, real_dialog, prompt_path):
+        prompt = self._load_prompt(prompt_path)
+        return prompt.replace("{REAL_DIALOG_HERE}", real_dialog)
 
-    def generate_dialog(self, specification, prompt_path="prompts/prompt_generate_dialog.txt"):
+    def _fill_dialog_prompt(self, specification, prompt_path):
         prompt = self._load_prompt(prompt_path)
-        prompt_filled = prompt.replace("{SPECIFICATION_HERE}", str(specification))
-
-        if self.backend == "groq":
-            response = self.client.chat.completions.create(
-                model=self.model_name,
-                messages=[{"role": "user", "content": prompt_filled}],
-                temperature=0.8
-            )
-            return response.choices[0].message.content
-        else:
-            response = self.pipeline.create_chat_completion(
-                messages=[{"role": "user", "content": prompt_filled}]
-            )
-            return response["choices"][0]["message"]["content"]
+        return prompt.replace("{SPECIFICATION_HERE}", str(specification))
+
+    def generate_specification(self, real_dialog, prompt_path="prompts/...", base_dir=None, dialog_id=None):
+        prompt_filled = self._fill_specification_prompt(real_dialog, prompt_path)
+        call = self._call("specification", prompt_path, parse=True)
+        output = self._complete(prompt_filled, temperature=0.7, schema=self._output_schema(SPEC_SCHEMA), call=call)
+        return self._parse_specification(output, base_dir, dialog_id, call)
+
+    def generate_dialog(self, specification, prompt_path="prompts/prompt_generate_dialog.txt", seed=None):
+        prompt_filled = self._fill_dialog_prompt(specification, prompt_path)
+        return self._complete(prompt_filled, temperature=0.8, seed=seed, call=self._call("dialog", prompt_path))
+
+    def generate_dialogs(self, specification, n, prompt_path="prompts/prompt_generate_dialog.txt", seed=None):
+        # n diálogos de la misma spec y prompt (con `n` en el endpoint, una sola petición)
+        prompt_filled = self._fill_dialog_prompt(specification, prompt_path)
+        return self._complete_n(prompt_filled, temperature=0.8, n=n, seed=seed, call=self._call("dialog", prompt_path))
+
+    def regenerate_dialog(self, specification, prompt_path="prompts/prompt_generate_dialog.txt", seed=None, attempt=1):
+        prompt_filled = self._fill_dialog_prompt(specification, prompt_path)
+        seed = None if seed is None else seed + attempt * DIALOG_REGENERATION_SEED_STEP
+        return self._complete(prompt_filled, temperature=0.8, seed=seed, sample=attempt,
+                              call=self._call("dialog", prompt_path, attempt=attempt))
+
+    # === Modo asíncrono: muchas peticiones a la vez, con límite de concurrencia
+    # y un token bucket por modelo que frena antes de llegar al 429.
+    async def agenerate_specification(self, real_dialog, prompt_path="prompts/...", base_dir=None, dialog_id=None):
+        prompt_filled = self._fill_specification_prompt(real_dialog, prompt_path)
+        call = self._call("specification", prompt_path, parse=True)
+        output = await self._complete_async(prompt_filled, temperature=0.7, schema=self._output_schema(SPEC_SCHEMA),
+                                            call=call)
+        return self._parse_specification(output, base_dir, dialog_id, call)
+
+    async def agenerate_dialog(self, specification, prompt_path="prompts/prompt_generate_dialog.txt", seed=None):
+        prompt_filled = self._fill_dialog_prompt(specification, prompt_path)
+        return await self._complete_async(prompt_filled, temperature=0.8, seed=seed, call=self._call("dialog", prompt_path))
+
+    async def agenerate_dialogs(self, specification, n, prompt_path="prompts/prompt_generate_dialog.txt", seed=None):
+        prompt_filled = self._fill_dialog_prompt(specification, prompt_path)
+        return await self._complete_n_async(prompt_filled, temperature=0.8, n=n, seed=seed,
+                                            call=self._call("dialog", prompt_path))
+
+    async def aregenerate_dialog(self, specification, prompt_path="prompts/prompt_generate_dialog.txt", seed=None, attempt=1):
+        prompt_filled = self._fill_dialog_prompt(specification, prompt_path)
+        seed = None if seed is None else seed + attempt * DIALOG_REGENERATION_SEED_STEP
+        return await self._complete_async(prompt_filled, temperature=0.8, seed=seed, sample=attempt,
+                                          call=self._call("dialog", prompt_path, attempt=attempt))
+
+    # === Recuperación escalonada
+    def _fix_prompt(self, output):
+        start = find_start(output)
+        block = output[start:] if start != -1 else output
+        return self._load_prompt(FORMAT_FIX_PROMPT).replace("{BROKEN_OUTPUT_HERE}", block.strip())
+
+    def _fix_client(self):
+        if self._fixer is None:
+            self._fixer = self._sibling(self.format_fix_model)
+        return self._fixer
+
+    def _first_tiers(self, output, call=None):
+        # Sin base_dir: la salida cruda solo se guarda si fallan también los niveles siguientes
+        spec, _ = self._parse_specification(output, call=call)
+        if spec is None:
+            return None, None
+        return spec, "direct" if strict_json(output) is not None else "local_repair"
+
+    def _record_recovery(self, tier, prompt_filled, fix_prompt=None):
+        self.recovery_stats[tier] += 1
+        full_cost = estimate_tokens(prompt_filled) + EXPECTED_SPEC_TOKENS
+        if tier == "local_repair":
+            self.recovery_stats["tokens_saved"] += full_cost
+        elif tier == "format_fix":
+            self.recovery_stats["tokens_saved"] += full_cost - estimate_tokens(fix_prompt) - EXPECTED_SPEC_TOKENS
+        if tier not in ("direct", "failed"):
+            print(f"🩹 Specification recovered via {tier}")
+        return tier
+
+    def _regeneration_seed(self, attempt):
+        return None if self.seed is None else self.seed + attempt
+
+    def generate_specification_with_recovery(self, real_dialog, prompt_path="prompts/...", base_dir=None, dialog_id=None):
+        # Devuelve (spec | None, salida cruda, nivel que la resolvió)
+        prompt_filled = self._fill_specification_prompt(real_dialog, prompt_path)
+        schema = self._output_schema(SPEC_SCHEMA)
+        call = self._call("specification", prompt_path, parse=True)
+        output = self._complete(prompt_filled, temperature=0.7, schema=schema, call=call)
+        for attempt in range(MAX_REGENERATIONS + 1):
+            spec, tier = self._first_tiers(output, call)
+            fix_prompt = None
+            if spec is None:
+                fix_prompt = self._fix_prompt(output)
+                fixer = self._fix_client()
+                fix_call = fixer._call("format_fix", FORMAT_FIX_PROMPT, parse=True)
+                fixed = fixer._complete(fix_prompt, temperature=0, schema=schema, call=fix_call)
+                spec, tier = self._parse_specification(fixed, call=fix_call)[0], "format_fix"
+            if spec is not None:
+                return spec, output, self._record_recovery("regenerate" if attempt else tier, prompt_filled, fix_prompt)
+            if attempt < MAX_REGENERATIONS:
+                call = self._call("specification", prompt_path, parse=True, attempt=attempt + 1)
+                output = self._complete(prompt_filled, temperature=0.7, seed=self._regeneration_seed(attempt + 1),
+                                        sample=attempt + 1, schema=schema, call=call)
+        self._save_raw_output(output, base_dir, dialog_id)
+        return None, output, self._record_recovery("failed", prompt_filled)
+
+    async def agenerate_specification_with_recovery(self, real_dialog, prompt_path="prompts/...", base_dir=None, dialog_id=None):
+        prompt_filled = self._fill_specification_prompt(real_dialog, prompt_path)
+        schema = self._output_schema(SPEC_SCHEMA)
+        call = self._call("specification", prompt_path, parse=True)
+        output = await self._complete_async(prompt_filled, temperature=0.7, schema=schema, call=call)
+        for attempt in range(MAX_REGENERATIONS + 1):
+            spec, tier = self._first_tiers(output, call)
+            fix_prompt = None
+            if spec is None:
+                fix_prompt = self._fix_prompt(output)
+                fixer = self._fix_client()
+                fix_call = fixer._call("format_fix", FORMAT_FIX_PROMPT, parse=True)
+                fixed = await fixer._complete_async(fix_prompt, temperature=0, schema=schema, call=fix_call)
+                spec, tier = self._parse_specification(fixed, call=fix_call)[0], "format_fix"
+            if spec is not None:
+                return spec, output, self._record_recovery("regenerate" if attempt else tier, prompt_filled, fix_prompt)
+            if attempt < MAX_REGENERATIONS:
+                call = self._call("specification", prompt_path, parse=True, attempt=attempt + 1)
+                output = await self._complete_async(prompt_filled, temperature=0.7, seed=self._regeneration_seed(attempt + 1),
+                                                    sample=attempt + 1, schema=schema, call=call)
+        self._save_raw_output(output, base_dir, dialog_id)
+        return None, output, self._record_recovery("failed", prompt_filled)
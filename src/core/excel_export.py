@@ -0,0 +1,83 @@
+import os
+import math
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+# Exportación a Excel en streaming: las lecturas de ficheros van en un pool de
+# hilos con una ventana acotada y las filas se escriben una a una con xlsxwriter
+# en modo constant_memory (cada fila se vuelca a disco al empezar la siguiente).
+# La memoria no crece con el tamaño del corpus.
+
+READ_WORKERS = int(os.getenv("EXPORT_READ_WORKERS", "16"))
+DIALOG_MODES = ("inline", "sheet", "path")  # texto en la fila, hoja aparte, o solo la ruta del fichero
+
+
+def parallel_map(fn, items, max_workers=READ_WORKERS):
+    # Como ThreadPoolExecutor.map pero sin encolar todo de golpe: como mucho
+    # max_workers * 2 resultados pendientes, devueltos en el orden de entrada
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        window = deque()
+        for item in items:
+            window.append(pool.submit(fn, item))
+            if len(window) >= max_workers * 2:
+                yield window.popleft().result()
+        while window:
+            yield window.popleft().result()
+
+
+class StreamingWorkbook:
+    # Con dialogs_sheet, la columna dialog_column se escribe en una hoja aparte y
+    # la hoja principal guarda un enlace interno a esa fila.
+    def __init__(self, path, columns, sheet_name="Sheet1", dialog_column=None, dialogs_sheet=None):
+        import xlsxwriter
+
+        os.makedirs(os.path.dirname(str(path)) or ".", exist_ok=True)
+        self.path = path
+        self.columns = list(columns)
+        self.dialog_column = dialog_column if dialogs_sheet else None
+        self.workbook = xlsxwriter.Workbook(str(path), {"constant_memory": True, "strings_to_urls": False})
+        self.header = self.workbook.add_format({"bold": True})
+        self.sheet = self.workbook.add_worksheet(sheet_name)
+        self.sheet.write_row(0, 0, self.columns, self.header)
+        self.dialogs = None
+        if self.dialog_column:
+            self.dialogs_name = dialogs_sheet
+            self.dialogs = self.workbook.add_worksheet(dialogs_sheet)
+            self.dialogs.write_row(0, 0, ["Row", self.dialog_column], self.header)
+        self.rows = 0
+
+    def add_row(self, row):
+        self.rows += 1
+        n = self.rows
+        for col, name in enumerate(self.columns):
+            value = row.get(name)
+            if value is None or (isinstance(value, float) and math.isnan(value)):
+                continue
+            if name == self.dialog_column:
+                self.dialogs.write_number(n, 0, n)
+                self.dialogs.write_string(n, 1, str(value)[:32767])
+                # Fórmula HYPERLINK en vez de write_url: xlsxwriter no guarda nada por enlace hasta el cierre
+                label = f"{self.dialogs_name} #{n}"
+                self.sheet.write_formula(n, col, f'=HYPERLINK("#\'{self.dialogs_name}\'!B{n + 1}","{label}")', None, label)
+            elif isinstance(value, (int, float)):
+                self.sheet.write_number(n, col, value)
+            else:
+                # Excel corta las celdas en 32767 caracteres
+                self.sheet.write_string(n, col, str(value)[:32767])
+
+    def close(self):
+        self.workbook.close()
+        return self.rows
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def write_rows(path, columns, rows, sheet_name="Sheet1", dialog_column=None, dialogs_sheet=None):
+    with StreamingWorkbook(path, columns, sheet_name, dialog_column, dialogs_sheet) as workbook:
+        for row in rows:
+            workbook.add_row(row)
+    return workbook.rows
@@ -0,0 +1,606 @@
+import json
+import uuid
+import socket
+import asyncio
+from pathlib import Path
+from manifest import get_manifest, fingerprint, text_hash
+from conformance import check_dialog, summary, reason, MIN_SCORE
+
+# Motor de matrices de experimentos: cada fichero de configs/experiments describe
+# modelos × ejes × tipos de spec × versiones de prompt × repeticiones, y aquí se
+# expande a una lista de trabajos sin duplicados. Dos experimentos que piden el
+# mismo diálogo (mismo modelo, prompt, spec y semilla) comparten una sola llamada;
+# lo mismo para la evaluación (mismo diálogo, prompt de evaluación y spec).
+
+METRICS = ["fluency", "coherence", "realism", "fidelity_to_specification", "engagement", "originality"]
+
+DEFAULTS = {
+    "repetitions": 1,
+    "seed": "repetition",
+    "spec_format": "python",
+    "eval_prompt": "prompts/prompt_evaluate.txt",
+    "evaluate": True,
+    "evaluate_with_spec": False,
+    "scores_with_dialog": False,
+    "variant_label": "{model_key}_{axis}_{spec_type}_{version}",
+    "spec_folders": {},
+}
+
+# Comprobación estructural antes del juez (conformance.py). mode: "off" | "report" (solo
+# se guarda junto a las notas) | "reject" (los diálogos rotos no se evalúan) | "regenerate"
+# (se piden de nuevo hasta max_regenerations veces y, si siguen rotos, no se evalúan)
+CONFORMANCE_DEFAULTS = {"mode": "report", "min_score": MIN_SCORE, "max_regenerations": 1}
+CONFORMANCE_MODES = ["off", "report", "reject", "regenerate"]
+
+
+def load_config(path):
+    path = Path(path)
+    with open(path, "r", encoding="utf-8") as f:
+        if path.suffix in (".yaml", ".yml"):
+            import yaml
+            config = yaml.safe_load(f)
+        else:
+            config = json.load(f)
+    config = dict(DEFAULTS, **config)
+    config.setdefault("name", path.stem)
+    for key in ("models", "axes", "versions", "paths", "source"):
+        if key not in config:
+            raise ValueError(f"{path}: missing '{key}' in experiment config")
+    return config
+
+
+def conformance_settings(config):
+    settings = dict(CONFORMANCE_DEFAULTS, **config.get("conformance", {}))
+    if settings["mode"] not in CONFORMANCE_MODES:
+        raise ValueError(f"{config['name']}: unknown conformance mode '{settings['mode']}'")
+    return settings
+
+
+def _versions(config):
+    # Lista ["v1", "v2"] o diccionario {"v5_no_instructions": "humor_v5.txt"}
+    versions = config["versions"]
+    if isinstance(versions, dict):
+        return list(versions.items())
+    return [(v, None) for v in versions]
+
+
+def _spec_types(config, axis, spec_types, fields):
+    source = config["source"]
+    if source["type"] == "spec_file":
+        with open(source["path"], "r", encoding="utf-8") as f:
+            examples = json.load(f)
+        for spec_type in spec_types:
+            yield spec_type, examples[axis][spec_type]
+    elif source["type"] == "spec_dir":
+        spec_dir = Path(source["path"].format(**fields))
+        for spec_file in sorted(spec_dir.glob("*.json")):
+            if spec_types and spec_file.stem not in spec_types:
+                continue
+            with open(spec_file, "r", encoding="utf-8") as f:
+                yield spec_file.stem, json.load(f)
+    else:
+        raise ValueError(f"Unknown spec source '{source['type']}'")
+
+
+def _format_spec(spec, spec_format):
+    if spec_format == "json":
+        return json.dumps(spec, indent=2)
+    return spec
+
+
+def _seed(config, repetition):
+    seed = config["seed"]
+    if seed == "repetition":
+        return repetition
+    return seed
+
+
+def expand_matrix(config):
+    jobs = []
+    conformance = conformance_settings(config)
+    for model_key, model_name in config["models"].items():
+        for axis, spec_types in config["axes"].items():
+            for version, prompt_file in _versions(config):
+                fields = {"model_key": model_key, "model_name": model_name, "axis": axis}
+                for spec_type, spec in _spec_types(config, axis, spec_types, fields):
+                    fields["spec_type"] = spec_type
+                    fields["spec_folder"] = config["spec_folders"].get(axis, "{spec_type}").format(**fields)
+                    for repetition in range(1, config["repetitions"] + 1):
+                        values = dict(fields, version=version, prompt_file=prompt_file, repetition=repetition)
+                        paths = {k: Path(template.format(**values)) for k, template in config["paths"].items()}
+                        jobs.append({
+                            "experiment": config["name"],
+                            "model_key": model_key,
+                            "model_name": model_name,
+                            "axis": axis,
+                            "spec_type": spec_type,
+                            "version": version,
+                            "repetition": repetition,
+                            "seed": _seed(config, repetition),
+                            # seed = repetición: las N repeticiones salen de una sola llamada multi-muestra
+                            "samples": config["repetitions"] if config["seed"] == "repetition" else 1,
+                            "label": config["variant_label"].format(**values),
+                            "spec": _format_spec(spec, config["spec_format"]),
+                            "prompt": paths["prompt"],
+                            "dialog_path": paths["dialog"],
+                            "scores_path": paths.get("scores"),
+                            "eval_prompt": Path(config["eval_prompt"]) if config["evaluate"] else None,
+                            "evaluate_with_spec": config["evaluate_with_spec"],
+                            "scores_with_dialog": config["scores_with_dialog"],
+                            "conformance": conformance,
+                        })
+    return jobs
+
+
+def dialog_key(job):
+    return fingerprint(model=job["model_name"], prompt=job["prompt"], spec=str(job["spec"]), seed=job["seed"])
+
+
+def eval_key(job):
+    if job["eval_prompt"] is None:
+        return None
+    spec = str(job["spec"]) if job["evaluate_with_spec"] else None
+    # Con el texto del diálogo en disco (como batch_evaluate): un diálogo regenerado con
+    # otro texto deja sus notas obsoletas aunque las entradas de la generación no cambien
+    return text_hash(dialog_key(job) + fingerprint(model=job["model_name"], prompt=job["eval_prompt"], spec=spec,
+                                                   dialog=Path(job["dialog_path"])))
+
+
+def dedupe(jobs):
+    # Un trabajo por ruta de salida; los duplicados de contenido se resuelven al ejecutar.
+    # Si dos experimentos escriben el mismo fichero con entradas distintas, gana el último.
+    unique = {}
+    overrides = {}
+    for job in jobs:
+        key = (str(job["dialog_path"]), str(job["scores_path"]))
+        previous = unique.get(key)
+        if previous and (dialog_key(previous), eval_key(previous)) != (dialog_key(job), eval_key(job)):
+            pair = (previous["experiment"], job["experiment"])
+            overrides[pair] = overrides.get(pair, 0) + 1
+        unique[key] = job
+    for (old, new), count in overrides.items():
+        print(f"⚠️ {new} overrides {count} outputs of {old} (same paths, different inputs)")
+    calls = {dialog_key(job) for job in unique.values()}
+    evals = {eval_key(job) for job in unique.values()} - {None}
+    return list(unique.values()), len(calls), len(evals)
+
+
+class MatrixExecutor:
+    # Ejecutor compartido por todas las configuraciones: un generador/evaluador por
+    # modelo (mismo limitador de peticiones y caché), un semáforo global y memoria
+    # de las llamadas ya lanzadas para no repetir trabajo entre experimentos.
+    def __init__(self, backend="groq", max_concurrency=8, **client_kwargs):
+        self.backend = backend
+        self.max_concurrency = max_concurrency
+        self.client_kwargs = client_kwargs
+        self.generators = {}
+        self.evaluators = {}
+        self._dialogs = {}
+        self._samples = {}
+        self._evals = {}
+        self.stats = {"generated": 0, "evaluated": 0, "skipped": 0, "shared": 0, "failed": 0,
+                      "regenerated": 0, "rejected": 0}
+
+    def _generator(self, model_name):
+        from dialog_generator import DialogGenerator
+        if model_name not in self.generators:
+            self.generators[model_name] = DialogGenerator(
+                backend=self.backend, model_name=model_name, max_concurrency=self.max_concurrency, **self.client_kwargs
+            )
+        return self.generators[model_name]
+
+    def _evaluator(self, model_name):
+        from dialog_evaluator import DialogEvaluator
+        if model_name not in self.evaluators:
+            self.evaluators[model_name] = DialogEvaluator(
+                backend=self.backend, model_name=model_name, max_concurrency=self.max_concurrency, **self.client_kwargs
+            )
+        return self.evaluators[model_name]
+
+    def _memo(self, memo, key, factory):
+        # Una llamada fallida no se comparte: el siguiente intento la relanza
+        failed = key in memo and memo[key].done() and memo[key].exception() is not None
+        if key in memo and not failed:
+            self.stats["shared"] += 1
+        else:
+            memo[key] = asyncio.ensure_future(factory())
+        return memo[key]
+
+    def _remember(self, memo, key, value):
+        # Un artefacto al día en disco también sirve a los duplicados de otros experimentos
+        if key not in memo:
+            memo[key] = asyncio.get_running_loop().create_future()
+            memo[key].set_result(value)
+
+    async def _dialog(self, job):
+        path = job["dialog_path"]
+        inputs = dialog_key(job)
+        manifest = get_manifest(path.parent)
+        if manifest.is_fresh(path, inputs):
+            self.stats["skipped"] += 1
+            dialog = path.read_text(encoding="utf-8").strip()
+            self._remember(self._dialogs, inputs, dialog)
+            return dialog
+
+        async def generate():
+            generator = self._generator(job["model_name"])
+            if job.get("samples", 1) > 1:
+                # Semilla de la primera repetición: la muestra r - 1 del lote es la repetición r
+                seed = job["seed"] - (job["repetition"] - 1)
+                group = fingerprint(model=job["model_name"], prompt=job["prompt"], spec=str(job["spec"]),
+                                    n=job["samples"], seed=seed)
+                samples = await self._memo(self._samples, group, lambda: generator.agenerate_dialogs(
+                    job["spec"], n=job["samples"], prompt_path=str(job["prompt"]), seed=seed
+                ))
+                dialog = samples[job["repetition"] - 1]
+            else:
+                dialog = await generator.agenerate_dialog(job["spec"], prompt_path=str(job["prompt"]), seed=job["seed"])
+            self.stats["generated"] += 1
+            dialog = dialog.strip()
+            if _conformance(job)["mode"] == "regenerate":
+                dialog = await self._regenerate(job, generator, dialog)
+            return dialog
+
+        dialog = await self._memo(self._dialogs, inputs, generate)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(dialog, encoding="utf-8")
+        manifest.record(path, inputs, stage="matrix")
+        return dialog
+
+    async def _regenerate(self, job, generator, dialog):
+        # Un diálogo estructuralmente roto se pide otra vez antes de gastar la llamada al juez
+        settings = _conformance(job)
+        for attempt in range(1, settings["max_regenerations"] + 1):
+            report = check_dialog(dialog, job["spec"], settings["min_score"])
+            if report["ok"]:
+                break
+            print(f"🔁 [{job['experiment']}] {job['label']}: {reason(report)} → regenerating (attempt {attempt})")
+            self.stats["regenerated"] += 1
+            dialog = await generator.aregenerate_dialog(job["spec"], prompt_path=str(job["prompt"]),
+                                                        seed=job["seed"], attempt=attempt)
+            dialog = dialog.strip()
+        return dialog
+
+    async def _evaluate(self, job, dialog, structure=None):
+        path = job["scores_path"]
+        inputs = eval_key(job)
+        manifest = get_manifest(path.parent)
+        if manifest.is_fresh(path, inputs):
+            self.stats["skipped"] += 1
+            with open(path, "r", encoding="utf-8") as f:
+                return json.load(f)
+
+        async def evaluate():
+            scores = await self._evaluator(job["model_name"]).aevaluate(
+                generated_dialog=dialog,
+                specification=job["spec"] if job["evaluate_with_spec"] else None,
+                prompt_path=str(job["eval_prompt"])
+            )
+            self.stats["evaluated"] += 1
+            return scores
+
+        scores = dict(await self._memo(self._evals, inputs, evaluate))
+        scores["Variant"] = job["label"]
+        if structure is not None:
+            scores["structure"] = structure
+        if job["scores_with_dialog"]:
+            scores["Dialog"] = dialog
+            scores["Specification"] = job["spec"] if isinstance(job["spec"], str) else json.dumps(job["spec"], indent=2)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(scores, f, indent=2)
+        manifest.record(path, inputs, stage="matrix")
+        return scores
+
+    async def execute(self, job):
+        dialog = await self._dialog(job)
+        settings = _conformance(job)
+        structure = None
+        if settings["mode"] != "off":
+            structure = summary(check_dialog(dialog, job["spec"], settings["min_score"]))
+        scores = {}
+        if structure and not structure["ok"] and settings["mode"] in ("reject", "regenerate"):
+            self.stats["rejected"] += 1
+            print(f"🚫 [{job['experiment']}] {job['label']}: {reason(structure)} → not sent to the judge")
+            return result_row(job, dialog, scores, structure)
+        if job["eval_prompt"] is not None and job["scores_path"] is not None:
+            scores = await self._evaluate(job, dialog, structure)
+        print(f"✅ [{job['experiment']}] {job['label']}")
+        return result_row(job, dialog, scores, structure)
+
+    async def run_job(self, job, semaphore):
+        async with semaphore:
+            try:
+                return await self.execute(job)
+            except Exception as e:
+                self.stats["failed"] += 1
+                print(f"❌ [{job['experiment']}] {job['label']}: {e}")
+                return None
+
+    async def run(self, jobs):
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+        rows = await asyncio.gather(*(self.run_job(job, semaphore) for job in jobs))
+        return [row for row in rows if row is not None]
+
+    async def _heartbeat(self, queue, job_id, owner):
+        while True:
+            await asyncio.sleep(queue.lease_seconds / 3)
+            if not queue.heartbeat(job_id, owner):
+                print(f"⚠️ Lease lost: {job_id}")
+                return
+
+    async def _queue_worker(self, queue, owner, poll_seconds, ids=None):
+        while True:
+            leased = queue.lease(owner, ids)
+            if leased is None:
+                counts = queue.stats(ids)
+                if counts["pending"] == 0 and counts["leased"] == 0:
+                    return
+                # Otros workers tienen trabajos en curso: si mueren, sus leases caducan aquí
+                await asyncio.sleep(poll_seconds)
+                continue
+
+            job = job_from_payload(leased["payload"])
+            heartbeat = asyncio.create_task(self._heartbeat(queue, leased["id"], owner))
+            try:
+                row = await self.execute(job)
+                queue.complete(leased["id"], owner, row)
+            except Exception as e:
+                self.stats["failed"] += 1
+                state = queue.fail(leased["id"], owner, e, getattr(e, "raw_output", None))
+                print(f"❌ [{job['experiment']}] {job['label']} (attempt {leased['attempt']}, → {state}): {e}")
+            finally:
+                heartbeat.cancel()
+
+    async def run_queue(self, queue, worker_id=None, poll_seconds=5, ids=None):
+        # Tantos consumidores como concurrencia máxima, todos con el mismo worker_id de proceso;
+        # con ids solo se toman esos trabajos y no lo que otras campañas dejaron en la cola
+        owner = worker_id or f"{socket.gethostname()}-{uuid.uuid4().hex[:8]}"
+        await asyncio.gather(*(self._queue_worker(queue, owner, poll_seconds, ids) for _ in range(self.max_concurrency)))
+
+
+def _conformance(job):
+    # Trabajos encolados antes de que existiera la comprobación estructural
+    return job.get("conformance") or CONFORMANCE_DEFAULTS
+
+
+def job_id(job):
+    # Ruta de salida + hash de entradas: si cambia el prompt o la spec es otro trabajo
+    inputs = text_hash(dialog_key(job) + str(eval_key(job)))[:12]
+    return f"{job['dialog_path']}|{job['scores_path']}|{inputs}"
+
+
+def job_to_payload(job):
+    return {k: str(v) if isinstance(v, Path) else v for k, v in job.items()}
+
+
+def job_from_payload(payload):
+    job = dict(payload)
+    for key in ("prompt", "dialog_path", "scores_path", "eval_prompt"):
+        if job.get(key) is not None:
+            job[key] = Path(job[key])
+    return job
+
+
+def outputs_fresh(job, row):
+    # Misma comprobación que MatrixExecutor._dialog/_evaluate; las notas solo si el
+    # trabajo llegó al juez (un diálogo rechazado por conformance no tiene fichero de notas)
+    path = Path(job["dialog_path"])
+    if not get_manifest(path.parent).is_fresh(path, dialog_key(job)):
+        return False
+    if job["scores_path"] is None or job["eval_prompt"] is None or all(row.get(m) is None for m in METRICS):
+        return True
+    path = Path(job["scores_path"])
+    return get_manifest(path.parent).is_fresh(path, eval_key(job))
+
+
+def result_row(job, dialog, scores, structure=None):
+    row = {
+        "experiment": job["experiment"],
+        "model": job["model_name"],
+        "axis": job["axis"],
+        "spec_name": job["spec_type"],
+        "version": job["version"],
+        "run": job["repetition"],
+        "Variant": job["label"],
+    }
+    for metric in METRICS:
+        row[metric] = scores.get(metric)
+    row["comments"] = scores.get("comments")
+    if structure is not None:
+        row["structural_score"] = structure["structural_score"]
+        row["turns"] = structure["turns"]
+        row["expected_turns"] = structure["expected_turns"]
+        row["structural_issues"] = ", ".join(structure["issues"])
+    row["dialog_text"] = dialog
+    return row
+
+
+def write_excel(rows, excel_path):
+    import pandas as pd
+
+    excel_path = Path(excel_path)
+    excel_path.parent.mkdir(parents=True, exist_ok=True)
+    pd.DataFrame(rows).to_excel(excel_path, index=False)
+    print(f"✅ Saved Excel to: {excel_path}")
+
+
+def run_configs(config_paths, backend="groq", max_concurrency=8, dry_run=False, queue_path=None, adaptive=False,
+                conformance=None, **client_kwargs):
+    configs = [load_config(path) for path in config_paths]
+    if conformance:
+        for config in configs:
+            config["conformance"] = dict(config.get("conformance", {}), mode=conformance)
+    jobs = [job for config in configs for job in expand_matrix(config)]
+    jobs, n_dialogs, n_evals = dedupe(jobs)
+    print(f"🧮 {len(configs)} experiments → {len(jobs)} jobs, {n_dialogs} distinct dialogs, {n_evals} distinct evaluations")
+    if dry_run:
+        return jobs
+
+    executor = MatrixExecutor(backend=backend, max_concurrency=max_concurrency, **client_kwargs)
+    if adaptive:
+        settings = {config["name"]: adaptive_settings(config) for config in configs}
+        rows = asyncio.run(run_adaptive(executor, jobs, settings, queue_path))
+    elif queue_path:
+        rows = run_queue(executor, queue_path, jobs)
+    else:
+        rows = asyncio.run(executor.run(jobs))
+    for config in configs:
+        if config.get("excel") and not any(r["experiment"] == config["name"] for r in rows):
+            print(f"⚠️ No dialogs were generated or evaluated for {config['name']}.")
+        elif config.get("excel"):
+            write_excel([r for r in rows if r["experiment"] == config["name"]], config["excel"])
+    print(f"📊 {executor.stats}")
+    return rows
+
+
+def run_queue(executor, queue_path, jobs=()):
+    # Modo duradero: los trabajos se registran en la cola (idempotente) y este proceso
+    # se une como un worker más. Varios procesos pueden lanzar lo mismo a la vez; al
+    # reanudar tras una caída solo se repite lo que no llegó a completarse.
+    return asyncio.run(arun_queue(executor, queue_path, jobs))
+
+
+async def arun_queue(executor, queue_path, jobs=(), only_jobs=False):
+    from work_queue import WorkQueue
+
+    queue = WorkQueue(queue_path)
+    ids = [job_id(job) for job in jobs]
+    added = queue.enqueue_many([(i, job_to_payload(job)) for i, job in zip(ids, jobs)])
+    # Un trabajo "done" solo se salta si sus ficheros siguen al día según el manifest
+    done = queue.results()
+    stale = [i for i, job in zip(ids, jobs) if i in done and not outputs_fresh(job, done[i])]
+    reopened = queue.reopen(stale) if stale else 0
+    print(f"📋 Queue {queue_path}: {added} new jobs, {reopened} done jobs with stale outputs reopened, {queue.stats()}")
+    await executor.run_queue(queue, ids=set(ids) if only_jobs else None)
+    dead = queue.dead_letters()
+    if dead:
+        print(f"💀 {len(dead)} jobs in dead-letter list (python src/core/work_queue.py dead {queue_path})")
+    results = queue.results()
+    return [results[i] for i in ids if i in results]
+
+
+# === Muestreo adaptativo: en lugar de lanzar todas las repeticiones de cada celda
+# (modelo × eje × tipo de spec × versión), se lanzan por rondas y cada celda se
+# detiene cuando el intervalo de su nota media es lo bastante estrecho, cuando ya
+# está claramente separado del de todas las demás versiones, o al llegar al tope
+# de repeticiones de la configuración.
+ADAPTIVE_DEFAULTS = {
+    "min_samples": 3,     # repeticiones de la primera ronda
+    "ci_width": 1.0,      # anchura máxima del intervalo del 95 % (escala 1-5)
+    "sd_floor": 0.25,     # desviación mínima supuesta: con 2-3 notas iguales la varianza observada es 0
+    "separation": True,   # parar si el intervalo no se solapa con el de ninguna otra versión
+    "metrics": METRICS,   # la nota de la celda es la media de estos criterios
+}
+# t de Student (dos colas, 95 %) para 1..30 grados de libertad; más allá, la normal
+T_95 = [12.706, 4.303, 3.182, 2.776, 2.571, 2.447, 2.365, 2.306, 2.262, 2.228, 2.201, 2.179, 2.160, 2.145, 2.131,
+        2.120, 2.110, 2.101, 2.093, 2.086, 2.080, 2.074, 2.069, 2.064, 2.060, 2.056, 2.052, 2.048, 2.045, 2.042]
+
+
+def adaptive_settings(config):
+    # Bloque opcional "adaptive" en la configuración; el tope es "repetitions"
+    settings = dict(ADAPTIVE_DEFAULTS, **config.get("adaptive", {}))
+    settings["max_samples"] = config["repetitions"]
+    settings["min_samples"] = min(settings["min_samples"], config["repetitions"])
+    return settings
+
+
+def cell_key(job):
+    return job["experiment"], job["model_key"], job["axis"], job["spec_type"], job["version"]
+
+
+def interval(values, sd_floor=0.0):
+    # Media y semianchura del intervalo t del 95 %
+    n = len(values)
+    mean = sum(values) / n
+    if n < 2:
+        return mean, float("inf")
+    sd = max((sum((v - mean) ** 2 for v in values) / (n - 1)) ** 0.5, sd_floor)
+    t = T_95[n - 2] if n - 1 <= len(T_95) else 1.96
+    return mean, t * sd / n ** 0.5
+
+
+def cell_score(row, metrics):
+    values = [row.get(m) for m in metrics]
+    values = [v for v in values if isinstance(v, (int, float))]
+    return sum(values) / len(values) if values else None
+
+
+def stop_reason(cell, scores, settings, competitors):
+    # None si la celda debe seguir muestreando
+    values = scores[cell]
+    if len(values) >= settings["max_samples"]:
+        return "cap"
+    if len(values) < settings["min_samples"]:
+        return None
+    mean, half = interval(values, settings["sd_floor"])
+    if 2 * half <= settings["ci_width"]:
+        return "narrow"
+    if settings["separation"] and competitors:
+        others = [interval(scores[c], settings["sd_floor"]) for c in competitors if len(scores[c]) >= 2]
+        if len(others) == len(competitors) and all(abs(mean - m) > half + h for m, h in others):
+            return "separated"
+    return None
+
+
+async def run_adaptive(executor, jobs, settings, queue_path=None):
+    by_cell = {}
+    cell_of = {}  # las filas de resultados llevan el nombre del modelo, no su clave
+    for job in jobs:
+        by_cell.setdefault(cell_key(job), {})[job["repetition"]] = job
+        cell_of[job["experiment"], job["model_name"], job["axis"], job["spec_type"], job["version"]] = cell_key(job)
+    groups = {}
+    for cell in by_cell:
+        groups.setdefault(cell[:-1], []).append(cell)
+    scores = {cell: [] for cell in by_cell}
+    next_rep = {cell: 1 for cell in by_cell}
+    active = set(by_cell)
+    stopped = {}
+    rows = []
+
+    round_number = 0
+    while active:
+        round_number += 1
+        batch = []
+        for cell in sorted(active):
+            # Primera ronda: min_samples repeticiones; después, una más por celda activa
+            upto = settings[cell[0]]["min_samples"] if round_number == 1 else next_rep[cell]
+            for repetition in range(next_rep[cell], upto + 1):
+                job = by_cell[cell].get(repetition)
+                if job is not None:
+                    # Una repetición por llamada: no se piden por adelantado muestras que quizá no hagan falta
+                    batch.append(dict(job, samples=1))
+            next_rep[cell] = max(next_rep[cell], upto + 1)
+        if not batch:
+            break
+        if queue_path:
+            # Solo los trabajos de la ronda: los pendientes de otras campañas en la misma
+            # cola gastarían el presupuesto que el muestreo adaptativo intenta ahorrar
+            round_rows = await arun_queue(executor, queue_path, batch, only_jobs=True)
+        else:
+            round_rows = await executor.run(batch)
+        rows.extend(round_rows)
+        for row in round_rows:
+            job_cell = cell_of[row["experiment"], row["model"], row["axis"], row["spec_name"], row["version"]]
+            score = cell_score(row, settings[row["experiment"]]["metrics"])
+            if score is not None:
+                scores[job_cell].append(score)
+
+        for cell in sorted(active):
+            competitors = [c for c in groups[cell[:-1]] if c != cell]
+            reason = stop_reason(cell, scores, settings[cell[0]], competitors)
+            if reason is None and next_rep[cell] > max(by_cell[cell]):
+                reason = "cap"
+            if reason:
+                stopped[cell] = reason
+        active -= set(stopped)
+        print(f"🎯 Round {round_number}: {len(batch)} jobs, {len(active)} cells still sampling")
+
+    total = len(jobs)
+    ran = sum(next_rep[c] - 1 for c in by_cell)
+    reasons = {}
+    for reason in stopped.values():
+        reasons[reason] = reasons.get(reason, 0) + 1
+    print(f"🎯 Adaptive sampling: {ran}/{total} jobs ({1 - ran / total:.0%} saved), cells stopped: {reasons}")
+    executor.stats["adaptive_saved"] = total - ran
+    return rows
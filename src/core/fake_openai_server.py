@@ -0,0 +1,336 @@
+import json
+import time
+import math
+import random
+import hashlib
+import threading
+from collections import deque
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from rate_limiter import MODEL_LIMITS, DEFAULT_LIMITS, estimate_tokens
+from llm_backends import FAKE_SPEC, FAKE_DIALOG, FAKE_SCORES, FakeBackend
+
+# Servidor local compatible con la API de chat completions de OpenAI/Groq para
+# pruebas de carga sin red: latencia aleatoria (TTFT log-normal + tokens/s),
+# límites de peticiones y tokens por minuto con respuestas 429 (y 413 para una
+# petición mayor que el límite) en el formato de Groq, streaming SSE y `n` > 1. Las respuestas salen del propio corpus de
+# experiments/ (specs, diálogos y puntuaciones reales), elegidas de forma
+# determinista a partir del prompt y la semilla.
+#
+#   PYTHONPATH=src/core python src/core/fake_openai_server.py --port 8765
+#   GROQ_BASE_URL=http://127.0.0.1:8765/openai/v1 GROQ_API_KEY=fake PYTHONPATH=src/core \
+#       python src/batch_scripts/batch_matrix.py configs/experiments/edge_cases.json
+
+DEFAULT_PORT = 8765
+TTFT_MEDIAN = 0.35       # segundos
+TTFT_SIGMA = 0.5         # dispersión de la log-normal
+TOKENS_PER_SECOND = 250  # velocidad de generación tras el primer token
+
+
+def load_corpus(store_path=None):
+    # Salidas reales por tipo de prompt, desde el almacén de resultados
+    from results_store import get_default_store, ResultsStore
+
+    store = ResultsStore(store_path) if store_path else get_default_store()
+    store.refresh()
+    corpus = {"spec": [], "dialog": [], "scores": []}
+    query = "SELECT kind, content FROM artifacts WHERE kind IN ('spec', 'dialog', 'scores') ORDER BY path"
+    for row in store.iter_query(query):
+        content = row["content"].strip()
+        if content:
+            corpus[row["kind"]].append(content)
+    # Sin corpus (repositorio recién clonado): las respuestas del backend fake
+    for kind, fallback in (("spec", json.dumps(FAKE_SPEC, indent=2)), ("dialog", FAKE_DIALOG),
+                           ("scores", json.dumps(FAKE_SCORES, indent=2))):
+        if not corpus[kind]:
+            corpus[kind].append(fallback)
+    return corpus
+
+
+def message_text(message):
+    # El contenido puede ser texto o una lista de partes {"type": "text", "text": ...}
+    content = message.get("content") or ""
+    if isinstance(content, list):
+        return "".join(part.get("text", "") for part in content if isinstance(part, dict))
+    return str(content)
+
+
+def prompt_kind(prompt):
+    # Misma clasificación que FakeBackend.default_responder
+    answer = FakeBackend.default_responder(prompt)
+    if answer == FAKE_DIALOG:
+        return "dialog"
+    return "scores" if answer == json.dumps(FAKE_SCORES, indent=2) else "spec"
+
+
+class RateWindow:
+    # Ventana deslizante de 60 s por modelo: peticiones y tokens consumidos
+    def __init__(self, requests_per_minute, tokens_per_minute):
+        self.rpm = requests_per_minute
+        self.tpm = tokens_per_minute
+        self.events = deque()
+        self._lock = threading.Lock()
+
+    def fits(self, tokens):
+        # Una petición mayor que el límite por minuto no cabe nunca en la ventana
+        return tokens <= self.tpm
+
+    def try_acquire(self, tokens):
+        # Devuelve None si se admite la petición, o (tipo, usados, segundos de espera)
+        with self._lock:
+            now = time.monotonic()
+            while self.events and now - self.events[0][0] >= 60:
+                self.events.popleft()
+            if len(self.events) + 1 > self.rpm:
+                return "requests", len(self.events), 60 - (now - self.events[0][0])
+            used = sum(t for _, t in self.events)
+            if used + tokens > self.tpm:
+                # Hay que esperar a que caduquen los eventos necesarios para que quepa
+                freed, wait = 0, 60.0
+                for ts, t in self.events:
+                    freed += t
+                    if used - freed + tokens <= self.tpm:
+                        wait = 60 - (now - ts)
+                        break
+                return "tokens", used, wait
+            self.events.append((now, tokens))
+            return None
+
+
+def groq_wait(seconds):
+    # Mismo formato que Groq: "4.94s", "1m2.5s"
+    if seconds >= 60:
+        return f"{int(seconds // 60)}m{seconds % 60:.1f}s"
+    return f"{seconds:.2f}s"
+
+
+def rate_limit_body(model, kind, limit, used, requested, wait):
+    unit = "tokens per minute (TPM)" if kind == "tokens" else "requests per minute (RPM)"
+    return {
+        "error": {
+            "message": (
+                f"Rate limit reached for model `{model}` in organization `org_fake` on {unit}: "
+                f"Limit {limit}, Used {used}, Requested {requested}. Please try again in {groq_wait(wait)}. "
+                "Visit https://console.groq.com/docs/rate-limits for more information."
+            ),
+            "type": kind,
+            "code": "rate_limit_exceeded",
+        }
+    }
+
+
+def too_large_body(model, limit, requested):
+    # Groq responde 413 (sin retry-after): reintentar no sirve, hay que acortar el mensaje
+    return {
+        "error": {
+            "message": (
+                f"Request too large for model `{model}` in organization `org_fake` on tokens per minute (TPM): "
+                f"Limit {limit}, Requested {requested}, please reduce your message size and try again. "
+                "Visit https://console.groq.com/docs/rate-limits for more information."
+            ),
+            "type": "tokens",
+            "code": "rate_limit_exceeded",
+        }
+    }
+
+
+class FakeOpenAIServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, corpus, ttft_median=TTFT_MEDIAN, ttft_sigma=TTFT_SIGMA,
+                 tokens_per_second=TOKENS_PER_SECOND, latency_scale=1.0, limits=None, error_rate=0.0, seed=0):
+        super().__init__(address, Handler)
+        self.corpus = corpus
+        self.ttft_median = ttft_median
+        self.ttft_sigma = ttft_sigma
+        self.tokens_per_second = tokens_per_second
+        self.latency_scale = latency_scale
+        self.limits = limits
+        self.error_rate = error_rate
+        self.random = random.Random(seed)
+        self.windows = {}
+        self.stats = {"requests": 0, "completions": 0, "rate_limited": 0, "too_large": 0, "errors": 0,
+                      "prompt_tokens": 0, "completion_tokens": 0}
+        self._lock = threading.Lock()
+
+    def window(self, model):
+        with self._lock:
+            if model not in self.windows:
+                limits = self.limits or MODEL_LIMITS.get(model, DEFAULT_LIMITS)
+                self.windows[model] = RateWindow(limits["requests_per_minute"], limits["tokens_per_minute"])
+            return self.windows[model]
+
+    def count(self, **deltas):
+        with self._lock:
+            for key, value in deltas.items():
+                self.stats[key] += value
+
+    def ttft(self):
+        with self._lock:
+            sample = self.random.lognormvariate(math.log(self.ttft_median), self.ttft_sigma)
+        return sample * self.latency_scale
+
+    def failure(self):
+        with self._lock:
+            return self.random.random() < self.error_rate
+
+    def choose(self, kind, prompt, seed, index):
+        # Determinista: mismo prompt, semilla y muestra → misma respuesta
+        options = self.corpus[kind]
+        digest = hashlib.sha256(f"{prompt}|{seed}|{index}".encode("utf-8")).digest()
+        return options[int.from_bytes(digest[:8], "big") % len(options)]
+
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, status, body, headers=None):
+        data = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        if self.path.rstrip("/").endswith("/models"):
+            models = sorted(set(MODEL_LIMITS) | set(self.server.windows))
+            return self._send_json(200, {"object": "list", "data": [{"id": m, "object": "model"} for m in models]})
+        if self.path.rstrip("/").endswith("/stats"):
+            return self._send_json(200, self.server.stats)
+        self._send_json(404, {"error": {"message": f"Unknown path {self.path}", "type": "invalid_request_error"}})
+
+    def do_POST(self):
+        if not self.path.rstrip("/").endswith("/chat/completions"):
+            return self._send_json(404, {"error": {"message": f"Unknown path {self.path}", "type": "invalid_request_error"}})
+        request = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        server = self.server
+        server.count(requests=1)
+
+        model = request.get("model", "fake")
+        messages = request.get("messages") or [{}]
+        prompt = "\n".join(message_text(m) for m in messages)
+        user_prompt = message_text(messages[-1])
+        n = int(request.get("n") or 1)
+        seed = request.get("seed")
+        kind = prompt_kind(user_prompt)
+        outputs = [server.choose(kind, prompt, seed, i) for i in range(n)]
+        prompt_tokens = estimate_tokens(prompt)
+        completion_tokens = sum(estimate_tokens(o) for o in outputs)
+
+        window = server.window(model)
+        if not window.fits(prompt_tokens + completion_tokens):
+            server.count(too_large=1)
+            return self._send_json(413, too_large_body(model, window.tpm, prompt_tokens + completion_tokens))
+        limited = window.try_acquire(prompt_tokens + completion_tokens)
+        if limited:
+            kind_limited, used, wait = limited
+            server.count(rate_limited=1)
+            limit = window.tpm if kind_limited == "tokens" else window.rpm
+            requested = prompt_tokens + completion_tokens if kind_limited == "tokens" else 1
+            return self._send_json(429, rate_limit_body(model, kind_limited, limit, used, requested, wait),
+                                   {"retry-after": str(math.ceil(wait))})
+        if server.failure():
+            server.count(errors=1)
+            return self._send_json(500, {"error": {"message": "Internal server error", "type": "internal_server_error"}})
+
+        usage = {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens,
+                 "total_tokens": prompt_tokens + completion_tokens}
+        server.count(completions=1, prompt_tokens=prompt_tokens, completion_tokens=completion_tokens)
+        completion_id = f"chatcmpl-fake-{server.stats['requests']}"
+        ttft = server.ttft()
+        per_token = server.latency_scale / server.tokens_per_second if server.tokens_per_second else 0.0
+
+        if request.get("stream"):
+            return self._stream(completion_id, model, outputs, usage, ttft, per_token,
+                                (request.get("stream_options") or {}).get("include_usage"))
+
+        time.sleep(ttft + per_token * completion_tokens)
+        self._send_json(200, {
+            "id": completion_id,
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": model,
+            "choices": [
+                {"index": i, "message": {"role": "assistant", "content": o}, "finish_reason": "stop"}
+                for i, o in enumerate(outputs)
+            ],
+            "usage": usage,
+            "x_groq": {"id": completion_id, "usage": usage},
+        })
+
+    def _stream(self, completion_id, model, outputs, usage, ttft, per_token, include_usage):
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        self.close_connection = True
+
+        def event(choices, **extra):
+            chunk = {"id": completion_id, "object": "chat.completion.chunk", "created": int(time.time()),
+                     "model": model, "choices": choices}
+            chunk.update(extra)
+            self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode("utf-8"))
+            self.wfile.flush()
+
+        time.sleep(ttft)
+        for i, output in enumerate(outputs):
+            # Trozos de ~4 tokens, como un stream real
+            words = output.split(" ")
+            for start in range(0, len(words), 3):
+                piece = " ".join(words[start:start + 3]) + (" " if start + 3 < len(words) else "")
+                event([{"index": i, "delta": {"role": "assistant", "content": piece}, "finish_reason": None}])
+                time.sleep(per_token * estimate_tokens(piece))
+            event([{"index": i, "delta": {}, "finish_reason": "stop"}])
+        # Groq envía el uso en x_groq del último trozo; OpenAI en un trozo final sin choices
+        if include_usage:
+            event([], usage=usage)
+        else:
+            event([], x_groq={"id": completion_id, "usage": usage})
+        self.wfile.write(b"data: [DONE]\n\n")
+        self.wfile.flush()
+
+
+def start_server(port=DEFAULT_PORT, host="127.0.0.1", corpus=None, **settings):
+    # Arranca el servidor en un hilo (para pruebas desde Python); devuelve el servidor
+    server = FakeOpenAIServer((host, port), corpus or load_corpus(), **settings)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Offline OpenAI/Groq-compatible server for load tests.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--ttft-median", type=float, default=TTFT_MEDIAN, help="median time to first token (s)")
+    parser.add_argument("--ttft-sigma", type=float, default=TTFT_SIGMA, help="log-normal sigma of the TTFT")
+    parser.add_argument("--tokens-per-second", type=float, default=TOKENS_PER_SECOND)
+    parser.add_argument("--latency-scale", type=float, default=1.0, help="0 = instant responses")
+    parser.add_argument("--rpm", type=int, help="requests per minute for every model (default: MODEL_LIMITS)")
+    parser.add_argument("--tpm", type=int, help="tokens per minute for every model (default: MODEL_LIMITS)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of requests answered with 500")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--store", help="results store with the canned outputs (default: experiments/results.sqlite)")
+    args = parser.parse_args()
+
+    limits = None
+    if args.rpm or args.tpm:
+        limits = {"requests_per_minute": args.rpm or DEFAULT_LIMITS["requests_per_minute"],
+                  "tokens_per_minute": args.tpm or DEFAULT_LIMITS["tokens_per_minute"]}
+    corpus = load_corpus(args.store)
+    print(f"📚 Canned outputs: " + ", ".join(f"{len(v)} {k}" for k, v in corpus.items()))
+    server = FakeOpenAIServer((args.host, args.port), corpus, ttft_median=args.ttft_median, ttft_sigma=args.ttft_sigma,
+                              tokens_per_second=args.tokens_per_second, latency_scale=args.latency_scale,
+                              limits=limits, error_rate=args.error_rate, seed=args.seed)
+    print(f"🚀 Fake OpenAI server on http://{args.host}:{args.port}/openai/v1 (GROQ_BASE_URL)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print(f"\n📊 {server.stats}")
@@ -0,0 +1,254 @@
+import json
+
+# Parser JSON tolerante de una sola pasada para salidas de modelo: comillas
+# tipográficas, claves sin comillas, comas de más o de menos, cierres que faltan
+# (salida truncada) y sintaxis de literales Python ('texto', True, None, tuplas).
+# Sustituye las cadenas de re.sub y el ast.literal_eval que había repartidos
+# entre DialogGenerator, DialogEvaluator y repair_failed_specs.py.
+
+OPEN_QUOTES = {'"': '"”', "“": '”"', "”": '”"', "'": "'", "‘": "’'"}
+ESCAPES = {'"': '"', "'": "'", "\\": "\\", "/": "/", "b": "\b", "f": "\f", "n": "\n", "r": "\r", "t": "\t"}
+LITERALS = {"true": True, "false": False, "null": None, "True": True, "False": False, "None": None}
+WHITESPACE = " \t\r\n "
+
+
+class _Parser:
+    def __init__(self, text):
+        self.text = text
+        self.n = len(text)
+        self.i = 0
+
+    def peek(self):
+        return self.text[self.i] if self.i < self.n else ""
+
+    def skip(self):
+        # Espacios y comentarios // o # entre tokens
+        text, n = self.text, self.n
+        while self.i < n:
+            ch = text[self.i]
+            if ch in WHITESPACE:
+                self.i += 1
+            elif ch == "#" or text.startswith("//", self.i):
+                end = text.find("\n", self.i)
+                self.i = n if end == -1 else end + 1
+            else:
+                return
+
+    def value(self):
+        self.skip()
+        ch = self.peek()
+        if ch == "{":
+            return self.obj()
+        if ch in "[(":
+            return self.array()
+        if ch in OPEN_QUOTES:
+            return self.string()
+        if ch == "-" or ch.isdigit():
+            return self.number()
+        return self.bare_value()
+
+    def obj(self):
+        self.i += 1
+        result = {}
+        while True:
+            self.skip()
+            ch = self.peek()
+            if ch == "":
+                return result  # falta el cierre: salida truncada
+            if ch == "}":
+                self.i += 1
+                return result
+            if ch in ",;":
+                self.i += 1
+                continue
+            if ch in "])":
+                # Cierre equivocado: lo aceptamos como fin del objeto
+                self.i += 1
+                return result
+            key = self.string(key=True) if ch in OPEN_QUOTES else self.bare(":=,}\n")
+            self.skip()
+            if self.peek() in ":=":
+                self.i += 1
+            elif self.peek() in ",}":
+                result[str(key)] = None
+                continue
+            result[str(key)] = self.value()
+
+    def array(self):
+        self.i += 1
+        result = []
+        while True:
+            self.skip()
+            ch = self.peek()
+            if ch == "":
+                return result
+            if ch in "]})":
+                self.i += 1
+                return result
+            if ch == ",":
+                self.i += 1
+                continue
+            start = self.i
+            result.append(self.value())
+            if self.i == start:
+                self.i += 1  # carácter que no inicia ningún valor: se descarta
+
+    def string(self, key=False):
+        text, n = self.text, self.n
+        closers = OPEN_QUOTES[text[self.i]]
+        self.i += 1
+        chunks = []
+        start = self.i
+        while self.i < n:
+            ch = text[self.i]
+            if ch == "\\" and self.i + 1 < n:
+                chunks.append(text[start:self.i])
+                esc = text[self.i + 1]
+                if esc == "u" and self.i + 6 <= n:
+                    try:
+                        chunks.append(chr(int(text[self.i + 2:self.i + 6], 16)))
+                        self.i += 6
+                        start = self.i
+                        continue
+                    except ValueError:
+                        pass
+                chunks.append(ESCAPES.get(esc, esc))
+                self.i += 2
+                start = self.i
+                continue
+            if ch in closers and self._closes(self.i + 1, key):
+                chunks.append(text[start:self.i])
+                self.i += 1
+                return "".join(chunks)
+            if key and ch == ":" and self._next_is_value(self.i + 1):
+                # "P1: "tenso"" → clave P1 sin comilla de cierre
+                chunks.append(text[start:self.i])
+                return "".join(chunks).strip()
+            if ch == "\n" and not key and self._next_is_key(self.i + 1):
+                # Falta la comilla de cierre al final de la línea
+                chunks.append(text[start:self.i])
+                return "".join(chunks).rstrip()
+            self.i += 1
+        chunks.append(text[start:])
+        return "".join(chunks)
+
+    def _closes(self, j, key):
+        # Una comilla cierra la cadena solo si lo que sigue tiene sentido estructural;
+        # si no, es una comilla interna sin escapar ("dijo "hola" y se fue")
+        text, n = self.text, self.n
+        while j < n and text[j] in " \t\r ":
+            j += 1
+        if j >= n:
+            return True
+        ch = text[j]
+        if ch in ",:}])\n" or (key and ch == "="):
+            return True
+        # Falta la coma entre dos elementos: "a" "b"
+        return ch in OPEN_QUOTES and self._looks_like_next_item(j)
+
+    def _looks_like_next_item(self, j):
+        text, n = self.text, self.n
+        closers = OPEN_QUOTES[text[j]]
+        k = j + 1
+        while k < n and text[k] not in closers and text[k] != "\n":
+            k += 1
+        k += 1
+        while k < n and text[k] in " \t\r":
+            k += 1
+        return k >= n or text[k] in ",:}]\n"
+
+    def _next_is_value(self, j):
+        text, n = self.text, self.n
+        while j < n and text[j] in " \t":
+            j += 1
+        return j < n and text[j] in OPEN_QUOTES
+
+    def _next_is_key(self, j):
+        text, n = self.text, self.n
+        while j < n and text[j] in WHITESPACE:
+            j += 1
+        return j >= n or text[j] in "}]" or (text[j] in OPEN_QUOTES and self._looks_like_next_item(j))
+
+    def number(self):
+        raw = self.bare_value()
+        for cast in (int, float):
+            try:
+                return cast(raw)
+            except ValueError:
+                pass
+        # "4/5" → 4 (puntuación sobre 5); otros textos ("3-4", "4 (good)") se dejan tal cual
+        head, sep, _ = raw.partition("/")
+        if sep:
+            for cast in (int, float):
+                try:
+                    return cast(head.strip())
+                except ValueError:
+                    pass
+        return raw
+
+    def bare_value(self):
+        # Valor sin comillas: termina en , } ] o fin de línea; los paréntesis se
+        # equilibran ("4 (good)"), y un ) sin abrir cierra una tupla que lo contiene
+        text, n = self.text, self.n
+        start = self.i
+        depth = 0
+        while self.i < n:
+            ch = text[self.i]
+            if ch in "}]\n" or (depth == 0 and ch in ",)"):
+                break
+            if ch == "(":
+                depth += 1
+            elif ch == ")":
+                depth -= 1
+            self.i += 1
+        word = text[start:self.i].strip()
+        return LITERALS.get(word, word)
+
+    def bare(self, stops):
+        text, n = self.text, self.n
+        start = self.i
+        while self.i < n and text[self.i] not in stops:
+            self.i += 1
+        word = text[start:self.i].strip()
+        return LITERALS.get(word, word)
+
+
+def find_start(text):
+    start = text.find("{")
+    return start if start != -1 else text.find("[")
+
+
+def strict_json(text):
+    # JSON válido tal cual entre el primer { y el último } (el caso habitual); None si no
+    start = find_start(text)
+    if start == -1:
+        return None
+    end = text.rfind("}" if text[start] == "{" else "]")
+    if end > start:
+        try:
+            return json.loads(text[start:end + 1])
+        except ValueError:
+            pass
+    return None
+
+
+def parse_json(text):
+    start = find_start(text)
+    if start == -1:
+        raise ValueError("No JSON object found in text")
+    result = strict_json(text)
+    if result is not None:
+        return result
+    parser = _Parser(text)
+    parser.i = start
+    result = parser.value()
+    if not result:
+        raise ValueError("Empty JSON object in text")
+    return result
+
+
+def try_parse_json(text):
+    try:
+        return parse_json(text)
+    except ValueError:
+        return None
@@ -0,0 +1,272 @@
+import re
+import time
+import numpy as np
+from pathlib import Path
+from conformance import parse_turns
+from results_store import get_default_store, METRICS
+
+# Métricas léxicas locales sobre todo el corpus, sin LLM: distinct-1/2/3, repetición
+# tipo self-BLEU entre diálogos del mismo grupo, type-token ratio, longitud de los
+# turnos y proporción de preguntas. Todos los diálogos generados (almacén de
+# resultados) y los reales de data/real_dialogs se tokenizan una vez a un único array
+# de ids y los n-gramas se cuentan con NumPy para todo el lote a la vez, así que se
+# pueden recalcular en cada ejecución y cruzar con las notas del juez.
+#
+#   PYTHONPATH=src/core python src/core/lexical_metrics.py --by model,version --out results_excel/lexical.xlsx
+
+TOKEN_RE = re.compile(r"[a-z0-9]+(?:'[a-z0-9]+)*")
+REAL_DIALOGS_DIR = Path("data") / "real_dialogs"
+KEY_COLUMNS = ["source", "model", "axis", "variant", "folder", "version", "run", "dialog_id", "path"]
+# Las notas del juez se cruzan con su diálogo por estas columnas (las carpetas difieren:
+# generated_dialogs ↔ evaluated_dialogs, dialogs ↔ evaluations)
+JOIN_KEYS = ["model", "axis", "variant", "version", "run", "dialog_id"]
+GROUP_BY = ["model", "axis", "variant", "version"]
+DISTINCT_N = [1, 2, 3]
+BLEU_N = 4
+LEXICAL = ["tokens", "turns", "ttr", *(f"distinct_{n}" for n in DISTINCT_N if n > 1), "self_bleu",
+           "turn_len_mean", "turn_len_std", "turn_len_max", "question_rate"]
+
+
+def tokenize(text):
+    return TOKEN_RE.findall(text.lower().replace("’", "'"))
+
+
+def _distinct_values(values):
+    # Valores distintos ordenados: np.sort + máscara es bastante más rápido que np.unique
+    # sin return_inverse en las versiones de NumPy que usan tabla hash
+    values = np.sort(values)
+    return values[np.concatenate([[True], values[1:] != values[:-1]])] if len(values) else values
+
+
+def load_dialogs(store=None, real_dir=REAL_DIALOGS_DIR, **filters):
+    # Diálogos generados del catálogo (cualquier carpeta) y, opcionalmente, los reales
+    store = store or get_default_store()
+    store.refresh()
+    where, params = store._where("dialog", filters)
+    columns = [c for c in KEY_COLUMNS if c != "source"]
+    docs = [dict(row, source="generated")
+            for row in store.iter_query(f"SELECT {', '.join(columns)}, content FROM artifacts{where} ORDER BY path", params)]
+    if real_dir and Path(real_dir).is_dir():
+        for path in sorted(Path(real_dir).glob("*.txt")):
+            docs.append({"source": "real", "model": "real", "axis": None, "variant": None, "folder": path.parent.name,
+                         "version": None, "run": None, "dialog_id": path.stem, "path": str(path),
+                         "content": path.read_text(encoding="utf-8")})
+    return docs
+
+
+class LexicalCorpus:
+    # Todo el corpus como arrays planos: ids de token y diálogo de cada token, y
+    # diálogo, longitud y "¿es pregunta?" de cada turno
+    def __init__(self, docs):
+        self.keys = {k: np.array([d.get(k) for d in docs], dtype=object) for k in KEY_COLUMNS}
+        vocab = {}
+        ids, token_doc, turn_doc, turn_len, turn_question = [], [], [], [], []
+        for i, doc in enumerate(docs):
+            turns, _, _, _ = parse_turns(doc.get("content") or "")
+            for _, text in turns:
+                tokens = [vocab.setdefault(t, len(vocab)) for t in tokenize(text)]
+                ids.extend(tokens)
+                token_doc.extend([i] * len(tokens))
+                turn_doc.append(i)
+                turn_len.append(len(tokens))
+                turn_question.append("?" in text)
+        self.n_docs = len(docs)
+        self.vocab_size = len(vocab)
+        self.ids = np.array(ids, dtype=np.int64)
+        self.token_doc = np.array(token_doc, dtype=np.int64)
+        self.turn_doc = np.array(turn_doc, dtype=np.int64)
+        self.turn_len = np.array(turn_len, dtype=np.float64)
+        self.turn_question = np.array(turn_question, dtype=np.float64)
+        self._codes = {1: self.ids}
+
+    def __len__(self):
+        return self.n_docs
+
+    def _ngram_codes(self, n):
+        # Código entero del n-grama que empieza en cada posición, a partir del (n-1)-grama;
+        # se compacta con np.unique en cada paso para no desbordar int64
+        if n not in self._codes:
+            m = len(self.ids) - n + 1
+            previous = self._ngram_codes(n - 1)[:m]
+            _, codes = np.unique(previous * self.vocab_size + self.ids[n - 1:], return_inverse=True)
+            self._codes[n] = codes.astype(np.int64)
+        return self._codes[n]
+
+    def ngrams(self, n):
+        # n-gramas que no cruzan de un diálogo a otro y diálogo de cada uno
+        m = len(self.ids) - n + 1
+        if m <= 0:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+        valid = self.token_doc[:m] == self.token_doc[n - 1:]
+        return self._ngram_codes(n)[valid], self.token_doc[:m][valid]
+
+    def _per_doc(self, doc, weights=None):
+        return np.bincount(doc, weights=weights, minlength=self.n_docs).astype(np.float64)
+
+    def distinct(self, n, group=None):
+        # n-gramas distintos / n-gramas, por diálogo (distinct-1 = type-token ratio) o, con
+        # group (código de grupo de cada diálogo), sobre todos los diálogos de cada grupo
+        codes, doc = self.ngrams(n)
+        unit = doc if group is None else group[doc]
+        size = self.n_docs if group is None else (int(group.max()) + 1 if len(group) else 0)
+        width = int(codes.max()) + 1 if len(codes) else 1
+        pairs = _distinct_values(unit * width + codes)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            return np.bincount(pairs // width, minlength=size) / np.bincount(unit, minlength=size)
+
+    def group_codes(self, by=GROUP_BY):
+        joined = np.array(["\x1f".join("" if v is None else str(v) for v in values)
+                           for values in zip(*(self.keys[k] for k in by))], dtype=object)
+        labels, codes = np.unique(joined, return_inverse=True)
+        return codes.astype(np.int64), [tuple(label.split("\x1f")) for label in labels]
+
+    def self_bleu(self, by=GROUP_BY, max_n=BLEU_N):
+        # Repetición tipo self-BLEU: para n = 1..max_n, fracción de los n-gramas de cada
+        # diálogo que aparecen en algún otro diálogo de su grupo; media geométrica con
+        # suavizado +1 y sin brevity penalty. NaN en grupos de un solo diálogo.
+        group, _ = self.group_codes(by)
+        log_sum = np.zeros(self.n_docs)
+        for n in range(1, max_n + 1):
+            codes, doc = self.ngrams(n)
+            width = int(codes.max()) + 1 if len(codes) else 1
+            _, cell = np.unique(group[doc] * width + codes, return_inverse=True)
+            # En cuántos diálogos distintos del grupo aparece cada n-grama
+            cell_docs = _distinct_values(cell * self.n_docs + doc)
+            doc_freq = np.bincount(cell_docs // self.n_docs, minlength=cell.max() + 1 if len(cell) else 0)
+            shared = self._per_doc(doc, (doc_freq[cell] > 1).astype(np.float64))
+            log_sum += np.log((shared + 1) / (self._per_doc(doc) + 1))
+        sizes = np.bincount(group, minlength=group.max() + 1 if len(group) else 0)
+        tokens = self._per_doc(self.token_doc)
+        return np.where((sizes[group] > 1) & (tokens > 0), np.exp(log_sum / max_n), np.nan)
+
+    def turn_stats(self):
+        n_turns = self._per_doc(self.turn_doc)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            mean = self._per_doc(self.turn_doc, self.turn_len) / n_turns
+            sq = self._per_doc(self.turn_doc, (self.turn_len - mean[self.turn_doc]) ** 2)
+            std = np.where(n_turns > 1, np.sqrt(sq / (n_turns - 1)), np.nan)
+            questions = self._per_doc(self.turn_doc, self.turn_question) / n_turns
+        longest = np.zeros(self.n_docs)
+        np.maximum.at(longest, self.turn_doc, self.turn_len)
+        longest[n_turns == 0] = np.nan
+        return n_turns, mean, std, longest, questions
+
+    def group_distinct(self, by=GROUP_BY):
+        # distinct-n clásico: n-gramas distintos sobre todo lo generado por cada grupo
+        import pandas as pd
+
+        group, labels = self.group_codes(by)
+        frame = pd.DataFrame(labels, columns=list(by))
+        for n in DISTINCT_N:
+            frame[f"group_distinct_{n}"] = self.distinct(n, group)
+        return frame
+
+    def metrics(self, by=GROUP_BY):
+        # Una fila por diálogo: claves del catálogo + métricas léxicas
+        import pandas as pd
+
+        n_turns, mean, std, longest, questions = self.turn_stats()
+        frame = pd.DataFrame({k: v for k, v in self.keys.items()})
+        frame["tokens"] = self._per_doc(self.token_doc).astype(np.int64)
+        frame["turns"] = n_turns.astype(np.int64)
+        frame["ttr"] = self.distinct(1)
+        for n in DISTINCT_N[1:]:
+            frame[f"distinct_{n}"] = self.distinct(n)
+        frame["self_bleu"] = self.self_bleu(by)
+        frame["turn_len_mean"] = mean
+        frame["turn_len_std"] = std
+        frame["turn_len_max"] = longest
+        frame["question_rate"] = questions
+        return frame[KEY_COLUMNS + LEXICAL]
+
+
+def lexical_metrics(by=GROUP_BY, store=None, real_dir=REAL_DIALOGS_DIR, **filters):
+    # Atajo para los notebooks: lexical_metrics(folder="ablation_outputs")
+    return LexicalCorpus(load_dialogs(store, real_dir, **filters)).metrics(by)
+
+
+def summarize(frame, by=GROUP_BY, corpus=None):
+    # Media de cada métrica por grupo y, con el corpus, distinct-n sobre todo el grupo
+    grouped = frame.assign(**{k: frame[k].map(_join_key) for k in by}).groupby(list(by))
+    summary = grouped[LEXICAL].mean()
+    summary.insert(0, "dialogs", grouped.size())
+    summary = summary.reset_index()
+    if corpus is not None:
+        summary = summary.merge(corpus.group_distinct(by), on=list(by), how="left")
+    return summary
+
+
+def _join_key(value):
+    # run llega como int o como float (columna con huecos): 1 y 1.0 deben coincidir
+    if value is None or value != value:
+        return ""
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return str(value)
+
+
+def join_scores(frame, store=None):
+    # Añade las notas del juez de cada diálogo (si las tiene)
+    import pandas as pd
+
+    store = store or get_default_store()
+    store.refresh()
+    where, params = store._where("scores", {})
+    scores = pd.DataFrame(list(store.iter_query(f"SELECT {', '.join(JOIN_KEYS + METRICS)} FROM artifacts{where}", params)),
+                          columns=JOIN_KEYS + METRICS)
+    scores = scores.drop_duplicates(JOIN_KEYS, keep="last")
+    left = frame.assign(**{k: frame[k].map(_join_key) for k in JOIN_KEYS})
+    right = scores.assign(**{k: scores[k].map(_join_key) for k in JOIN_KEYS})
+    joined = left.merge(right, on=JOIN_KEYS, how="left")
+    for k in JOIN_KEYS:
+        joined[k] = frame[k].to_numpy()
+    return joined
+
+
+def correlations(joined, method="spearman"):
+    # Métricas léxicas × criterios del juez: una correlación alta indica que el juez
+    # apenas añade información a una métrica que se calcula gratis
+    rated = joined.dropna(subset=METRICS, how="all")
+    corr = rated[LEXICAL + METRICS].apply(lambda c: c.astype(np.float64)).corr(method=method)
+    return corr.loc[LEXICAL, METRICS]
+
+
+if __name__ == "__main__":
+    import argparse
+    import pandas as pd
+
+    parser = argparse.ArgumentParser(description="Local lexical metrics (distinct-n, self-BLEU, TTR, turn lengths).")
+    parser.add_argument("--by", default=",".join(GROUP_BY), help="comma-separated grouping columns")
+    parser.add_argument("--folder", help="only dialogs in this folder (e.g. generated_dialogs, ablation_outputs)")
+    parser.add_argument("--model")
+    parser.add_argument("--no-real", action="store_true", help="leave out data/real_dialogs")
+    parser.add_argument("--out", help="write dialogs, summary and correlations to this XLSX (or dialogs to a CSV)")
+    args = parser.parse_args()
+
+    by = [c for c in args.by.split(",") if c]
+    filters = {k: v for k, v in (("folder", args.folder), ("model", args.model)) if v}
+    docs = load_dialogs(real_dir=None if args.no_real else REAL_DIALOGS_DIR, **filters)
+    start = time.perf_counter()
+    corpus = LexicalCorpus(docs)
+    frame = corpus.metrics(by)
+    elapsed = time.perf_counter() - start
+    joined = join_scores(frame)
+    summary = summarize(frame, by, corpus)
+    corr = correlations(joined)
+    print(f"🔤 {len(corpus)} dialogs, {len(corpus.ids)} tokens, {corpus.vocab_size} types in {elapsed:.2f}s "
+          f"({joined[METRICS].notna().any(axis=1).sum()} with judge scores)")
+
+    if args.out and args.out.endswith(".xlsx"):
+        with pd.ExcelWriter(args.out) as writer:
+            joined.to_excel(writer, sheet_name="Dialogs", index=False)
+            summary.to_excel(writer, sheet_name="Summary", index=False)
+            corr.to_excel(writer, sheet_name="Correlations")
+        print(f"✅ Lexical metrics saved to {args.out}")
+    elif args.out:
+        joined.to_csv(args.out, index=False)
+        print(f"✅ Lexical metrics saved to {args.out}")
+    else:
+        with pd.option_context("display.max_rows", None, "display.width", 200):
+            print(summary.round(3).to_string(index=False))
+            print("\nSpearman correlation with judge scores:")
+            print(corr.round(2).to_string())
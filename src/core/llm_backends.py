@@ -0,0 +1,305 @@
+import os
+import json
+import time
+import threading
+from local_model import get_local_model, resolve_model_path
+
+GROQ_BASE_URL = "https://api.groq.com/openai/v1"
+DEFAULT_TIMEOUT = float(os.getenv("LLM_TIMEOUT", "120"))
+
+_BACKENDS = {}
+_shared = {}
+_shared_lock = threading.RLock()
+# usage y time-to-first-token de la última llamada de cada hilo (telemetría)
+_call_info = threading.local()
+
+
+def register_backend(name):
+    def decorator(cls):
+        _BACKENDS[name] = cls
+        cls.name = name
+        return cls
+    return decorator
+
+
+def get_backend(name, **kwargs):
+    if name not in _BACKENDS:
+        raise ValueError(f"Unknown backend '{name}'. Available: {sorted(_BACKENDS)}")
+    return _BACKENDS[name](**kwargs)
+
+
+def available_backends():
+    return sorted(_BACKENDS)
+
+
+def _shared_resource(key, factory):
+    # Recursos de proceso (clientes HTTP, claves) que se crean una sola vez
+    with _shared_lock:
+        if key not in _shared:
+            _shared[key] = factory()
+        return _shared[key]
+
+
+def load_api_key(var="GROQ_API_KEY", env_path=None):
+    def read():
+        key = os.getenv(var)
+        if env_path:
+            with open(env_path) as f:
+                for line in f:
+                    if line.strip().startswith(var):
+                        key = line.strip().split("=", 1)[1].strip().strip('"').strip("'")
+                        break
+        return key
+
+    key = _shared_resource(("api_key", var, env_path), read)
+    if not key:
+        raise ValueError(f"{var} not found. Provide via .env or env_path.")
+    return key
+
+
+def _http2_available():
+    try:
+        import h2  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+
+def get_http_client(timeout=DEFAULT_TIMEOUT, max_connections=64):
+    # Cliente HTTP compartido: keep-alive, pool de conexiones y HTTP/2 si está instalado `h2`
+    def build():
+        import httpx
+        return httpx.Client(
+            http2=_http2_available(),
+            timeout=httpx.Timeout(timeout, connect=10.0),
+            limits=httpx.Limits(
+                max_connections=max_connections,
+                max_keepalive_connections=max_connections,
+                keepalive_expiry=120.0
+            )
+        )
+    return _shared_resource(("http_client", timeout, max_connections), build)
+
+
+def _as_dict(response):
+    if isinstance(response, dict):
+        return response
+    return response.model_dump()
+
+
+def _remember_call(response):
+    usage = response.get("usage") or (response.get("x_groq") or {}).get("usage") or {}
+    _call_info.value = {
+        "prompt_tokens": usage.get("prompt_tokens"),
+        "completion_tokens": usage.get("completion_tokens"),
+        "ttft_s": response.get("x_ttft"),
+    }
+
+
+def last_call_info():
+    # Datos de la última llamada hecha desde este hilo; se consumen al leerlos
+    info = getattr(_call_info, "value", None) or {}
+    _call_info.value = None
+    return info
+
+
+class ChatBackend:
+    name = None
+    # True si el endpoint acepta `n` > 1 (varias muestras del mismo prompt en una petición)
+    supports_n = False
+
+    def chat_completion(self, messages, temperature=None, seed=None, **params):
+        raise NotImplementedError
+
+    def complete(self, prompt, temperature=None, seed=None, **params):
+        messages = [{"role": "user", "content": prompt}]
+        system = params.pop("system", None)
+        if system:
+            messages.insert(0, {"role": "system", "content": system})
+        response = self.chat_completion(messages, temperature=temperature, seed=seed, **params)
+        _remember_call(response)
+        return response["choices"][0]["message"]["content"]
+
+    def structured_params(self, schema):
+        # Parámetros para forzar una salida JSON conforme a `schema`; por defecto, ninguno
+        return {}
+
+    def complete_n(self, prompt, n, temperature=None, seed=None, **params):
+        response = self.chat_completion([{"role": "user", "content": prompt}], temperature=temperature, seed=seed, n=n, **params)
+        _remember_call(response)
+        choices = sorted(response["choices"], key=lambda c: c.get("index", 0))
+        return [c["message"]["content"] for c in choices]
+
+    def warm_prefix(self, prefix):
+        pass
+
+
+@register_backend("groq")
+class GroqBackend(ChatBackend):
+    def __init__(self, model_name, env_path=None, base_url=None, timeout=DEFAULT_TIMEOUT, api_key_var="GROQ_API_KEY",
+                 supports_n=None, json_schema=None, stream=None, **_):
+        self.model_name = model_name
+        self.base_url = base_url or os.getenv("GROQ_BASE_URL", GROQ_BASE_URL)
+        # Groq solo acepta n=1; otros endpoints OpenAI-compatibles sí admiten n > 1
+        if supports_n is None:
+            supports_n = os.getenv("LLM_SUPPORTS_N") == "1"
+        self.supports_n = supports_n
+        # response_format json_schema solo en endpoints que lo admiten; si no, modo JSON
+        if json_schema is None:
+            json_schema = os.getenv("LLM_JSON_SCHEMA") == "1"
+        self.json_schema = json_schema
+        # stream: la respuesta llega por trozos y se mide el time-to-first-token
+        if stream is None:
+            stream = os.getenv("LLM_STREAM") == "1"
+        self.stream = stream
+        api_key = load_api_key(api_key_var, env_path)
+
+        def build():
+            from openai import OpenAI
+            return OpenAI(api_key=api_key, base_url=self.base_url, http_client=get_http_client(timeout))
+        self.client = _shared_resource(("openai", api_key, self.base_url, timeout), build)
+
+    def chat_completion(self, messages, temperature=None, seed=None, **params):
+        if temperature is not None:
+            params["temperature"] = temperature
+        if seed is not None:
+            params["seed"] = seed
+        if self.stream:
+            return self._stream_completion(messages, params)
+        response = self.client.chat.completions.create(model=self.model_name, messages=messages, **params)
+        return _as_dict(response)
+
+    def _stream_completion(self, messages, params):
+        # Reconstruye una respuesta con la misma forma que la no streaming, más x_ttft
+        start = time.perf_counter()
+        stream = self.client.chat.completions.create(
+            model=self.model_name, messages=messages, stream=True, stream_options={"include_usage": True}, **params
+        )
+        ttft, parts, finish, usage = None, {}, {}, None
+        for chunk in stream:
+            chunk = _as_dict(chunk)
+            usage = chunk.get("usage") or (chunk.get("x_groq") or {}).get("usage") or usage
+            for choice in chunk.get("choices") or []:
+                index = choice.get("index", 0)
+                delta = (choice.get("delta") or {}).get("content")
+                if delta:
+                    if ttft is None:
+                        ttft = time.perf_counter() - start
+                    parts.setdefault(index, []).append(delta)
+                if choice.get("finish_reason"):
+                    finish[index] = choice["finish_reason"]
+        return {
+            "model": self.model_name,
+            "choices": [
+                {"index": i, "message": {"role": "assistant", "content": "".join(parts.get(i, []))},
+                 "finish_reason": finish.get(i)}
+                for i in sorted(set(parts) | set(finish))
+            ],
+            "usage": usage,
+            "x_ttft": ttft,
+        }
+
+    def structured_params(self, schema):
+        # El modo JSON exige mencionar "JSON" en los mensajes: el esquema va en el mensaje de sistema
+        system = f"Respond only with a JSON object that matches this JSON schema:\n{json.dumps(schema)}"
+        if self.json_schema:
+            # strict: False porque el modo estricto rechaza mapas libres (tone, goals) y
+            # minimum/maximum; los rangos se comprueban en local con validation_errors
+            response_format = {
+                "type": "json_schema",
+                "json_schema": {"name": schema.get("title", "output"), "schema": schema, "strict": False}
+            }
+        else:
+            response_format = {"type": "json_object"}
+        return {"response_format": response_format, "system": system}
+
+
+@register_backend("local")
+class LocalBackend(ChatBackend):
+    def __init__(self, model_name=None, model_path=None, auto_model=False, n_slots=None, **_):
+        self.model_name = model_name
+        self.model_path = resolve_model_path(model_path, auto_model)
+        # El modelo se carga una sola vez por proceso (ver local_model.py)
+        settings = {"n_slots": n_slots} if n_slots else {}
+        self.service = get_local_model(self.model_path, **settings)
+
+    def warm_prefix(self, prefix):
+        self.service.warm_prefix(prefix)
+
+    def structured_params(self, schema):
+        # Gramática GBNF derivada del esquema: el muestreo solo puede producir JSON válido
+        return {"grammar": self.service.grammar(schema)}
+
+    def chat_completion(self, messages, temperature=None, seed=None, **params):
+        if temperature is not None:
+            params["temperature"] = temperature
+        if seed is not None:
+            params["seed"] = seed
+        return self.service.chat_completion(messages, **params)
+
+    def chat_completion_batch(self, batch, temperature=None, **params):
+        if temperature is not None:
+            params["temperature"] = temperature
+        return self.service.chat_completion_batch(batch, **params)
+
+
+FAKE_SPEC = {
+    "topic": "Meeting Reminder",
+    "turns": 4,
+    "participants": 2,
+    "tone": {"P1": "concerned", "P2": "nonchalant"},
+    "goals": {"P1": "ensure P2 attends the meeting", "P2": "avoid getting in trouble"},
+    "subplots": ["P2's forgetfulness"],
+    "imperfections": ["P2's initial denial"]
+}
+FAKE_DIALOG = (
+    "P1: Don't forget the meeting at 3 pm.\n"
+    "P2: Meeting? What meeting?\n"
+    "P1: The one with the client, remember?\n"
+    "P2: Oh, right. I'll be there."
+)
+FAKE_SCORES = {
+    "fluency": 4, "coherence": 4, "realism": 4, "fidelity_to_specification": 4,
+    "engagement": 3, "originality": 3, "comments": "Fake backend response."
+}
+
+
+@register_backend("fake")
+class FakeBackend(ChatBackend):
+    # Backend sin red para pruebas en seco: responde según el tipo de prompt
+    supports_n = True
+
+    def __init__(self, model_name="fake", responder=None, **_):
+        self.model_name = model_name
+        self.responder = responder or self.default_responder
+        self.calls = 0
+
+    @staticmethod
+    def default_responder(prompt):
+        head = prompt[:400].lower()
+        if "expert in analyzing" in head or "json formatter" in head:
+            return json.dumps(FAKE_SPEC, indent=2)
+        if "evaluat" in head:
+            return json.dumps(FAKE_SCORES, indent=2)
+        return FAKE_DIALOG
+
+    def chat_completion(self, messages, temperature=None, seed=None, n=1, **params):
+        self.calls += 1
+        prompt = messages[-1]["content"]
+        contents = [self.responder(prompt) for _ in range(n)]
+        completion_tokens = sum(len(c) for c in contents) // 4
+        return {
+            "id": f"fake-{self.calls}",
+            "object": "chat.completion",
+            "model": self.model_name,
+            "choices": [
+                {"index": i, "message": {"role": "assistant", "content": c}, "finish_reason": "stop"}
+                for i, c in enumerate(contents)
+            ],
+            "usage": {
+                "prompt_tokens": len(prompt) // 4,
+                "completion_tokens": completion_tokens,
+                "total_tokens": len(prompt) // 4 + completion_tokens
+            }
+        }
+
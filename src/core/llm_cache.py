@@ -0,0 +1,135 @@
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+
+DEFAULT_CACHE_PATH = os.getenv("LLM_CACHE_PATH", ".llm_cache/responses.sqlite")
+
+
+def make_cache_key(backend, model_name, prompt, temperature, seed=None, **extra):
+    payload = {
+        "backend": backend,
+        "model": model_name,
+        "prompt": prompt,
+        "temperature": temperature,
+        "seed": seed,
+    }
+    payload.update(extra)
+    raw = json.dumps(payload, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    def __init__(self, path=DEFAULT_CACHE_PATH, max_size_mb=512, max_age_days=None, bypass=False):
+        self.path = path
+        self.max_size_mb = max_size_mb
+        self.max_age_days = max_age_days
+        # bypass: no se lee de la caché (muestreo estocástico), pero se sigue escribiendo
+        self.bypass = bypass or os.getenv("LLM_CACHE_BYPASS") == "1"
+        self.hits = 0
+        self.misses = 0
+        self._puts = 0
+        self._lock = threading.Lock()
+
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            " key TEXT PRIMARY KEY,"
+            " response TEXT NOT NULL,"
+            " created_at REAL NOT NULL,"
+            " accessed_at REAL NOT NULL)"
+        )
+        self._conn.commit()
+        self.evict()
+
+    def get(self, key):
+        if self.bypass:
+            self.misses += 1
+            return None
+        with self._lock:
+            row = self._conn.execute("SELECT response, created_at FROM responses WHERE key = ?", (key,)).fetchone()
+            if row and self.max_age_days and time.time() - row[1] > self.max_age_days * 86400:
+                row = None
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._conn.execute("UPDATE responses SET accessed_at = ? WHERE key = ?", (time.time(), key))
+            self._conn.commit()
+            return row[0]
+
+    def put(self, key, response):
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses (key, response, created_at, accessed_at) VALUES (?, ?, ?, ?)",
+                (key, response, now, now)
+            )
+            self._conn.commit()
+            self._puts += 1
+        if self._puts % 500 == 0:
+            self.evict()
+
+    def evict(self):
+        with self._lock:
+            if self.max_age_days:
+                cutoff = time.time() - self.max_age_days * 86400
+                self._conn.execute("DELETE FROM responses WHERE created_at < ?", (cutoff,))
+            if self.max_size_mb:
+                limit = self.max_size_mb * 1024 * 1024
+                total = self._conn.execute("SELECT COALESCE(SUM(LENGTH(response)), 0) FROM responses").fetchone()[0]
+                if total > limit:
+                    # Borramos las entradas menos usadas recientemente hasta bajar del límite
+                    rows = self._conn.execute("SELECT key, LENGTH(response) FROM responses ORDER BY accessed_at").fetchall()
+                    stale = []
+                    for key, size in rows:
+                        if total <= limit:
+                            break
+                        stale.append((key,))
+                        total -= size
+                    self._conn.executemany("DELETE FROM responses WHERE key = ?", stale)
+            self._conn.commit()
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM responses")
+            self._conn.commit()
+
+    def stats(self):
+        with self._lock:
+            entries = self._conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+        total = self.hits + self.misses
+        return {
+            "entries": entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 3) if total else 0.0,
+        }
+
+
+_default_caches = {}
+_default_lock = threading.Lock()
+
+
+def get_default_cache(path=DEFAULT_CACHE_PATH):
+    # Una sola conexión por fichero y proceso, compartida por generador y evaluador
+    with _default_lock:
+        if path not in _default_caches:
+            _default_caches[path] = ResponseCache(path)
+        return _default_caches[path]
+
+
+if __name__ == "__main__":
+    import sys
+
+    cache = ResponseCache(sys.argv[2] if len(sys.argv) > 2 else DEFAULT_CACHE_PATH)
+    if len(sys.argv) > 1 and sys.argv[1] == "clear":
+        cache.clear()
+        print("🧹 Cache cleared.")
+    else:
+        print(f"📦 {cache.path}: {cache.stats()['entries']} cached responses")
@@ -0,0 +1,295 @@
+import os
+import time
+import asyncio
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
+from llm_backends import get_backend, last_call_info, DEFAULT_TIMEOUT
+from local_model import template_prefix
+from rate_limiter import get_rate_limiter, estimate_tokens, is_rate_limit_error, extract_wait_time
+from llm_cache import get_default_cache, make_cache_key
+from schemas import schema_key, validation_errors
+from telemetry import get_run_log, new_call, finish_call
+from cassette import wrap_backend, CASSETTE_MODE
+
+
+class LLMClient:
+    # Base común de DialogGenerator y DialogEvaluator: backend compartido, caché
+    # de respuestas y modo asíncrono con concurrencia acotada y rate limiting.
+    def __init__(self, backend="groq", model_name="llama3-8b-8192", env_path=None, model_path=None, auto_model=False,
+                 max_concurrency=8, max_retries=5, cache=True, seed=None, timeout=DEFAULT_TIMEOUT,
+                 structured_output=False, cache_stochastic=None):
+        # LLM_CASSETTE_MODE=replay: respuestas grabadas en lugar del backend configurado (ver cassette.py)
+        if CASSETTE_MODE == "replay":
+            backend = "replay"
+        self.backend = backend
+        self.model_name = model_name
+        self.seed = seed
+        # structured_output: la salida se restringe al esquema JSON (response_format / gramática GBNF)
+        self.structured_output = structured_output
+        # cache: True → caché compartida en disco, False/None → sin caché, o una ResponseCache propia
+        self.cache = get_default_cache() if cache is True else (cache or None)
+        if backend == "replay":
+            self.cache = None
+        # Muestreo sin semilla (temperature > 0, seed None): por defecto no se lee de la caché,
+        # así borrar un diálogo da una muestra nueva; LLM_CACHE_STOCHASTIC=1 recupera la reutilización
+        if cache_stochastic is None:
+            cache_stochastic = os.getenv("LLM_CACHE_STOCHASTIC") == "1"
+        self.cache_stochastic = cache_stochastic
+        self.max_concurrency = max_concurrency
+        self.max_retries = max_retries
+        self._semaphore = None
+        # Un evento por llamada al LLM en el run log (ver telemetry.py)
+        self.run_log = get_run_log()
+        self._client_kwargs = {"env_path": env_path, "model_path": model_path, "auto_model": auto_model, "timeout": timeout}
+
+        # Cliente compartido a nivel de proceso (ver llm_backends.py)
+        self.llm = get_backend(
+            backend,
+            model_name=model_name,
+            env_path=env_path,
+            model_path=model_path,
+            auto_model=auto_model,
+            timeout=timeout
+        )
+        self.llm = wrap_backend(self.llm)
+
+    def _sibling(self, model_name):
+        # Otro modelo con el mismo backend, caché y límites (p. ej. el más barato para tareas menores)
+        if model_name == self.model_name:
+            return self
+        return LLMClient(backend=self.backend, model_name=model_name, cache=self.cache or False, seed=self.seed,
+                         max_concurrency=self.max_concurrency, max_retries=self.max_retries,
+                         structured_output=self.structured_output, cache_stochastic=self.cache_stochastic,
+                         **self._client_kwargs)
+
+    def _load_prompt(self, path):
+        with open(path, "r") as f:
+            prompt = f.read()
+        # Backend local: deja en caché KV la parte fija de la plantilla
+        self.llm.warm_prefix(template_prefix(prompt))
+        return prompt
+
+    # === Telemetría: `call` es el evento de la llamada; las etapas que parsean la
+    # salida (parse=True) lo cierran en _parsed, el resto al recibir la respuesta
+    def _call(self, stage, prompt_path=None, parse=False, **fields):
+        variant = Path(prompt_path).stem if prompt_path else fields.pop("variant", None)
+        call = new_call(stage, self.model_name, self.backend, variant, **fields)
+        call["_parse"] = parse
+        return call
+
+    def _close_call(self, call, **fields):
+        call.update(fields)
+        if not call["_parse"] or call.get("error"):
+            finish_call(self.run_log, call)
+
+    def _parsed(self, call, ok):
+        if call is not None:
+            finish_call(self.run_log, call, parse_ok=ok)
+
+    def _measure(self, call, start):
+        info = last_call_info()
+        call["latency_s"] = round(time.perf_counter() - start, 4)
+        call["ttft_s"] = info.get("ttft_s")
+        call["prompt_tokens"] = info.get("prompt_tokens")
+        call["completion_tokens"] = info.get("completion_tokens")
+
+    def _call_backend(self, prompt, temperature, seed=None, schema=None, call=None):
+        params = self.llm.structured_params(schema) if schema else {}
+        start = time.perf_counter()
+        output = self.llm.complete(prompt, temperature=temperature, seed=seed, **params)
+        if call is not None:
+            self._measure(call, start)
+        return output
+
+    def _call_backend_n(self, prompt, n, temperature, seed=None, call=None):
+        start = time.perf_counter()
+        outputs = self.llm.complete_n(prompt, n, temperature=temperature, seed=seed)
+        if call is not None:
+            self._measure(call, start)
+        return outputs
+
+    def _output_schema(self, schema):
+        return schema if self.structured_output else None
+
+    def _cache_key(self, prompt, temperature, seed, sample=0, schema=None, batch=False):
+        extra = {}
+        # La muestra i de una petición con `n` no equivale a ninguna llamada suelta:
+        # va en su propio espacio de claves, inalcanzable desde _complete
+        if batch:
+            extra["batch_sample"] = sample
+        # Sin semilla, cada muestra de un lote necesita su propia entrada
+        elif seed is None and sample:
+            extra["sample"] = sample
+        # Las salidas restringidas por esquema no se mezclan con las libres
+        if schema:
+            extra["schema"] = schema_key(schema)
+        return make_cache_key(self.backend, self.model_name, prompt, temperature, seed, **extra)
+
+    def _reads_cache(self, temperature, seed):
+        # Las respuestas se guardan siempre; solo se sirven si la llamada es reproducible
+        return self.cache_stochastic or not temperature or seed is not None
+
+    def _sample_seeds(self, seed, n):
+        seed = self.seed if seed is None else seed
+        # Con `n` todas las muestras salen de una petición con la misma semilla
+        if self.llm.supports_n:
+            return [seed] * n
+        # Sin `n`, muestra i ↔ llamada suelta con semilla seed + i
+        return [None if seed is None else seed + i for i in range(n)]
+
+    def _cached_samples(self, prompt, temperature, seeds):
+        batch = self.llm.supports_n
+        keys = [self._cache_key(prompt, temperature, s, i, batch=batch) if self.cache else None
+                for i, s in enumerate(seeds)]
+        outputs = [self.cache.get(k) if k and self._reads_cache(temperature, s) else None
+                   for k, s in zip(keys, seeds)]
+        return keys, outputs
+
+    @staticmethod
+    def _batch_plan(seeds, missing):
+        # Con semilla, la muestra i es la i-ésima de la petición: se pide hasta la última que falta
+        # y se toman las posiciones que faltan; sin semilla basta con pedir las que faltan
+        if seeds[0] is None:
+            return len(missing), list(range(len(missing)))
+        return missing[-1] + 1, missing
+
+    def _store_samples(self, keys, outputs, missing, samples):
+        for i, output in zip(missing, samples):
+            outputs[i] = output
+            if keys[i]:
+                self.cache.put(keys[i], output)
+        return outputs
+
+    def _complete(self, prompt, temperature, seed=None, sample=0, schema=None, call=None):
+        seed = self.seed if seed is None else seed
+        call = call or self._call("completion")
+        key = self._cache_key(prompt, temperature, seed, sample, schema) if self.cache else None
+        if key and self._reads_cache(temperature, seed):
+            cached = self.cache.get(key)
+            if cached is not None:
+                self._close_call(call, cache_hit=True)
+                return cached
+        try:
+            output = self._call_backend(prompt, temperature, seed, schema, call)
+        except Exception as e:
+            self._close_call(call, error=type(e).__name__)
+            raise
+        if key:
+            self.cache.put(key, output)
+        self._close_call(call)
+        return output
+
+    def _sample_calls(self, call, missing):
+        # Sin `n` en el endpoint cada muestra es una llamada aparte con su propio evento
+        call["_written"] = True
+        return {i: self._call(call["stage"], variant=call["variant"], sample=i) for i in missing}
+
+    def _complete_n(self, prompt, temperature, n, seed=None, call=None):
+        call = call or self._call("completion")
+        seeds = self._sample_seeds(seed, n)
+        keys, outputs = self._cached_samples(prompt, temperature, seeds)
+        missing = [i for i, output in enumerate(outputs) if output is None]
+        if not missing:
+            self._close_call(call, cache_hit=True, n=n)
+            return outputs
+        if self.llm.supports_n:
+            count, picks = self._batch_plan(seeds, missing)
+            try:
+                batch = self._call_backend_n(prompt, count, temperature, seeds[0], call)
+            except Exception as e:
+                self._close_call(call, error=type(e).__name__, n=count)
+                raise
+            self._close_call(call, n=count, cached_samples=n - len(missing))
+            samples = [batch[j] for j in picks]
+        else:
+            calls = self._sample_calls(call, missing)
+
+            def sample(i):
+                try:
+                    output = self._call_backend(prompt, temperature, seeds[i], call=calls[i])
+                except Exception as e:
+                    self._close_call(calls[i], error=type(e).__name__)
+                    raise
+                self._close_call(calls[i])
+                return output
+            with ThreadPoolExecutor(max_workers=min(len(missing), self.max_concurrency)) as pool:
+                samples = list(pool.map(sample, missing))
+        return self._store_samples(keys, outputs, missing, samples)
+
+    async def _limited_call(self, fn, prompt, expected_output_tokens=512, call=None):
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        limiter = get_rate_limiter(self.model_name) if self.backend == "groq" else None
+        async with self._semaphore:
+            for attempt in range(self.max_retries + 1):
+                if limiter:
+                    # Estimación previa: prompt + salida típica de un diálogo
+                    waited = await limiter.acquire_async(estimate_tokens(prompt) + expected_output_tokens)
+                    if call is not None:
+                        call["rate_limit_wait_s"] += round(waited, 3)
+                try:
+                    return await asyncio.to_thread(fn)
+                except Exception as e:
+                    if not limiter or not is_rate_limit_error(e) or attempt == self.max_retries:
+                        raise
+                    wait_time = extract_wait_time(e)
+                    if call is not None:
+                        call["retries"] = attempt + 1
+                    print(f"⏳ Rate limit hit ({self.model_name}). Throttling {wait_time:.1f}s...")
+                    limiter.penalize(wait_time)
+
+    async def _complete_async(self, prompt, temperature, seed=None, sample=0, schema=None, call=None):
+        seed = self.seed if seed is None else seed
+        call = call or self._call("completion")
+        key = self._cache_key(prompt, temperature, seed, sample, schema) if self.cache else None
+        if key and self._reads_cache(temperature, seed):
+            # Los aciertos de caché no consumen cuota ni hueco de concurrencia
+            cached = self.cache.get(key)
+            if cached is not None:
+                self._close_call(call, cache_hit=True)
+                return cached
+        try:
+            output = await self._limited_call(lambda: self._call_backend(prompt, temperature, seed, schema, call),
+                                              prompt, call=call)
+        except Exception as e:
+            self._close_call(call, error=type(e).__name__)
+            raise
+        if key:
+            self.cache.put(key, output)
+        self._close_call(call)
+        return output
+
+    async def _complete_n_async(self, prompt, temperature, n, seed=None, call=None):
+        call = call or self._call("completion")
+        seeds = self._sample_seeds(seed, n)
+        keys, outputs = self._cached_samples(prompt, temperature, seeds)
+        missing = [i for i, output in enumerate(outputs) if output is None]
+        if not missing:
+            self._close_call(call, cache_hit=True, n=n)
+            return outputs
+        if self.llm.supports_n:
+            # Una sola petición: los tokens del prompt se cobran y se limitan una vez
+            count, picks = self._batch_plan(seeds, missing)
+            try:
+                batch = await self._limited_call(
+                    lambda: self._call_backend_n(prompt, count, temperature, seeds[0], call),
+                    prompt, expected_output_tokens=512 * count, call=call
+                )
+            except Exception as e:
+                self._close_call(call, error=type(e).__name__, n=count)
+                raise
+            self._close_call(call, n=count, cached_samples=n - len(missing))
+            return self._store_samples(keys, outputs, missing, [batch[j] for j in picks])
+        calls = self._sample_calls(call, missing)
+        samples = await asyncio.gather(*(
+            self._complete_async(prompt, temperature, seeds[i], i, call=calls[i]) for i in missing
+        ))
+        for i, output in zip(missing, samples):
+            outputs[i] = output
+        return outputs
+
+    def _validate(self, data, schema):
+        # Solo en modo estructurado: devuelve los errores de validación (lista vacía si es válido)
+        if not self.structured_output:
+            return []
+        return validation_errors(data, schema)
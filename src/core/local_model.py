@@ -0,0 +1,254 @@
+import os
+import sys
+import json
+import queue
+import subprocess
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+DEFAULT_LOCAL_MODEL_PATH = os.getenv("LOCAL_MODEL_PATH", "/content/llama-2-7b-chat.Q4_K_M.gguf")
+LOCAL_MODEL_URL = "https://huggingface.co/TheBloke/Llama-2-7B-Chat-GGUF/resolve/main/llama-2-7b-chat.Q4_K_M.gguf"
+
+DEFAULT_SETTINGS = {
+    "chat_format": "llama-2",
+    "n_gpu_layers": 20,
+}
+MIN_CONTEXT = 2048
+MAX_CONTEXT = 4096  # n_ctx de entrenamiento de LLaMA 2
+EXPECTED_OUTPUT_TOKENS = 1024
+# Margen para lo que se inserta en los {..._HERE} de una plantilla (diálogo generado,
+# diálogo de referencia y spec en las de evaluación)
+PROMPT_FILL_TOKENS = 1536
+PROMPT_TEMPLATE_DIRS = ("prompts", "prompts_variants")
+PROMPT_CACHE_BYTES = 2 << 30  # 2 GiB de estados KV en RAM en total, compartidos por todos los slots
+
+_services = {}
+_services_lock = threading.Lock()
+
+
+def install_llama_cpp():
+    try:
+        import llama_cpp
+    except ImportError:
+        print("🔧 Installing llama-cpp-python...")
+        subprocess.run(["pip", "install", "llama-cpp-python"], check=True)
+
+
+def download_model_if_needed(model_path=DEFAULT_LOCAL_MODEL_PATH):
+    if not os.path.exists(model_path):
+        print("⬇️ Downloading LLaMA 2 7B Chat model...")
+        subprocess.run(["wget", "-O", model_path, LOCAL_MODEL_URL], check=True)
+    else:
+        print("✅ Model already exists.")
+    return model_path
+
+
+def resolve_model_path(model_path=None, auto_model=False):
+    if auto_model:
+        return download_model_if_needed(model_path or DEFAULT_LOCAL_MODEL_PATH)
+    return model_path or DEFAULT_LOCAL_MODEL_PATH
+
+
+def physical_cores():
+    try:
+        logical = len(os.sched_getaffinity(0))
+    except AttributeError:
+        logical = os.cpu_count() or 1
+    # llama.cpp rinde mejor con un hilo por núcleo físico; contamos núcleos únicos
+    # en /proc/cpuinfo cuando existe y, si no, asumimos SMT de 2 hilos.
+    try:
+        with open("/proc/cpuinfo") as f:
+            cores = set()
+            physical_id = core_id = None
+            for line in f:
+                if line.startswith("physical id"):
+                    physical_id = line.split(":")[1].strip()
+                elif line.startswith("core id"):
+                    core_id = line.split(":")[1].strip()
+                    cores.add((physical_id, core_id))
+        if cores:
+            return max(1, min(len(cores), logical))
+    except OSError:
+        pass
+    return max(1, logical // 2)
+
+
+def auto_threads(n_slots=1):
+    return max(1, physical_cores() // max(1, n_slots))
+
+
+def context_size(prompt_tokens, max_new_tokens=EXPECTED_OUTPUT_TOKENS, limit=MAX_CONTEXT):
+    # Redondea hacia arriba a múltiplos de 512 para no recargar por cada prompt
+    needed = prompt_tokens + max_new_tokens + 16
+    size = max(MIN_CONTEXT, -(-needed // 512) * 512)
+    return min(size, limit)
+
+
+def prompt_templates(dirs=PROMPT_TEMPLATE_DIRS):
+    templates = []
+    for folder in dirs:
+        for root, _, files in os.walk(folder):
+            for name in sorted(files):
+                if name.startswith("prompt") and name.endswith(".txt"):
+                    with open(os.path.join(root, name), "r", encoding="utf-8") as f:
+                        templates.append(f.read())
+    return templates
+
+
+def templates_context_size(template_tokens, fill_tokens=PROMPT_FILL_TOKENS, max_new_tokens=EXPECTED_OUTPUT_TOKENS,
+                           limit=MAX_CONTEXT):
+    # n_ctx para la plantilla más larga con sus huecos rellenos más la salida esperada
+    return context_size(max(template_tokens, default=0) + fill_tokens, max_new_tokens, limit)
+
+
+def template_prefix(template):
+    # Parte fija de una plantilla de prompt: todo lo anterior al primer marcador {..._HERE}
+    cut = len(template)
+    for marker in ("{GENERATED_DIALOG_HERE}", "{REFERENCE_DIALOG_HERE}", "{SPECIFICATION_HERE}", "{REAL_DIALOG_HERE}"):
+        pos = template.find(marker)
+        if pos != -1:
+            cut = min(cut, pos)
+    return template[:cut]
+
+
+class LocalModelService:
+    # Un único modelo residente por fichero GGUF, compartido por generador y evaluador.
+    # Cada slot es un contexto Llama independiente (los pesos en CPU se comparten vía
+    # mmap; las capas en GPU sí se copian por slot), así varias secuencias se decodifican
+    # en paralelo repartiendo los núcleos. n_ctx se fija una vez al cargar, a partir de
+    # la plantilla de prompt más larga, y no se recarga nada después. La caché de estados
+    # KV es una sola para todos los slots (mismo modelo y mismo n_ctx) y permite reanudar
+    # desde el prefijo común más largo: con plantillas como prompt_evaluate_strict.txt
+    # solo se evalúa el sufijo específico de cada diálogo.
+    def __init__(self, model_path, n_slots=1, n_threads=None, n_ctx=None, **settings):
+        install_llama_cpp()
+        self.model_path = model_path
+        self.n_slots = max(1, n_slots)
+        self.n_threads = n_threads or auto_threads(self.n_slots)
+        self.settings = dict(DEFAULT_SETTINGS, **settings)
+        self._prefixes = []
+        self._warmed = {}
+        self._grammars = {}
+        # llama.cpp no admite llamadas concurrentes sobre el mismo contexto:
+        # cada petición toma un slot libre de la cola
+        self.n_ctx = n_ctx or int(os.getenv("LOCAL_MODEL_CTX", "0")) or self._plan_context()
+        self._cache = SharedPromptCache(PROMPT_CACHE_BYTES)
+        self._free = queue.Queue()
+        for _ in range(self.n_slots):
+            self._free.put(self._load())
+
+    def _plan_context(self):
+        # Solo el vocabulario (sin pesos) para contar tokens de las plantillas
+        from llama_cpp import Llama
+
+        vocab = Llama(model_path=self.model_path, vocab_only=True, verbose=False)
+        tokens = [len(vocab.tokenize(t.encode("utf-8"))) for t in prompt_templates()]
+        limit = min(MAX_CONTEXT, vocab.n_ctx_train()) if hasattr(vocab, "n_ctx_train") else MAX_CONTEXT
+        n_ctx = templates_context_size(tokens, limit=max(limit, MIN_CONTEXT))
+        print(f"📏 Local context sized once to {n_ctx} tokens ({len(tokens)} prompt templates, longest {max(tokens, default=0)})")
+        return n_ctx
+
+    def _load(self):
+        from llama_cpp import Llama
+
+        llm = Llama(model_path=self.model_path, n_ctx=self.n_ctx, n_threads=self.n_threads, verbose=False, **self.settings)
+        llm.set_cache(self._cache)
+        self._warmed[id(llm)] = set()
+        return llm
+
+    def _warm(self, llm):
+        for prefix in self._prefixes:
+            if prefix not in self._warmed[id(llm)]:
+                llm.create_chat_completion(messages=[{"role": "user", "content": prefix}], max_tokens=1)
+                self._warmed[id(llm)].add(prefix)
+
+    def warm_prefix(self, prefix):
+        # Se evalúa una vez por slot, la próxima vez que ese slot se use
+        if prefix and prefix not in self._prefixes:
+            self._prefixes.append(prefix)
+
+    def grammar(self, schema):
+        # Compilar la gramática cuesta; se hace una vez por esquema
+        from llama_cpp import LlamaGrammar
+
+        key = json.dumps(schema, sort_keys=True)
+        if key not in self._grammars:
+            self._grammars[key] = LlamaGrammar.from_json_schema(key, verbose=False)
+        return self._grammars[key]
+
+    def chat_completion(self, messages, **params):
+        llm = self._free.get()
+        try:
+            self._warm(llm)
+            return llm.create_chat_completion(messages=messages, **params)
+        finally:
+            self._free.put(llm)
+
+    def chat_completion_batch(self, batch, **params):
+        # Varias conversaciones a la vez, una por slot libre
+        with ThreadPoolExecutor(max_workers=self.n_slots) as pool:
+            return list(pool.map(lambda messages: self.chat_completion(messages, **params), batch))
+
+
+class SharedPromptCache:
+    # Una LlamaRAMCache para todos los slots: el límite de memoria es global y un
+    # prefijo calentado en un slot lo reutilizan los demás. Llama solo usa [], in y
+    # []=; el cerrojo evita que dos slots desalojen entradas a la vez.
+    def __init__(self, capacity_bytes=PROMPT_CACHE_BYTES):
+        from llama_cpp import LlamaRAMCache
+
+        self._cache = LlamaRAMCache(capacity_bytes=capacity_bytes)
+        self._lock = threading.Lock()
+
+    def __getitem__(self, key):
+        with self._lock:
+            return self._cache[key]
+
+    def __contains__(self, key):
+        with self._lock:
+            return key in self._cache
+
+    def __setitem__(self, key, value):
+        with self._lock:
+            self._cache[key] = value
+
+    @property
+    def cache_size(self):
+        return self._cache.cache_size
+
+
+def get_local_model(model_path=None, **settings):
+    model_path = model_path or DEFAULT_LOCAL_MODEL_PATH
+    settings.setdefault("n_slots", int(os.getenv("LOCAL_MODEL_SLOTS", "1")))
+    with _services_lock:
+        service = _services.get(model_path)
+        if service is None:
+            print(f"🧠 Loading local model once: {model_path}")
+            service = LocalModelService(model_path, **settings)
+            _services[model_path] = service
+        return service
+
+
+def serve(model_path=None, host="127.0.0.1", port=8000):
+    # Alternativa fuera de proceso: servidor OpenAI-compatible de llama-cpp-python con
+    # la caché de prompts activada. Apuntar GROQ_BASE_URL a http://host:port/v1.
+    install_llama_cpp()
+    settings = DEFAULT_SETTINGS
+    subprocess.run([
+        sys.executable, "-m", "llama_cpp.server",
+        "--model", model_path or DEFAULT_LOCAL_MODEL_PATH,
+        "--n_ctx", str(MAX_CONTEXT),
+        "--n_threads", str(auto_threads()),
+        "--n_gpu_layers", str(settings["n_gpu_layers"]),
+        "--chat_format", settings["chat_format"],
+        "--cache", "True",
+        "--host", host,
+        "--port", str(port),
+    ], check=True)
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] == "serve":
+        serve(sys.argv[2] if len(sys.argv) > 2 else None)
+    else:
+        print("Usage: python src/core/local_model.py serve [model_path]")
@@ -0,0 +1,144 @@
+import os
+import json
+import hashlib
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+from datetime import datetime
+from results_store import record_artifact
+from near_duplicates import record_dialog
+
+MANIFEST_NAME = "manifest.json"
+
+try:
+    import fcntl
+except ImportError:  # Windows: sin cerrojo entre procesos
+    fcntl = None
+
+_file_hashes = {}
+
+
+def text_hash(text):
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def file_hash(path):
+    # Hash del contenido, memorizado por (ruta, mtime, tamaño) dentro del proceso
+    path = Path(path)
+    stat = path.stat()
+    key = (str(path.resolve()), stat.st_mtime_ns, stat.st_size)
+    if key not in _file_hashes:
+        _file_hashes[key] = hashlib.sha256(path.read_bytes()).hexdigest()
+    return _file_hashes[key]
+
+
+def fingerprint(**inputs):
+    # Path → hash del contenido del fichero; dict/list → JSON canónico; resto → str
+    parts = {}
+    for name, value in sorted(inputs.items()):
+        if isinstance(value, Path):
+            parts[name] = file_hash(value) if value.exists() else "missing"
+        elif isinstance(value, (dict, list)):
+            parts[name] = text_hash(json.dumps(value, sort_keys=True, ensure_ascii=False))
+        else:
+            parts[name] = text_hash(str(value))
+    return text_hash(json.dumps(parts, sort_keys=True))
+
+
+class Manifest:
+    # Un manifest.json por carpeta de variante: para cada artefacto guarda el hash de
+    # sus entradas (diálogo real, prompt, spec, modelo) y la etapa que lo produjo.
+    # Con adopt_existing, los artefactos anteriores al manifest se dan por buenos
+    # la primera vez en lugar de regenerarlos. Varios procesos (workers de la cola)
+    # pueden escribir en la misma carpeta: cada record relee el fichero bajo un
+    # cerrojo, añade su entrada y lo reescribe con un temporal propio.
+    def __init__(self, variant_dir, adopt_existing=True):
+        self.variant_dir = Path(variant_dir)
+        self.path = self.variant_dir / MANIFEST_NAME
+        self.adopt_existing = adopt_existing
+        self._lock = threading.Lock()
+        self._stamp = None
+        self.entries = {}
+        self._refresh()
+
+    def _refresh(self):
+        # Relee el fichero si otro proceso lo ha cambiado desde la última lectura
+        try:
+            stat = self.path.stat()
+        except FileNotFoundError:
+            return
+        stamp = (stat.st_mtime_ns, stat.st_size, stat.st_ino)
+        if stamp != self._stamp:
+            with open(self.path, "r", encoding="utf-8") as f:
+                self.entries = json.load(f)
+            self._stamp = stamp
+
+    @contextmanager
+    def _file_lock(self):
+        self.variant_dir.mkdir(parents=True, exist_ok=True)
+        with open(self.path.with_name(MANIFEST_NAME + ".lock"), "a") as lock:
+            if fcntl:
+                fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                if fcntl:
+                    fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def _key(self, artifact):
+        # Claves relativas a la carpeta de variante: "specifications/dialog_001_spec.json"
+        path = Path(artifact)
+        try:
+            return path.resolve().relative_to(self.variant_dir.resolve()).as_posix()
+        except ValueError:
+            return path.as_posix()
+
+    def entry(self, artifact):
+        with self._lock:
+            self._refresh()
+            return self.entries.get(self._key(artifact))
+
+    def is_fresh(self, artifact, inputs_hash):
+        key = self._key(artifact)
+        if not (self.variant_dir / key).exists():
+            return False
+        entry = self.entry(artifact)
+        if entry is None:
+            if self.adopt_existing:
+                self.record(artifact, inputs_hash, stage="adopted")
+                return True
+            return False
+        return entry["inputs"] == inputs_hash
+
+    def record(self, artifact, inputs_hash, stage=None):
+        key = self._key(artifact)
+        with self._lock, self._file_lock():
+            self._refresh()
+            self.entries[key] = {
+                "inputs": inputs_hash,
+                "stage": stage,
+                "updated": datetime.now().isoformat(timespec="seconds"),
+            }
+            self._save()
+        record_artifact(self.variant_dir / key, stage)
+        record_dialog(self.variant_dir / key)
+
+    def _save(self):
+        tmp = self.path.with_name(f"{MANIFEST_NAME}.{os.getpid()}.{threading.get_ident()}.tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self.entries, f, indent=2, sort_keys=True)
+        os.replace(tmp, self.path)
+        stat = self.path.stat()
+        self._stamp = (stat.st_mtime_ns, stat.st_size, stat.st_ino)
+
+
+_manifests = {}
+_manifests_lock = threading.Lock()
+
+
+def get_manifest(variant_dir):
+    key = str(Path(variant_dir).resolve())
+    with _manifests_lock:
+        if key not in _manifests:
+            _manifests[key] = Manifest(variant_dir)
+        return _manifests[key]
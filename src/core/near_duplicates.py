@@ -0,0 +1,349 @@
+import os
+import time
+import zlib
+import sqlite3
+import hashlib
+import threading
+import numpy as np
+from pathlib import Path
+from results_store import describe, get_default_store
+from lexical_metrics import tokenize
+from conformance import parse_turns
+
+# Índice de casi-duplicados entre diálogos generados: firma MinHash de los 3-gramas de
+# palabras de cada diálogo y LSH por bandas en SQLite. Insertar un diálogo cuesta lo
+# mismo con 100 que con 100k (una firma y BANDS filas indexadas), y "duplicados de
+# este diálogo" solo compara contra los que comparten alguna banda, sin pasar por
+# todos los pares. Manifest.record añade cada diálogo nuevo según se escribe.
+#
+#   PYTHONPATH=src/core python src/core/near_duplicates.py build|stats
+#   PYTHONPATH=src/core python src/core/near_duplicates.py query experiments/llama3_8b/.../v1_dialog_01.txt
+#   PYTHONPATH=src/core python src/core/near_duplicates.py report --by model,version
+
+DEFAULT_INDEX_PATH = os.getenv("NEAR_DUP_INDEX_PATH", "experiments/near_duplicates.sqlite")
+SHINGLE = 3  # palabras por shingle
+NUM_PERM = 128
+BANDS, ROWS = 16, 8  # umbral de la curva LSH ≈ (1 / BANDS) ** (1 / ROWS) ≈ 0.71
+THRESHOLD = 0.8  # similitud de Jaccard estimada a partir de la cual dos diálogos son casi iguales
+SEED = 1
+GROUP_BY = ["model", "version"]
+META_COLUMNS = ["model", "axis", "variant", "folder", "version", "run", "dialog_id"]
+
+_PRIME = np.uint64((1 << 61) - 1)
+_MAX_HASH = np.uint64(0xFFFFFFFF)
+_rng = np.random.default_rng(SEED)
+# Permutaciones fijas (mismo SEED → mismas firmas en cualquier proceso)
+_A = _rng.integers(1, (1 << 61) - 1, NUM_PERM, dtype=np.uint64)
+_B = _rng.integers(0, (1 << 61) - 1, NUM_PERM, dtype=np.uint64)
+
+
+def shingles(text):
+    # 3-gramas de palabras del texto de los turnos (sin encabezados ni comentarios)
+    turns, _, _, _ = parse_turns(text)
+    tokens = tokenize(" ".join(t for _, t in turns) if turns else text)
+    if len(tokens) < SHINGLE:
+        return {" ".join(tokens)} if tokens else set()
+    return {" ".join(tokens[i:i + SHINGLE]) for i in range(len(tokens) - SHINGLE + 1)}
+
+
+def signature(text):
+    # Firma MinHash (NUM_PERM × uint32); None si el texto no tiene palabras
+    grams = shingles(text)
+    if not grams:
+        return None
+    hashes = np.fromiter((zlib.crc32(g.encode("utf-8")) for g in grams), dtype=np.uint64, count=len(grams))
+    # a·x + b módulo 2^61 - 1 (el desbordamiento de uint64 es parte del hash, como en datasketch)
+    permuted = np.bitwise_and((_A[:, None] * hashes[None, :] + _B[:, None]) % _PRIME, _MAX_HASH)
+    return permuted.min(axis=1).astype(np.uint32)
+
+
+def band_keys(sig):
+    # Una clave entera de 64 bits por banda de ROWS valores
+    return [int.from_bytes(hashlib.blake2b(band.tobytes(), digest_size=8).digest(), "big", signed=True)
+            for band in sig.reshape(BANDS, ROWS)]
+
+
+def similarity(a, b):
+    # Jaccard estimada: fracción de posiciones iguales de las firmas (admite matrices fila a fila)
+    return (np.asarray(a) == np.asarray(b)).mean(axis=-1)
+
+
+class NearDuplicateIndex:
+    def __init__(self, path=DEFAULT_INDEX_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(
+            "CREATE TABLE IF NOT EXISTS dialogs ("
+            " id INTEGER PRIMARY KEY,"
+            " path TEXT UNIQUE NOT NULL,"
+            f" {', '.join(c + ' TEXT' for c in META_COLUMNS)},"
+            " content_hash TEXT NOT NULL,"
+            " signature BLOB NOT NULL,"
+            " added_at REAL NOT NULL);"
+            "CREATE TABLE IF NOT EXISTS bands ("
+            " band INTEGER NOT NULL,"
+            " bucket INTEGER NOT NULL,"
+            " dialog INTEGER NOT NULL);"
+            "CREATE INDEX IF NOT EXISTS bands_bucket ON bands (band, bucket);"
+            "CREATE INDEX IF NOT EXISTS bands_dialog ON bands (dialog);"
+        )
+        self._conn.commit()
+
+    # === Inserción
+    def _insert(self, path, text, meta):
+        # Sin commit: add() confirma cada diálogo y sync() cada lote
+        content_hash = hashlib.sha256(text.encode("utf-8")).hexdigest()
+        row = self._conn.execute("SELECT id, content_hash FROM dialogs WHERE path = ?", (path,)).fetchone()
+        if row and row[1] == content_hash:
+            return False
+        sig = signature(text)
+        if row:
+            # Diálogo reescrito (p. ej. regenerado): se sustituyen su firma y sus bandas; si
+            # ahora está vacío se quita del índice
+            self._delete([row[0]])
+        if sig is None:
+            return False
+        values = [None if meta.get(c) is None else str(meta[c]) for c in META_COLUMNS]
+        cursor = self._conn.execute(
+            f"INSERT INTO dialogs (path, {', '.join(META_COLUMNS)}, content_hash, signature, added_at) "
+            f"VALUES (?, {', '.join('?' * len(META_COLUMNS))}, ?, ?, ?)",
+            [path, *values, content_hash, sig.tobytes(), time.time()]
+        )
+        self._conn.executemany("INSERT INTO bands (band, bucket, dialog) VALUES (?, ?, ?)",
+                               [(band, key, cursor.lastrowid) for band, key in enumerate(band_keys(sig))])
+        return True
+
+    def _delete(self, ids):
+        for start in range(0, len(ids), 900):
+            chunk = ids[start:start + 900]
+            marks = ", ".join("?" * len(chunk))
+            self._conn.execute(f"DELETE FROM bands WHERE dialog IN ({marks})", chunk)
+            self._conn.execute(f"DELETE FROM dialogs WHERE id IN ({marks})", chunk)
+
+    def add(self, path, text, meta=None):
+        with self._lock:
+            added = self._insert(str(path), text, meta or {})
+            self._conn.commit()
+        return added
+
+    def sync(self, store=None):
+        # Carga inicial o puesta al día desde el almacén de resultados (solo lo que cambió);
+        # los diálogos que ya no están en el catálogo (borrados del disco) salen del índice.
+        # Devuelve (añadidos, eliminados)
+        store = store or get_default_store()
+        store.refresh()
+        where, params = store._where("dialog", {})
+        query = f"SELECT path, {', '.join(META_COLUMNS)}, content FROM artifacts{where}"
+        added = 0
+        seen = set()
+        with self._lock:
+            for row in store.iter_query(query, params):
+                seen.add(row["path"])
+                added += self._insert(row["path"], row["content"] or "", row)
+                if added % 1000 == 999:
+                    self._conn.commit()
+            gone = [i for i, path in self._conn.execute("SELECT id, path FROM dialogs") if path not in seen]
+            self._delete(gone)
+            self._conn.commit()
+        return added, len(gone)
+
+    # === Consultas
+    def _rows(self, ids):
+        rows = []
+        for start in range(0, len(ids), 900):
+            chunk = ids[start:start + 900]
+            rows += self._conn.execute(
+                f"SELECT id, path, {', '.join(META_COLUMNS)}, signature FROM dialogs "
+                f"WHERE id IN ({', '.join('?' * len(chunk))})", chunk).fetchall()
+        return rows
+
+    def query(self, text, threshold=THRESHOLD, exclude=None):
+        # Casi-duplicados de un texto: [{path, similarity, metadatos}] de más a menos parecido
+        sig = signature(text)
+        if sig is None:
+            return []
+        return self._query_signature(sig, threshold, exclude)
+
+    def _query_signature(self, sig, threshold, exclude=None):
+        keys = band_keys(sig)
+        with self._lock:
+            candidates = [r[0] for r in self._conn.execute(
+                "SELECT DISTINCT dialog FROM bands WHERE " + " OR ".join(["(band = ? AND bucket = ?)"] * BANDS),
+                [v for pair in enumerate(keys) for v in pair])]
+            rows = self._rows(candidates)
+        matches = []
+        for row in rows:
+            score = float(similarity(sig, np.frombuffer(row[-1], dtype=np.uint32)))
+            if score >= threshold and row[1] != exclude:
+                matches.append(dict(zip(["path", *META_COLUMNS], row[1:-1]), similarity=score))
+        return sorted(matches, key=lambda m: (-m["similarity"], m["path"]))
+
+    def duplicates_of(self, path, threshold=THRESHOLD):
+        # Por ruta del índice (relativa a experiments/) o por fichero en disco
+        with self._lock:
+            row = self._conn.execute("SELECT signature FROM dialogs WHERE path = ?", (str(path),)).fetchone()
+        if row is not None:
+            return self._query_signature(np.frombuffer(row[0], dtype=np.uint32), threshold, exclude=str(path))
+        meta = describe(path)
+        exclude = meta["path"] if meta else None
+        return self.query(Path(path).read_text(encoding="utf-8"), threshold, exclude)
+
+    def pairs(self, threshold=THRESHOLD):
+        # Todos los pares que comparten alguna banda, verificados con la firma completa:
+        # (ids a, ids b, similitud), más los metadatos por id
+        with self._lock:
+            bands = np.array(self._conn.execute("SELECT band, bucket, dialog FROM bands").fetchall(), dtype=np.int64)
+            dialogs = self._conn.execute(f"SELECT id, path, {', '.join(META_COLUMNS)}, signature FROM dialogs").fetchall()
+        ids = np.array([r[0] for r in dialogs], dtype=np.int64)
+        meta = {r[0]: dict(zip(["path", *META_COLUMNS], r[1:-1])) for r in dialogs}
+        if not len(bands):
+            return np.zeros(0, np.int64), np.zeros(0, np.int64), np.zeros(0), meta
+        order = np.lexsort((bands[:, 2], bands[:, 1], bands[:, 0]))
+        bands = bands[order]
+        # Cubos con más de un diálogo: los pares salen solo de ahí
+        starts = np.flatnonzero(np.concatenate([[True], (bands[1:, :2] != bands[:-1, :2]).any(axis=1), [True]]))
+        candidates = set()
+        for start, end in zip(starts[:-1], starts[1:]):
+            if end - start > 1:
+                members = bands[start:end, 2]
+                for i in range(len(members)):
+                    for j in range(i + 1, len(members)):
+                        candidates.add((members[i], members[j]))
+        if not candidates:
+            return np.zeros(0, np.int64), np.zeros(0, np.int64), np.zeros(0), meta
+        a, b = np.array(sorted(candidates), dtype=np.int64).T
+        position = {dialog: i for i, dialog in enumerate(ids)}
+        sigs = np.stack([np.frombuffer(r[-1], dtype=np.uint32) for r in dialogs])
+        scores = similarity(sigs[[position[x] for x in a]], sigs[[position[x] for x in b]])
+        keep = scores >= threshold
+        return a[keep], b[keep], scores[keep], meta
+
+    def report(self, by=GROUP_BY, threshold=THRESHOLD):
+        # Por grupo: diálogos, cuántos tienen algún casi-duplicado (dentro del grupo o fuera),
+        # pares dentro del grupo, grupos de duplicados (componentes conexas) y el mayor
+        import pandas as pd
+
+        a, b, scores, meta = self.pairs(threshold)
+        parent = {dialog: dialog for dialog in meta}
+
+        def find(x):
+            while parent[x] != x:
+                parent[x] = parent[parent[x]]
+                x = parent[x]
+            return x
+
+        for x, y in zip(a.tolist(), b.tolist()):
+            parent[find(x)] = find(y)
+        label = {dialog: tuple("" if m[k] is None else m[k] for k in by) for dialog, m in meta.items()}
+        stats = {}
+        for dialog in meta:
+            group = stats.setdefault(label[dialog], {"dialogs": 0, "with_duplicates": 0, "pairs": 0,
+                                                     "cross_group_pairs": 0, "similarity": [], "clusters": {}})
+            group["dialogs"] += 1
+        duplicated = set(a.tolist()) | set(b.tolist())
+        for dialog in duplicated:
+            group = stats[label[dialog]]
+            group["with_duplicates"] += 1
+            root = find(dialog)
+            group["clusters"][root] = group["clusters"].get(root, 0) + 1
+        for x, y, score in zip(a.tolist(), b.tolist(), scores.tolist()):
+            if label[x] == label[y]:
+                stats[label[x]]["pairs"] += 1
+                stats[label[x]]["similarity"].append(score)
+            else:
+                stats[label[x]]["cross_group_pairs"] += 1
+                stats[label[y]]["cross_group_pairs"] += 1
+        rows = []
+        for key in sorted(stats):
+            group = stats[key]
+            rows.append({
+                **dict(zip(by, key)),
+                "dialogs": group["dialogs"],
+                "with_duplicates": group["with_duplicates"],
+                "duplicate_rate": group["with_duplicates"] / group["dialogs"],
+                "pairs": group["pairs"],
+                "cross_group_pairs": group["cross_group_pairs"],
+                "clusters": len(group["clusters"]),
+                "largest_cluster": max(group["clusters"].values(), default=0),
+                "mean_similarity": float(np.mean(group["similarity"])) if group["similarity"] else None,
+            })
+        return pd.DataFrame(rows, columns=[*by, "dialogs", "with_duplicates", "duplicate_rate", "pairs",
+                                           "cross_group_pairs", "clusters", "largest_cluster", "mean_similarity"])
+
+    def stats(self):
+        with self._lock:
+            dialogs = self._conn.execute("SELECT COUNT(*) FROM dialogs").fetchone()[0]
+            buckets = self._conn.execute("SELECT COUNT(*) FROM (SELECT DISTINCT band, bucket FROM bands)").fetchone()[0]
+        return {"dialogs": dialogs, "buckets": buckets}
+
+
+_indexes = {}
+_indexes_lock = threading.Lock()
+
+
+def get_index(path=DEFAULT_INDEX_PATH):
+    with _indexes_lock:
+        if path not in _indexes:
+            _indexes[path] = NearDuplicateIndex(path)
+        return _indexes[path]
+
+
+def record_dialog(path):
+    # Llamado desde Manifest.record: cada diálogo escrito entra en el índice al momento
+    if os.getenv("NEAR_DUP_INDEX") == "0":
+        return
+    meta = describe(path)
+    if meta is None or meta["kind"] != "dialog":
+        return
+    try:
+        get_index().add(meta["path"], Path(path).read_text(encoding="utf-8"), meta)
+    except (OSError, sqlite3.Error) as e:
+        print(f"⚠️ Near-duplicate index not updated for {path}: {e}")
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="MinHash/LSH near-duplicate index over generated dialogs.")
+    parser.add_argument("command", nargs="?", default="report", choices=["build", "stats", "query", "report"])
+    parser.add_argument("dialog", nargs="?", help="query: dialog path (indexed path or file on disk)")
+    parser.add_argument("--threshold", type=float, default=THRESHOLD)
+    parser.add_argument("--by", default=",".join(GROUP_BY), help="report: comma-separated grouping columns")
+    parser.add_argument("--out", help="report: write it to this CSV/XLSX file")
+    args = parser.parse_args()
+
+    index = get_index()
+    start = time.perf_counter()
+    if args.command == "build":
+        added, removed = index.sync()
+        print(f"🧬 {index.path}: {added} dialogs added, {removed} removed in {time.perf_counter() - start:.2f}s | {index.stats()}")
+    elif args.command == "stats":
+        print(f"🧬 {index.path}: {index.stats()}")
+    elif args.command == "query":
+        if not args.dialog:
+            parser.error("query needs a dialog path")
+        matches = index.duplicates_of(args.dialog, args.threshold)
+        print(f"🔎 {len(matches)} near-duplicates of {args.dialog} (≥ {args.threshold})")
+        for match in matches:
+            print(f"   {match['similarity']:.2f}  {match['path']}")
+    else:
+        index.sync()
+        by = [c for c in args.by.split(",") if c]
+        report = index.report(by, args.threshold)
+        print(f"🧬 {int(report['dialogs'].sum())} dialogs, {int(report['with_duplicates'].sum())} with near-duplicates "
+              f"(≥ {args.threshold}) in {time.perf_counter() - start:.2f}s")
+        if args.out:
+            if args.out.endswith(".xlsx"):
+                report.to_excel(args.out, index=False)
+            else:
+                report.to_csv(args.out, index=False)
+            print(f"✅ Duplication report saved to {args.out}")
+        else:
+            import pandas as pd
+
+            with pd.option_context("display.max_rows", None, "display.width", 200):
+                print(report.round(3).to_string(index=False))
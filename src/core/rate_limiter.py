@@ -0,0 +1,127 @@
+import json
+import time
+import asyncio
+import threading
+
+# Límites por modelo (cuota gratuita de Groq). Ajustar si cambia el plan.
+MODEL_LIMITS = {
+    "llama3-8b-8192": {"requests_per_minute": 30, "tokens_per_minute": 30000},
+    "llama3-70b-8192": {"requests_per_minute": 30, "tokens_per_minute": 6000},
+}
+DEFAULT_LIMITS = {"requests_per_minute": 30, "tokens_per_minute": 6000}
+
+
+def estimate_tokens(text):
+    # Aproximación barata: ~4 caracteres por token en inglés
+    return max(1, len(text) // 4)
+
+
+class TokenBucket:
+    def __init__(self, capacity, refill_per_second):
+        self.capacity = float(capacity)
+        self.refill_per_second = float(refill_per_second)
+        self.tokens = float(capacity)
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.refill_per_second)
+        self.updated = now
+
+    def reserve(self, amount):
+        # Reserva `amount` tokens y devuelve cuántos segundos hay que esperar
+        # antes de usarlos. El saldo puede quedar negativo: así las peticiones
+        # concurrentes quedan en cola en orden de llegada.
+        amount = min(float(amount), self.capacity)
+        with self._lock:
+            self._refill()
+            self.tokens -= amount
+            if self.tokens >= 0:
+                return 0.0
+            return -self.tokens / self.refill_per_second
+
+    def drain(self, seconds):
+        # El proveedor nos ha pedido esperar: vaciamos el cubo en consecuencia
+        with self._lock:
+            self._refill()
+            self.tokens = min(self.tokens, -seconds * self.refill_per_second)
+
+
+class RateLimiter:
+    def __init__(self, requests_per_minute, tokens_per_minute):
+        self.requests = TokenBucket(requests_per_minute, requests_per_minute / 60.0)
+        self.tokens = TokenBucket(tokens_per_minute, tokens_per_minute / 60.0)
+
+    def _delay(self, tokens):
+        return max(self.requests.reserve(1), self.tokens.reserve(tokens))
+
+    def acquire(self, tokens):
+        wait = self._delay(tokens)
+        if wait > 0:
+            time.sleep(wait)
+        return wait
+
+    async def acquire_async(self, tokens):
+        wait = self._delay(tokens)
+        if wait > 0:
+            await asyncio.sleep(wait)
+        return wait
+
+    def penalize(self, seconds):
+        self.requests.drain(seconds)
+        self.tokens.drain(seconds)
+
+
+_limiters = {}
+_limiters_lock = threading.Lock()
+
+
+def get_rate_limiter(model_name, requests_per_minute=None, tokens_per_minute=None):
+    # Un limitador por modelo y proceso, compartido por todos los generadores
+    with _limiters_lock:
+        if model_name not in _limiters:
+            limits = MODEL_LIMITS.get(model_name, DEFAULT_LIMITS)
+            _limiters[model_name] = RateLimiter(
+                requests_per_minute or limits["requests_per_minute"],
+                tokens_per_minute or limits["tokens_per_minute"],
+            )
+        return _limiters[model_name]
+
+
+def _error_payload(e):
+    text = str(e)
+    start = text.find("{")
+    if start == -1:
+        raise ValueError("No error payload")
+    return json.loads(text[start:].replace("'", '"'))
+
+
+def is_rate_limit_error(e):
+    status = getattr(e, "status_code", None)
+    if status == 429:
+        return True
+    # 413 "Request too large" trae el mismo code, pero esperar no lo arregla
+    if status == 413:
+        return False
+    try:
+        err = _error_payload(e).get("error", {})
+        return err.get("code") == "rate_limit_exceeded" and not err.get("message", "").startswith("Request too large")
+    except:
+        return False
+
+
+def extract_wait_time(e):
+    try:
+        err = _error_payload(e)
+        msg = err["error"]["message"]
+        for part in msg.split():
+            part = part.rstrip(".,")
+            if part.endswith("s") and "m" in part:
+                mins, secs = part.replace("s", "").split("m")
+                return int(mins) * 60 + float(secs)
+            if part.endswith("s") and part[:-1].replace(".", "", 1).isdigit():
+                return float(part[:-1])
+        return 90
+    except:
+        return 90
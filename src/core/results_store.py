@@ -0,0 +1,369 @@
+import os
+import re
+import json
+import time
+import sqlite3
+import threading
+from pathlib import Path
+
+# Almacén único de resultados: cada spec, diálogo, puntuación y salida cruda de
+# experiments/ es una fila con sus metadatos (modelo, eje, variante, versión de
+# prompt, run, fechas). Las herramientas de exportación lo cargan con una sola
+# consulta en lugar de recorrer miles de ficheros con rglob. Se alimenta solo
+# (Manifest.record llama a ingest) y se puede reconstruir con `build`.
+# También es el catálogo de experiments/: `find` y `variants` son búsquedas por
+# índice sobre los metadatos, y `refresh` solo relee lo que cambió (mtime/tamaño).
+
+DEFAULT_STORE_PATH = os.getenv("RESULTS_STORE_PATH", "experiments/results.sqlite")
+EXPERIMENTS_DIR = Path("experiments")
+BUILD_BATCH = 500
+METRICS = ["fluency", "coherence", "realism", "fidelity_to_specification", "engagement", "originality"]
+COLUMNS = [
+    "path", "kind", "model", "axis", "variant", "folder", "version", "run", "dialog_id", "stage",
+    "content", *METRICS, "comments", "mtime", "size", "created_at", "updated_at",
+]
+
+# (patrón del nombre de fichero, tipo). Los grupos con nombre rellenan los metadatos.
+PATTERNS = [
+    (re.compile(r"^(?P<dialog_id>.+)_spec\.json$"), "spec"),
+    (re.compile(r"^(?P<dialog_id>.+)_gen\.txt$"), "dialog"),
+    (re.compile(r"^(?P<dialog_id>.+)_(?P<version>v\d+)_run(?P<run>\d+)_eval\.json$"), "scores"),
+    (re.compile(r"^(?P<dialog_id>.+)_eval\.json$"), "scores"),
+    (re.compile(r"^(?P<dialog_id>.+)_(?:raw_output|spec)\.txt$"), "raw"),
+    (re.compile(r"^(?P<version>.+)_dialog(?:_(?P<run>\d+))?\.txt$"), "dialog"),
+    (re.compile(r"^(?P<version>.+)_scores(?:_(?P<run>\d+))?\.json$"), "scores"),
+    (re.compile(r"^(?P<dialog_id>.+)_(?P<version>v\d+)_run(?P<run>\d+)\.txt$"), "dialog"),
+    (re.compile(r"^(?P<dialog_id>.+)\.json$"), "spec"),
+]
+KIND_FOLDERS = {
+    "specifications", "generated_dialogs", "evaluated_dialogs", "specifications_failed",
+    "specs", "dialogs", "evaluations",
+}
+
+
+def describe(path, base_dir=EXPERIMENTS_DIR):
+    # Metadatos a partir de la ruta: experiments/<model>/<axis>/<variant>/<folder>/<fichero>
+    path = Path(path)
+    try:
+        parts = path.resolve().relative_to(Path(base_dir).resolve()).parts
+    except ValueError:
+        # Fuera de base_dir (otra copia, ruta absoluta): se ancla en la carpeta "experiments"
+        parts = path.parts
+        if Path(base_dir).name in parts:
+            parts = parts[len(parts) - parts[::-1].index(Path(base_dir).name):]
+    if len(parts) < 3 or path.suffix not in (".json", ".txt"):
+        return None
+    folder_idx = next(
+        (i for i, p in enumerate(parts[:-1]) if p in KIND_FOLDERS or p.startswith("ablation_outputs")),
+        len(parts) - 2
+    )
+    meta = {
+        "path": Path(*parts).as_posix(),
+        "model": parts[0],
+        "axis": parts[1] if folder_idx > 1 else None,
+        "variant": parts[2] if folder_idx > 2 and parts[2] != "outputs" else None,
+        "folder": parts[folder_idx],
+        "version": None,
+        "run": None,
+        "dialog_id": None,
+    }
+    for pattern, kind in PATTERNS:
+        match = pattern.match(parts[-1])
+        if match:
+            meta["kind"] = kind
+            for key, value in match.groupdict().items():
+                if value is not None:
+                    meta[key] = int(value) if key == "run" else value
+            return meta
+    return None
+
+
+class ResultsStore:
+    def __init__(self, path=DEFAULT_STORE_PATH, base_dir=EXPERIMENTS_DIR):
+        self.path = path
+        self.base_dir = Path(base_dir)
+        self._lock = threading.Lock()
+        self._refreshed = None
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        metric_cols = "".join(f" {m} REAL," for m in METRICS)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS artifacts ("
+            " path TEXT PRIMARY KEY, kind TEXT NOT NULL, model TEXT, axis TEXT, variant TEXT, folder TEXT,"
+            " version TEXT, run INTEGER, dialog_id TEXT, stage TEXT, content TEXT,"
+            f"{metric_cols} comments TEXT,"
+            " mtime REAL, size INTEGER, created_at REAL NOT NULL, updated_at REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS artifacts_meta ON artifacts (kind, model, axis, variant, version)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS artifacts_version ON artifacts (kind, version, run)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS artifacts_dialog ON artifacts (dialog_id, kind)")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS verification ("
+            " source TEXT, mtime REAL, size INTEGER, model TEXT, category TEXT, variant TEXT, dialog_id TEXT,"
+            " topic TEXT, subplot TEXT, imperfections TEXT, prompt_type TEXT, overall TEXT)"
+        )
+        self._conn.commit()
+
+    def _row(self, path, stage=None, base_dir=None):
+        meta = describe(path, base_dir or self.base_dir)
+        if meta is None:
+            return None
+        stat = Path(path).stat()
+        content = Path(path).read_text(encoding="utf-8", errors="replace")
+        row = dict(meta, stage=stage, content=content, mtime=stat.st_mtime, size=stat.st_size, comments=None)
+        for metric in METRICS:
+            row[metric] = None
+        if meta["kind"] == "scores":
+            try:
+                scores = json.loads(content)
+            except ValueError:
+                scores = {}
+            if not isinstance(scores, dict):
+                scores = {}
+            for metric in METRICS:
+                value = scores.get(metric)
+                row[metric] = value if isinstance(value, (int, float)) else None
+            row["comments"] = scores.get("comments")
+        return row
+
+    def _upsert(self, rows):
+        now = time.time()
+        cols = COLUMNS[:-2]
+        self._conn.executemany(
+            f"INSERT INTO artifacts ({', '.join(cols)}, created_at, updated_at)"
+            f" VALUES ({', '.join('?' * len(cols))}, ?, ?)"
+            " ON CONFLICT(path) DO UPDATE SET "
+            + ", ".join(f"{c} = excluded.{c}" for c in cols if c != "path")
+            + ", stage = COALESCE(excluded.stage, artifacts.stage), updated_at = excluded.updated_at",
+            [tuple(row[c] for c in cols) + (now, now) for row in rows]
+        )
+
+    def ingest(self, path, stage=None):
+        row = self._row(path, stage)
+        if row is None:
+            return False
+        with self._lock:
+            self._upsert([row])
+            self._conn.commit()
+        return True
+
+    def build(self, base_dir=None):
+        # Recorrido completo e incremental: solo relee ficheros con mtime/tamaño distintos
+        base_dir = Path(base_dir or self.base_dir)
+        with self._lock:
+            known = {p: (m, s) for p, m, s in self._conn.execute("SELECT path, mtime, size FROM artifacts")}
+        rows, seen, updated = [], set(), 0
+        for path in base_dir.rglob("*"):
+            if not path.is_file() or path.suffix not in (".json", ".txt") or path.name == "manifest.json":
+                continue
+            meta = describe(path, base_dir)
+            if meta is None:
+                continue
+            seen.add(meta["path"])
+            stat = path.stat()
+            if known.get(meta["path"]) == (stat.st_mtime, stat.st_size):
+                continue
+            rows.append(self._row(path, base_dir=base_dir))
+            if len(rows) >= BUILD_BATCH:
+                updated += self._flush(rows)
+        updated += self._flush(rows)
+        gone = set(known) - seen
+        with self._lock:
+            self._conn.executemany("DELETE FROM artifacts WHERE path = ?", [(p,) for p in gone])
+            self._conn.commit()
+        return {"updated": updated, "removed": len(gone), "total": len(seen)}
+
+    def _flush(self, rows):
+        # Escritura por lotes: el contenido leído no se acumula en memoria
+        with self._lock:
+            self._upsert(rows)
+            self._conn.commit()
+        n = len(rows)
+        rows.clear()
+        return n
+
+    def _where(self, kind, filters):
+        clauses, params = [], []
+        if kind:
+            clauses.append("kind = ?")
+            params.append(kind)
+        for column, value in filters.items():
+            if column not in COLUMNS:
+                raise ValueError(f"Unknown column '{column}'")
+            clauses.append(f"{column} IS NULL" if value is None else f"{column} = ?")
+            if value is not None:
+                params.append(value)
+        return (" WHERE " + " AND ".join(clauses) if clauses else ""), params
+
+    def refresh(self, force=False):
+        # Catálogo al día una vez por proceso; después, las escrituras llegan por ingest
+        if force or not self._refreshed:
+            self._refreshed = self.build()
+        return self._refreshed
+
+    def find(self, kind=None, **filters):
+        # Consulta al índice por metadatos en vez de recorrer carpetas:
+        # find("scores", model="llama3_70b", axis="tone", version="v3") → [Path, ...]
+        where, params = self._where(kind, filters)
+        with self._lock:
+            rows = self._conn.execute(f"SELECT path FROM artifacts{where} ORDER BY path", params).fetchall()
+        return [self.base_dir / r[0] for r in rows]
+
+    def variants(self, kind=None, **filters):
+        # (modelo, eje, variante) distintos con artefactos que cumplen el filtro
+        where, params = self._where(kind, filters)
+        with self._lock:
+            return self._conn.execute(
+                f"SELECT DISTINCT model, axis, variant FROM artifacts{where} ORDER BY model, axis, variant", params
+            ).fetchall()
+
+    def load(self, kind=None, **filters):
+        # Una sola consulta → DataFrame; filtros por columna: load("scores", folder="ablation_outputs")
+        import pandas as pd
+
+        where, params = self._where(kind, filters)
+        with self._lock:
+            return pd.read_sql_query(f"SELECT * FROM artifacts{where} ORDER BY path", self._conn, params=params)
+
+    def _ablation_query(self, folder=None, repeated=None):
+        # Puntuaciones de ablación junto con su diálogo (mismo modelo/eje/variante/carpeta/versión/run)
+        query = (
+            "SELECT s.*, d.content AS dialog, d.path AS dialog_path FROM artifacts s"
+            " LEFT JOIN artifacts d ON d.kind = 'dialog' AND d.model = s.model AND d.axis IS s.axis"
+            " AND d.variant IS s.variant AND d.folder = s.folder AND d.version = s.version AND d.run IS s.run"
+            " AND d.dialog_id IS NULL"
+            " WHERE s.kind = 'scores' AND s.dialog_id IS NULL AND s.folder LIKE 'ablation_outputs%'"
+        )
+        params = []
+        if folder:
+            query += " AND s.folder = ?"
+            params.append(folder)
+        if repeated is not None:
+            query += " AND s.run IS NOT NULL" if repeated else " AND s.run IS NULL"
+        return query + " ORDER BY s.model, s.axis, s.variant, s.version, s.run", params
+
+    def load_ablation(self, folder=None, repeated=None):
+        import pandas as pd
+
+        query, params = self._ablation_query(folder, repeated)
+        with self._lock:
+            return pd.read_sql_query(query, self._conn, params=params)
+
+    def iter_ablation(self, folder=None, repeated=None):
+        query, params = self._ablation_query(folder, repeated)
+        return self.iter_query(query, params)
+
+    def iter_query(self, query, params=()):
+        # Filas de una en una (dicts) desde una conexión de solo lectura propia:
+        # en WAL no bloquea a los escritores y la memoria no depende del resultado
+        conn = sqlite3.connect(f"file:{self.path}?mode=ro", uri=True)
+        conn.row_factory = sqlite3.Row
+        try:
+            for row in conn.execute(query, params):
+                yield dict(row)
+        finally:
+            conn.close()
+
+    def entries(self, kind=None, **filters):
+        # Metadatos del catálogo sin el contenido de los ficheros
+        where, params = self._where(kind, filters)
+        columns = [c for c in COLUMNS if c not in ("content", "comments", *METRICS)]
+        return self.iter_query(f"SELECT {', '.join(columns)} FROM artifacts{where} ORDER BY path", params)
+
+    def export_layout(self, dest_dir):
+        # Vuelve a escribir la estructura de carpetas de experiments/ a partir del almacén
+        dest_dir = Path(dest_dir)
+        with self._lock:
+            rows = self._conn.execute("SELECT path, content FROM artifacts").fetchall()
+        for rel_path, content in rows:
+            out = dest_dir / rel_path
+            out.parent.mkdir(parents=True, exist_ok=True)
+            out.write_text(content, encoding="utf-8")
+        return len(rows)
+
+    def to_parquet(self, out_path):
+        frame = self.load()
+        frame.to_parquet(out_path, index=False)
+        return len(frame)
+
+    # === Verificación manual (hojas evaluation_semantics_<eje>_<variante>_<8b|70b>.xlsx)
+    def ingest_verification(self, xlsx_dir):
+        # Solo relee las hojas cuyo mtime/tamaño cambió desde la última carga
+        import pandas as pd
+
+        with self._lock:
+            known = dict(((s, (m, z)) for s, m, z in self._conn.execute(
+                "SELECT DISTINCT source, mtime, size FROM verification")))
+        updated = 0
+        for xlsx_path in sorted(Path(xlsx_dir).glob("evaluation_semantics_*.xlsx")):
+            stat = xlsx_path.stat()
+            if known.get(xlsx_path.name) == (stat.st_mtime, stat.st_size):
+                continue
+            parts = xlsx_path.stem.split("_")
+            if len(parts) < 5:
+                print(f"⚠️ Nombre de archivo no válido: {xlsx_path.stem}")
+                continue
+            df = pd.read_excel(xlsx_path).fillna("")
+            rows = [
+                (xlsx_path.name, stat.st_mtime, stat.st_size, f"llama3_{parts[-1]}", parts[2], "_".join(parts[3:-1]),
+                 str(r.get("Dialog ID", "")), str(r.get("Topic ", "")), str(r.get("Subplot ", "")),
+                 str(r.get("Imperfections ", "")), str(r.get("Prompt Type", "")), str(r.get("Overall", "")))
+                for r in df.to_dict("records")
+            ]
+            with self._lock:
+                self._conn.execute("DELETE FROM verification WHERE source = ?", (xlsx_path.name,))
+                self._conn.executemany(f"INSERT INTO verification VALUES ({', '.join('?' * 12)})", rows)
+                self._conn.commit()
+            updated += 1
+        return updated
+
+    def load_verification(self):
+        import pandas as pd
+
+        with self._lock:
+            return pd.read_sql_query("SELECT * FROM verification", self._conn)
+
+    def stats(self):
+        with self._lock:
+            rows = self._conn.execute("SELECT kind, COUNT(*) FROM artifacts GROUP BY kind").fetchall()
+        return dict(rows)
+
+
+_stores = {}
+_stores_lock = threading.Lock()
+
+
+def get_default_store(path=DEFAULT_STORE_PATH):
+    with _stores_lock:
+        if path not in _stores:
+            _stores[path] = ResultsStore(path)
+        return _stores[path]
+
+
+def record_artifact(path, stage=None):
+    # Llamado desde Manifest.record: toda escritura de artefacto llega también al almacén
+    if os.getenv("RESULTS_STORE") == "0":
+        return
+    try:
+        get_default_store().ingest(path, stage)
+    except (OSError, sqlite3.Error) as e:
+        print(f"⚠️ Results store not updated for {path}: {e}")
+
+
+if __name__ == "__main__":
+    import sys
+
+    command = sys.argv[1] if len(sys.argv) > 1 else "build"
+    store = get_default_store()
+    if command == "export":
+        dest = sys.argv[2] if len(sys.argv) > 2 else "experiments_export"
+        print(f"📂 Exported {store.export_layout(dest)} files to {dest}")
+    elif command == "parquet":
+        dest = sys.argv[2] if len(sys.argv) > 2 else "experiments/results.parquet"
+        print(f"🧱 Wrote {store.to_parquet(dest)} rows to {dest}")
+    elif command == "stats":
+        print(f"📦 {store.path}: {store.stats()}")
+    else:
+        print(f"📦 {store.path}: {store.build()} | {store.stats()}")
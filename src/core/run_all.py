@@ -1,17 +1,22 @@
+import os
 import subprocess
 
+# Las etapas son incrementales (manifest.json por variante): tras un fallo o un
+# cambio de prompt solo se recalculan los artefactos cuyas entradas cambiaron.
+ENV = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, ["src/core", os.environ.get("PYTHONPATH")])))
+
 print("Starting full synthetic dialog pipeline...\n")
 
 # === Step 1: Generate specifications and dialogs
 print("\n ️ Step 1: Running batch_generate.py...")
-subprocess.run(["python", "src/batch_generate.py"], check=True)
+subprocess.run(["python", "src/batch_scripts/batch_generate.py"], check=True, env=ENV)
 
 # === Step 2: Repair failed specifications (if any)
 print("\n Step 2: Running repair_failed_specs.py...")
-subprocess.run(["python", "src/repair_failed_specs.py"], check=True)
+subprocess.run(["python", "src/core/repair_failed_specs.py"], check=True, env=ENV)
 
 # === Step 3: Evaluate generated dialogs
 print("\n Step 3: Running batch_evaluate.py...")
-subprocess.run(["python", "src/batch_evaluate.py"], check=True)
+subprocess.run(["python", "src/batch_scripts/batch_evaluate.py"], check=True, env=ENV)
 
 print("\n✅ DONE: All tasks completed successfully.")
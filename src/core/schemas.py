@@ -0,0 +1,63 @@
+import json
+import threading
+
+# Esquemas JSON de las dos salidas estructuradas del proyecto: la especificación
+# de un diálogo y el diccionario de puntuaciones del evaluador. Se envían al
+# backend en modo estructurado (response_format en la API, gramática GBNF en
+# local) y se validan con un validador compilado una sola vez por esquema.
+
+SPEC_SCHEMA = {
+    "title": "dialog_specification",
+    "type": "object",
+    "properties": {
+        "topic": {"type": "string"},
+        "turns": {"type": "integer", "minimum": 1},
+        "participants": {"type": "integer", "minimum": 1},
+        "tone": {"type": "object", "additionalProperties": {"type": "string"}},
+        "goals": {"type": "object", "additionalProperties": {"type": "string"}},
+        "subplots": {"type": "array", "items": {"type": "string"}},
+        "imperfections": {"type": "array", "items": {"type": "string"}},
+    },
+    "required": ["topic", "turns", "participants", "tone", "goals", "subplots", "imperfections"],
+}
+
+SCORE = {"type": "integer", "minimum": 1, "maximum": 5}
+SCORES_SCHEMA = {
+    "title": "dialog_scores",
+    "type": "object",
+    "properties": {
+        "fluency": SCORE,
+        "coherence": SCORE,
+        "realism": SCORE,
+        "fidelity_to_specification": SCORE,
+        "engagement": SCORE,
+        "originality": SCORE,
+        "comments": {"type": "string"},
+    },
+    "required": ["fluency", "coherence", "realism", "fidelity_to_specification", "engagement", "originality", "comments"],
+}
+
+_validators = {}
+_validators_lock = threading.Lock()
+
+
+def schema_key(schema):
+    return json.dumps(schema, sort_keys=True)
+
+
+def get_validator(schema):
+    from jsonschema.validators import validator_for
+
+    key = schema_key(schema)
+    with _validators_lock:
+        if key not in _validators:
+            cls = validator_for(schema)
+            cls.check_schema(schema)
+            _validators[key] = cls(schema)
+        return _validators[key]
+
+
+def validation_errors(data, schema):
+    # Lista de errores legibles ("turns: 'six' is not of type 'integer'"); vacía si es válido
+    errors = sorted(get_validator(schema).iter_errors(data), key=lambda e: list(e.path))
+    return [f"{'.'.join(str(p) for p in e.path) or '<root>'}: {e.message}" for e in errors]
@@ -0,0 +1,174 @@
+import time
+import warnings
+import numpy as np
+from results_store import get_default_store, METRICS
+
+# Estadística de las puntuaciones del juez sobre todo el corpus: las notas se
+# cargan del almacén de resultados en una matriz NumPy (filas × criterios) y las
+# medias, varianzas e intervalos bootstrap se calculan para cualquier agrupación
+# (modelo × eje × variante × versión de prompt) sin bucles por grupo: las filas
+# se ordenan por grupo y cada remuestreo se suma con np.add.reduceat.
+#
+#   PYTHONPATH=src/core python src/core/score_analytics.py --folder ablation_outputs --boot 5000
+
+GROUP_BY = ["model", "axis", "variant", "version"]
+KEY_COLUMNS = ["model", "axis", "variant", "folder", "version", "run", "dialog_id", "path"]
+N_BOOT = 2000
+CI = 95
+CHUNK_CELLS = 4_000_000  # valores remuestreados por bloque (~32 MB en float64)
+
+
+class ScoreTable:
+    # keys: columna → array de etiquetas por fila; scores: matriz (filas × métricas) con NaN si falta la nota
+    def __init__(self, keys, scores, metrics=METRICS):
+        self.keys = {k: np.asarray(v, dtype=object) for k, v in keys.items()}
+        self.scores = np.asarray(scores, dtype=np.float64).reshape(-1, len(metrics))
+        self.metrics = list(metrics)
+
+    @classmethod
+    def from_store(cls, store=None, kind="scores", **filters):
+        # Una consulta sobre el catálogo, sin leer ficheros: from_store(folder="ablation_outputs", model="llama3_8b")
+        store = store or get_default_store()
+        store.refresh()
+        where, params = store._where(kind, filters)
+        query = f"SELECT {', '.join(KEY_COLUMNS + METRICS)} FROM artifacts{where} ORDER BY path"
+        rows = list(store.iter_query(query, params))
+        keys = {k: [r[k] for r in rows] for k in KEY_COLUMNS}
+        scores = np.array([[r[m] for m in METRICS] for r in rows], dtype=np.float64)
+        return cls(keys, scores)
+
+    @classmethod
+    def from_frame(cls, frame, metrics=METRICS, columns=None):
+        # Desde un DataFrame (p. ej. la plantilla de verificación humana de los notebooks)
+        import pandas as pd
+
+        columns = [c for c in frame.columns if c not in metrics] if columns is None else columns
+        keys = {c: frame[c].to_numpy(dtype=object) for c in columns}
+        scores = frame[list(metrics)].apply(pd.to_numeric, errors="coerce").to_numpy(dtype=np.float64)
+        return cls(keys, scores, metrics)
+
+    def __len__(self):
+        return len(self.scores)
+
+    def filter(self, mask):
+        mask = np.asarray(mask, dtype=bool)
+        return ScoreTable({k: v[mask] for k, v in self.keys.items()}, self.scores[mask], self.metrics)
+
+    def groups(self, by=GROUP_BY):
+        # Código de grupo por fila y etiquetas de cada grupo (None → "" para poder ordenar)
+        if not by:
+            return np.zeros(len(self), dtype=np.int64), [()]
+        columns = [np.array(["" if v is None else str(v) for v in self.keys[k]], dtype=object) for k in by]
+        joined = np.array(["\x1f".join(t) for t in zip(*columns)], dtype=object)
+        labels, codes = np.unique(joined, return_inverse=True)
+        return codes.astype(np.int64), [tuple(label.split("\x1f")) for label in labels]
+
+    def _sorted(self, by):
+        codes, labels = self.groups(by)
+        order = np.argsort(codes, kind="stable")
+        sizes = np.bincount(codes, minlength=len(labels))
+        offsets = np.concatenate([[0], np.cumsum(sizes)[:-1]])
+        return codes[order], self.scores[order], sizes, offsets, labels
+
+    def describe(self, by=GROUP_BY):
+        # n, media, varianza (ddof=1) y desviación por grupo y métrica: arrays (grupos × métricas)
+        codes, values, sizes, offsets, labels = self._sorted(by)
+        valid = ~np.isnan(values)
+        filled = np.where(valid, values, 0.0)
+        n = np.add.reduceat(valid.astype(np.int64), offsets, axis=0)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            mean = np.add.reduceat(filled, offsets, axis=0) / n
+            dev = np.where(valid, values - mean[codes], 0.0)
+            var = np.add.reduceat(dev ** 2, offsets, axis=0) / (n - 1)
+        var[n < 2] = np.nan
+        return {"labels": labels, "sizes": sizes, "n": n, "mean": mean, "var": var, "std": np.sqrt(var)}
+
+    def bootstrap(self, by=GROUP_BY, n_boot=N_BOOT, seed=0):
+        # Medias bootstrap (n_boot × grupos × métricas): cada remuestreo toma, dentro de
+        # cada grupo, tantas filas con reemplazo como tiene el grupo; todos los grupos a la vez
+        codes, values, sizes, offsets, labels = self._sorted(by)
+        valid = ~np.isnan(values)
+        filled = np.where(valid, values, 0.0)
+        # En bool, reduceat haría un OR lógico: se cuentan las notas válidas como float
+        valid = valid.astype(np.float64)
+        row_offset = offsets[codes]
+        row_size = sizes[codes]
+        rng = np.random.default_rng(seed)
+        n_rows, n_metrics = values.shape
+        means = np.empty((n_boot, len(labels), n_metrics))
+        chunk = max(1, CHUNK_CELLS // max(1, n_rows * n_metrics))
+        with np.errstate(invalid="ignore", divide="ignore"):
+            for start in range(0, n_boot, chunk):
+                b = min(chunk, n_boot - start)
+                idx = row_offset + (rng.random((b, n_rows)) * row_size).astype(np.int64)
+                sums = np.add.reduceat(filled[idx], offsets, axis=1)
+                counts = np.add.reduceat(valid[idx], offsets, axis=1)
+                means[start:start + b] = sums / counts
+        return labels, means
+
+    def summarize(self, by=GROUP_BY, n_boot=N_BOOT, ci=CI, seed=0):
+        # Tabla larga: una fila por grupo y métrica con n, media, varianza, desviación e IC bootstrap
+        import pandas as pd
+
+        by = list(by)
+        if not len(self):
+            return pd.DataFrame(columns=[*by, "metric", "n", "mean", "var", "std", "ci_low", "ci_high"])
+        stats = self.describe(by)
+        rows = []
+        if n_boot:
+            _, means = self.bootstrap(by, n_boot, seed)
+            with warnings.catch_warnings():
+                warnings.simplefilter("ignore", RuntimeWarning)  # grupos sin ninguna nota de una métrica
+                low, high = np.nanpercentile(means, [(100 - ci) / 2, 100 - (100 - ci) / 2], axis=0)
+        for g, label in enumerate(stats["labels"]):
+            for m, metric in enumerate(self.metrics):
+                row = dict(zip(by, label))
+                row.update({
+                    "metric": metric,
+                    "n": int(stats["n"][g, m]),
+                    "mean": stats["mean"][g, m],
+                    "var": stats["var"][g, m],
+                    "std": stats["std"][g, m],
+                })
+                if n_boot:
+                    row["ci_low"], row["ci_high"] = low[g, m], high[g, m]
+                rows.append(row)
+        return pd.DataFrame(rows)
+
+
+def summarize_scores(by=GROUP_BY, n_boot=N_BOOT, ci=CI, seed=0, store=None, **filters):
+    # Atajo para los notebooks: summarize_scores(["model", "version"], folder="ablation_outputs")
+    return ScoreTable.from_store(store, **filters).summarize(by, n_boot, ci, seed)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Grouped judge-score statistics with bootstrap CIs.")
+    parser.add_argument("--by", default=",".join(GROUP_BY), help="comma-separated grouping columns")
+    parser.add_argument("--boot", type=int, default=N_BOOT, help="bootstrap resamples (0 = none)")
+    parser.add_argument("--ci", type=float, default=CI)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--folder", help="only scores in this folder (e.g. ablation_outputs, evaluated_dialogs)")
+    parser.add_argument("--model")
+    parser.add_argument("--out", help="write the summary to this CSV/XLSX file")
+    args = parser.parse_args()
+
+    filters = {k: v for k, v in (("folder", args.folder), ("model", args.model)) if v}
+    start = time.perf_counter()
+    table = ScoreTable.from_store(**filters)
+    by = [c for c in args.by.split(",") if c]
+    summary = table.summarize(by, args.boot, args.ci, args.seed)
+    print(f"📊 {len(table)} score files, {len(summary) // len(METRICS)} groups, "
+          f"{args.boot} resamples in {time.perf_counter() - start:.2f}s")
+    if args.out:
+        if args.out.endswith(".xlsx"):
+            summary.to_excel(args.out, index=False)
+        else:
+            summary.to_csv(args.out, index=False)
+        print(f"✅ Summary saved to {args.out}")
+    else:
+        import pandas as pd
+
+        with pd.option_context("display.max_rows", None, "display.width", 200):
+            print(summary.round(3).to_string(index=False))
@@ -0,0 +1,263 @@
+import re
+import json
+import time
+import itertools
+from math import comb
+from pathlib import Path
+import numpy as np
+from results_store import describe, METRICS
+from score_analytics import ScoreTable
+
+# Tests de permutación entre versiones de prompt (v1–v4, v5–v8, edge cases v3/v4):
+# para cada celda (modelo × eje × variante × tipo de spec) se comparan todas las
+# parejas de versiones en todas las métricas a la vez. Las parejas con el mismo
+# número de repeticiones se apilan y se evalúan con una sola multiplicación de
+# matrices contra todas las permutaciones (exactas si caben en n_perm, si no
+# aleatorias). Incluye tamaño del efecto y corrección por comparaciones múltiples.
+#
+#   PYTHONPATH=src/core python src/core/significance.py --correction holm
+#   PYTHONPATH=src/core python src/core/significance.py --dir experiments/llama3_8b/tone/tone_humor/ablation_outputs --paired
+
+CELL = ["model", "axis", "variant", "dialog_id"]
+FAMILY = CELL + ["metric"]  # la corrección se aplica a todas las parejas de versiones de una celda y métrica
+N_PERM = 10000
+CHUNK_CELLS = 4_000_000  # estadísticos permutados por bloque (~32 MB en float64)
+ALPHA = 0.05
+CORRECTIONS = ("holm", "fdr_bh", "bonferroni", "none")
+
+
+def version_order(version):
+    # v2 < v10; las versiones con sufijo (v5_no_instructions) se ordenan por su número
+    match = re.match(r"v(\d+)", version or "")
+    return (int(match.group(1)) if match else float("inf"), version or "")
+
+
+def load_dir(path):
+    # Ficheros vN_scores_NN.json de una carpeta (sin pasar por el almacén de resultados)
+    rows = []
+    for file in sorted(Path(path).glob("*_scores*.json")):
+        meta = describe(file.resolve())
+        if meta.get("kind") != "scores":
+            continue
+        try:
+            data = json.loads(file.read_text(encoding="utf-8"))
+        except ValueError:
+            print(f"⚠️ Unreadable scores: {file}")
+            continue
+        meta["scores"] = [data.get(m) if isinstance(data, dict) else None for m in METRICS]
+        rows.append(meta)
+    keys = {k: [r.get(k) for r in rows] for k in ["model", "axis", "variant", "folder", "version", "run", "dialog_id", "path"]}
+    scores = np.array([[np.nan if v is None else v for v in r["scores"]] for r in rows], dtype=np.float64)
+    return ScoreTable(keys, scores)
+
+
+def repeated_scores(table):
+    # Solo puntuaciones con versión y repetición (vN_scores_NN.json, *_vN_runK_eval.json)
+    mask = np.array([v is not None and r is not None for v, r in zip(table.keys["version"], table.keys["run"])], dtype=bool)
+    return table.filter(mask) if len(table) else table
+
+
+def _splits(n_total, n_a, n_perm, rng):
+    # Máscaras (B × N) de qué filas van al grupo A: todas las particiones si caben, si no aleatorias
+    if comb(n_total, n_a) <= n_perm:
+        masks = np.zeros((comb(n_total, n_a), n_total))
+        for i, chosen in enumerate(itertools.combinations(range(n_total), n_a)):
+            masks[i, list(chosen)] = 1.0
+        return masks, True
+    order = np.argsort(rng.random((n_perm, n_total)), axis=1)
+    masks = np.zeros((n_perm, n_total))
+    np.put_along_axis(masks, order[:, :n_a], 1.0, axis=1)
+    return masks, False
+
+
+def _signs(n, n_perm, rng):
+    # Cambios de signo (B × n) para el test pareado: los 2^n si caben, si no aleatorios
+    if 2 ** n <= n_perm:
+        return np.array(list(itertools.product([1.0, -1.0], repeat=n))), True
+    return rng.choice([1.0, -1.0], size=(n_perm, n)), False
+
+
+def _p_values(observed, permutations, statistic, exact):
+    # Dos colas; con permutaciones aleatorias se cuenta la observada (p nunca es 0).
+    # Las permutaciones van por bloques: memoria acotada aunque haya miles de parejas
+    n_pairs, n_metrics = observed.shape
+    chunk = max(1, CHUNK_CELLS // max(1, n_pairs * n_metrics))
+    threshold = np.abs(observed)[:, None, :] - 1e-12
+    extreme = np.zeros(observed.shape)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        for start in range(0, len(permutations), chunk):
+            extreme += (np.abs(statistic(permutations[start:start + chunk])) >= threshold).sum(axis=1)
+    n = len(permutations)
+    p = extreme / n if exact else (extreme + 1) / (n + 1)
+    p[np.isnan(observed)] = np.nan
+    return p
+
+
+def _unpaired(a, b, n_perm, rng):
+    # a: (P × n_a × M), b: (P × n_b × M) con NaN donde falta la nota
+    z = np.concatenate([a, b], axis=1)
+    valid = ~np.isnan(z)
+    filled = np.where(valid, z, 0.0)
+    valid = valid.astype(np.float64)
+    n_a = a.shape[1]
+    masks, exact = _splits(z.shape[1], n_a, n_perm, rng)
+    total, count = filled.sum(axis=1), valid.sum(axis=1)
+
+    def statistic(block):
+        sum_a = np.einsum("bn,pnm->pbm", block, filled)
+        cnt_a = np.einsum("bn,pnm->pbm", block, valid)
+        return sum_a / cnt_a - (total[:, None] - sum_a) / (count[:, None] - cnt_a)
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        mean_a, mean_b = np.nanmean(a, axis=1), np.nanmean(b, axis=1)
+        var_a, var_b = np.nanvar(a, axis=1, ddof=1), np.nanvar(b, axis=1, ddof=1)
+        k_a, k_b = (~np.isnan(a)).sum(axis=1), (~np.isnan(b)).sum(axis=1)
+        pooled = np.sqrt(((k_a - 1) * var_a + (k_b - 1) * var_b) / (k_a + k_b - 2))
+        observed = mean_a - mean_b
+        # Cohen's d; sin varianza en ninguna de las dos versiones no está definido
+        effect = np.where(pooled > 0, observed / pooled, np.nan)
+    return {"n_a": k_a, "n_b": k_b, "mean_a": mean_a, "mean_b": mean_b, "diff": observed,
+            "effect_size": effect, "p_value": _p_values(observed, masks, statistic, exact), "exact": exact}
+
+
+def _paired(a, b, n_perm, rng):
+    # Diferencias por repetición (misma run en las dos versiones); se permutan los signos
+    d = a - b
+    valid = ~np.isnan(d)
+    filled = np.where(valid, d, 0.0)
+    signs, exact = _signs(d.shape[1], n_perm, rng)
+    count = valid.sum(axis=1)
+
+    def statistic(block):
+        return np.einsum("bn,pnm->pbm", block, filled) / count[:, None]
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        observed = filled.sum(axis=1) / count
+        spread = np.nanstd(d, axis=1, ddof=1)
+        effect = np.where(spread > 0, observed / spread, np.nan)  # d_z
+        mean_a, mean_b = np.nanmean(np.where(valid, a, np.nan), axis=1), np.nanmean(np.where(valid, b, np.nan), axis=1)
+    return {"n_a": count, "n_b": count, "mean_a": mean_a, "mean_b": mean_b, "diff": observed,
+            "effect_size": effect, "p_value": _p_values(observed, signs, statistic, exact), "exact": exact}
+
+
+def adjust(p_values, method="holm"):
+    # Corrección de una familia de p-valores (array 1-D, NaN se ignora)
+    p = np.asarray(p_values, dtype=np.float64)
+    out = np.full_like(p, np.nan)
+    ok = ~np.isnan(p)
+    m = int(ok.sum())
+    if not m or method == "none":
+        return p.copy()
+    q = p[ok]
+    order = np.argsort(q)
+    ranked = q[order]
+    if method == "bonferroni":
+        adjusted = np.minimum(ranked * m, 1.0)
+    elif method == "holm":
+        adjusted = np.minimum(np.maximum.accumulate(ranked * (m - np.arange(m))), 1.0)
+    elif method == "fdr_bh":
+        adjusted = np.minimum(np.minimum.accumulate((ranked * m / np.arange(1, m + 1))[::-1])[::-1], 1.0)
+    else:
+        raise ValueError(f"Unknown correction '{method}'. Available: {CORRECTIONS}")
+    result = np.empty(m)
+    result[order] = adjusted
+    out[ok] = result
+    return out
+
+
+def pairwise_tests(table, cell=CELL, paired=False, n_perm=N_PERM, correction="holm", family=FAMILY,
+                   alpha=ALPHA, seed=0):
+    # Todas las parejas de versiones de cada celda × métrica → DataFrame con p, p corregido y efecto
+    import pandas as pd
+
+    table = repeated_scores(table)
+    columns = [*cell, "version_a", "version_b", "metric", "n_a", "n_b", "mean_a", "mean_b", "diff",
+               "effect_size", "p_value", "exact", "p_adjusted", "significant"]
+    if not len(table):
+        return pd.DataFrame(columns=columns)
+    codes, labels = table.groups(cell)
+    versions = np.array(["" if v is None else str(v) for v in table.keys["version"]], dtype=object)
+    runs = np.array([int(r) for r in table.keys["run"]])
+
+    # Parejas agrupadas por forma (n_a, n_b) para evaluarlas juntas
+    buckets = {}
+    for g, label in enumerate(labels):
+        rows = np.flatnonzero(codes == g)
+        by_version = {v: rows[versions[rows] == v] for v in np.unique(versions[rows])}
+        for va, vb in itertools.combinations(sorted(by_version, key=version_order), 2):
+            ra, rb = by_version[va], by_version[vb]
+            if paired:
+                common = set(runs[ra]) & set(runs[rb])
+                ra = np.array(sorted((r for r in ra if runs[r] in common), key=lambda r: runs[r]), dtype=np.int64)
+                rb = np.array(sorted((r for r in rb if runs[r] in common), key=lambda r: runs[r]), dtype=np.int64)
+                if len(ra) < 2:
+                    continue
+            elif len(ra) < 2 or len(rb) < 2:
+                continue
+            buckets.setdefault((len(ra), len(rb)), []).append((label, va, vb, ra, rb))
+
+    rng = np.random.default_rng(seed)
+    records = []
+    for (n_a, n_b), pairs in buckets.items():
+        a = np.stack([table.scores[ra] for _, _, _, ra, _ in pairs])
+        b = np.stack([table.scores[rb] for _, _, _, _, rb in pairs])
+        result = (_paired if paired else _unpaired)(a, b, n_perm, rng)
+        for p, (label, va, vb, _, _) in enumerate(pairs):
+            for m, metric in enumerate(table.metrics):
+                record = dict(zip(cell, label))
+                record.update({"version_a": va, "version_b": vb, "metric": metric, "exact": result["exact"]})
+                for key in ("n_a", "n_b", "mean_a", "mean_b", "diff", "effect_size", "p_value"):
+                    record[key] = result[key][p, m]
+                records.append(record)
+
+    metric_order = {m: i for i, m in enumerate(table.metrics)}
+    records.sort(key=lambda r: (tuple("" if r[c] is None else str(r[c]) for c in cell), metric_order[r["metric"]],
+                                version_order(r["version_a"]), version_order(r["version_b"])))
+    df = pd.DataFrame(records, columns=columns[:-2])
+    df["p_adjusted"] = df["p_value"]
+    if correction != "none":
+        for _, index in df.groupby(list(family), dropna=False).groups.items():
+            df.loc[index, "p_adjusted"] = adjust(df.loc[index, "p_value"].to_numpy(), correction)
+    df["significant"] = df["p_adjusted"] < alpha
+    df[["n_a", "n_b"]] = df[["n_a", "n_b"]].astype(int)
+    return df
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Pairwise permutation tests between prompt versions.")
+    parser.add_argument("--dir", help="folder with vN_scores_NN.json files (default: whole results store)")
+    parser.add_argument("--folder", help="only this store folder (e.g. ablation_outputs, ablation_outputs_v5_v8)")
+    parser.add_argument("--model")
+    parser.add_argument("--paired", action="store_true", help="pair runs with the same repetition number")
+    parser.add_argument("--perm", type=int, default=N_PERM, help="permutations (exact when fewer are possible)")
+    parser.add_argument("--correction", default="holm", choices=CORRECTIONS)
+    parser.add_argument("--alpha", type=float, default=ALPHA)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--all", action="store_true", help="print every comparison, not only significant ones")
+    parser.add_argument("--out", help="write all comparisons to this CSV/XLSX file")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    if args.dir:
+        table = load_dir(args.dir)
+    else:
+        table = ScoreTable.from_store(**{k: v for k, v in (("folder", args.folder), ("model", args.model)) if v})
+    loaded = time.perf_counter()
+    results = pairwise_tests(table, paired=args.paired, n_perm=args.perm, correction=args.correction,
+                             alpha=args.alpha, seed=args.seed)
+    print(f"🧪 {len(results)} comparisons ({results['significant'].sum()} significant at α={args.alpha}, "
+          f"{args.correction}) in {time.perf_counter() - loaded:.3f}s (+{loaded - start:.2f}s loading)")
+    if args.out:
+        if args.out.endswith(".xlsx"):
+            results.to_excel(args.out, index=False)
+        else:
+            results.to_csv(args.out, index=False)
+        print(f"✅ Comparisons saved to {args.out}")
+    shown = results if args.all else results[results["significant"]]
+    if len(shown):
+        import pandas as pd
+
+        with pd.option_context("display.max_rows", None, "display.width", 220):
+            print(shown.drop(columns=["exact"]).round(3).to_string(index=False))
@@ -0,0 +1,164 @@
+import os
+import json
+import math
+import time
+import threading
+from datetime import datetime
+
+# Registro por llamada al LLM (JSONL, solo se añaden líneas): etapa, modelo,
+# variante de prompt, latencia, time-to-first-token, tokens de `usage`,
+# reintentos, esperas por rate limit, acierto de caché y si la salida se pudo
+# parsear. `python src/core/telemetry.py summary` agrega p50/p95 por etapa,
+# modelo y variante. LLM_RUN_LOG=0 lo desactiva.
+
+DEFAULT_RUN_LOG = os.getenv("LLM_RUN_LOG", "logs/llm_calls.jsonl")
+RUN_ID = os.getenv("LLM_RUN_ID") or f"{datetime.now():%Y%m%d-%H%M%S}-{os.getpid()}"
+GROUP_BY = ["stage", "model", "variant"]
+
+
+class RunLog:
+    def __init__(self, path=DEFAULT_RUN_LOG):
+        self.path = path
+        self._lock = threading.Lock()
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+
+    def write(self, event):
+        # Una línea por evento; con O_APPEND las líneas de varios procesos no se mezclan
+        line = json.dumps(event, ensure_ascii=False) + "\n"
+        with self._lock:
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(line)
+
+
+_run_logs = {}
+_run_logs_lock = threading.Lock()
+
+
+def get_run_log(path=DEFAULT_RUN_LOG):
+    if path in ("", "0", "off"):
+        return None
+    with _run_logs_lock:
+        if path not in _run_logs:
+            _run_logs[path] = RunLog(path)
+        return _run_logs[path]
+
+
+def new_call(stage, model, backend, variant=None, **fields):
+    # Evento de una llamada; LLMClient lo va rellenando y lo escribe al terminar
+    event = {
+        "ts": time.time(),
+        "run_id": RUN_ID,
+        "stage": stage,
+        "model": model,
+        "backend": backend,
+        "variant": variant,
+        "n": 1,
+        "cache_hit": False,
+        "latency_s": None,
+        "wall_s": None,
+        "ttft_s": None,
+        "prompt_tokens": None,
+        "completion_tokens": None,
+        "retries": 0,
+        "rate_limit_wait_s": 0.0,
+        "parse_ok": None,
+        "error": None,
+    }
+    event.update(fields)
+    event["_start"] = time.perf_counter()
+    return event
+
+
+def finish_call(run_log, event, **fields):
+    # Escribe el evento una sola vez (las etapas con parseo lo cierran después de parsear)
+    if event is None or event.get("_written"):
+        return
+    event.update(fields)
+    event["_written"] = True
+    if event["wall_s"] is None:
+        event["wall_s"] = round(time.perf_counter() - event["_start"], 4)
+    if run_log:
+        run_log.write({k: v for k, v in event.items() if not k.startswith("_")})
+
+
+# === Resumen
+def read_events(path=DEFAULT_RUN_LOG, run_id=None):
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            event = json.loads(line)
+            if run_id is None or event.get("run_id") == run_id:
+                yield event
+
+
+def percentile(values, q):
+    # Percentil por rango más cercano sobre valores ya ordenados
+    if not values:
+        return None
+    return values[max(0, math.ceil(q / 100 * len(values)) - 1)]
+
+
+def summarize(events, by=GROUP_BY):
+    groups = {}
+    for event in events:
+        groups.setdefault(tuple(event.get(k) for k in by), []).append(event)
+
+    rows = []
+    for key, group in sorted(groups.items(), key=lambda kv: tuple(str(k) for k in kv[0])):
+        calls = [e for e in group if not e["cache_hit"]]
+        latencies = sorted(e["latency_s"] for e in calls if e["latency_s"] is not None)
+        ttfts = sorted(e["ttft_s"] for e in calls if e["ttft_s"] is not None)
+        parsed = [e["parse_ok"] for e in group if e["parse_ok"] is not None]
+        row = dict(zip(by, key))
+        row.update({
+            "events": len(group),
+            "cache_hits": len(group) - len(calls),
+            "errors": sum(1 for e in group if e["error"]),
+            "latency_p50": percentile(latencies, 50),
+            "latency_p95": percentile(latencies, 95),
+            "ttft_p50": percentile(ttfts, 50),
+            "ttft_p95": percentile(ttfts, 95),
+            "prompt_tokens": sum(e["prompt_tokens"] or 0 for e in calls),
+            "completion_tokens": sum(e["completion_tokens"] or 0 for e in calls),
+            "completion_tokens_p50": percentile(sorted(e["completion_tokens"] for e in calls if e["completion_tokens"] is not None), 50),
+            "retries": sum(e["retries"] for e in group),
+            "rate_limit_wait_s": round(sum(e["rate_limit_wait_s"] for e in group), 1),
+            "parse_ok": f"{sum(parsed)}/{len(parsed)}" if parsed else "",
+        })
+        rows.append(row)
+    return rows
+
+
+def print_summary(rows):
+    if not rows:
+        print("⚠️ No events in the run log.")
+        return
+    fmt = lambda v: "" if v is None else (f"{v:.2f}" if isinstance(v, float) else str(v))
+    columns = list(rows[0])
+    widths = [max(len(c), *(len(fmt(r[c])) for r in rows)) for c in columns]
+    print("  ".join(c.ljust(w) for c, w in zip(columns, widths)))
+    for row in rows:
+        print("  ".join(fmt(row[c]).ljust(w) for c, w in zip(columns, widths)))
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Summarize the per-call LLM run log.")
+    parser.add_argument("command", nargs="?", default="summary", choices=["summary"])
+    parser.add_argument("path", nargs="?", default=DEFAULT_RUN_LOG)
+    parser.add_argument("--run", help="only events of this run id (default: all runs)")
+    parser.add_argument("--last", action="store_true", help="only the most recent run")
+    parser.add_argument("--by", default=",".join(GROUP_BY), help="comma-separated grouping fields")
+    args = parser.parse_args()
+
+    if not os.path.exists(args.path):
+        raise SystemExit(f"⚠️ Run log not found: {args.path}")
+    run_id = args.run
+    if args.last:
+        run_id = max(read_events(args.path), key=lambda e: e["ts"])["run_id"]
+    print(f"📈 {args.path}" + (f" (run {run_id})" if run_id else ""))
+    print_summary(summarize(read_events(args.path, run_id), by=args.by.split(",")))
@@ -0,0 +1,201 @@
+import os
+import json
+import time
+import sqlite3
+import threading
+
+DEFAULT_QUEUE_PATH = os.getenv("WORK_QUEUE_PATH", "experiments/work_queue.sqlite")
+LEASE_SECONDS = 300
+MAX_ATTEMPTS = 3
+
+# Estados: pending → leased → done, o dead (lista de fallos definitivos) tras
+# MAX_ATTEMPTS intentos. Un lease caducado (worker muerto, Colab desconectado)
+# vuelve a estar disponible para cualquier otro worker.
+PENDING, LEASED, DONE, DEAD = "pending", "leased", "done", "dead"
+
+
+class WorkQueue:
+    # Tabla de trabajos en SQLite (WAL) compartible entre procesos: cada trabajo se
+    # toma con un lease que el worker renueva con heartbeat mientras lo procesa.
+    def __init__(self, path=DEFAULT_QUEUE_PATH, lease_seconds=LEASE_SECONDS, max_attempts=MAX_ATTEMPTS):
+        self.path = path
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self._lock = threading.Lock()
+
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS jobs ("
+            " id TEXT PRIMARY KEY,"
+            " payload TEXT NOT NULL,"
+            " state TEXT NOT NULL,"
+            " attempts INTEGER NOT NULL DEFAULT 0,"
+            " owner TEXT,"
+            " lease_expires REAL,"
+            " result TEXT,"
+            " last_error TEXT,"
+            " raw_output TEXT,"
+            " created_at REAL NOT NULL,"
+            " updated_at REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS jobs_state ON jobs (state, lease_expires)")
+
+    def _transaction(self, fn):
+        # BEGIN IMMEDIATE: un solo escritor a la vez entre todos los procesos
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                result = fn(self._conn)
+                self._conn.execute("COMMIT")
+                return result
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def enqueue(self, job_id, payload):
+        # Idempotente: volver a encolar un trabajo existente no cambia su estado
+        return self.enqueue_many([(job_id, payload)])
+
+    def enqueue_many(self, items):
+        now = time.time()
+        rows = [(job_id, json.dumps(payload, ensure_ascii=False), PENDING, now, now) for job_id, payload in items]
+
+        def insert(conn):
+            before = conn.total_changes
+            conn.executemany(
+                "INSERT OR IGNORE INTO jobs (id, payload, state, created_at, updated_at) VALUES (?, ?, ?, ?, ?)", rows
+            )
+            return conn.total_changes - before
+        return self._transaction(insert)
+
+    def lease(self, owner, ids=None):
+        # ids: solo trabajos de este conjunto (p. ej. una ronda del muestreo adaptativo)
+        def take(conn):
+            now = time.time()
+            # Leases caducados que ya agotaron sus intentos pasan a la lista de fallos
+            conn.execute(
+                "UPDATE jobs SET state = ?, owner = NULL, last_error = COALESCE(last_error, 'lease expired'), updated_at = ?"
+                " WHERE state = ? AND lease_expires < ? AND attempts >= ?",
+                (DEAD, now, LEASED, now, self.max_attempts)
+            )
+            rows = conn.execute(
+                "SELECT id, payload, attempts FROM jobs"
+                " WHERE state = ? OR (state = ? AND lease_expires < ?)"
+                " ORDER BY attempts, created_at" + ("" if ids is not None else " LIMIT 1"),
+                (PENDING, LEASED, now)
+            )
+            row = next((r for r in rows if ids is None or r[0] in ids), None)
+            if row is None:
+                return None
+            conn.execute(
+                "UPDATE jobs SET state = ?, owner = ?, lease_expires = ?, attempts = attempts + 1, updated_at = ? WHERE id = ?",
+                (LEASED, owner, now + self.lease_seconds, now, row[0])
+            )
+            return {"id": row[0], "payload": json.loads(row[1]), "attempt": row[2] + 1}
+        return self._transaction(take)
+
+    def heartbeat(self, job_id, owner):
+        # Devuelve False si el lease se perdió (caducó y otro worker tomó el trabajo)
+        def extend(conn):
+            now = time.time()
+            cursor = conn.execute(
+                "UPDATE jobs SET lease_expires = ?, updated_at = ? WHERE id = ? AND owner = ? AND state = ?",
+                (now + self.lease_seconds, now, job_id, owner, LEASED)
+            )
+            return cursor.rowcount == 1
+        return self._transaction(extend)
+
+    def complete(self, job_id, owner, result=None):
+        def finish(conn):
+            cursor = conn.execute(
+                "UPDATE jobs SET state = ?, result = ?, last_error = NULL, lease_expires = NULL, updated_at = ?"
+                " WHERE id = ? AND owner = ?",
+                (DONE, json.dumps(result, ensure_ascii=False), time.time(), job_id, owner)
+            )
+            return cursor.rowcount == 1
+        return self._transaction(finish)
+
+    def fail(self, job_id, owner, error, raw_output=None):
+        def release(conn):
+            row = conn.execute("SELECT attempts FROM jobs WHERE id = ? AND owner = ?", (job_id, owner)).fetchone()
+            if row is None:
+                return None
+            state = DEAD if row[0] >= self.max_attempts else PENDING
+            conn.execute(
+                "UPDATE jobs SET state = ?, owner = NULL, lease_expires = NULL, last_error = ?,"
+                " raw_output = COALESCE(?, raw_output), updated_at = ? WHERE id = ?",
+                (state, str(error), raw_output, time.time(), job_id)
+            )
+            return state
+        return self._transaction(release)
+
+    def reopen(self, job_ids):
+        # Trabajos terminados cuyos ficheros ya no están al día (borrados o sobrescritos
+        # con otras entradas): vuelven a pendientes con los intentos a cero
+        now = time.time()
+
+        def reset(conn):
+            before = conn.total_changes
+            conn.executemany(
+                "UPDATE jobs SET state = ?, attempts = 0, owner = NULL, result = NULL, updated_at = ?"
+                " WHERE id = ? AND state = ?",
+                [(PENDING, now, job_id, DONE) for job_id in job_ids]
+            )
+            return conn.total_changes - before
+        return self._transaction(reset)
+
+    def results(self):
+        with self._lock:
+            rows = self._conn.execute("SELECT id, result FROM jobs WHERE state = ?", (DONE,)).fetchall()
+        return {r[0]: json.loads(r[1]) for r in rows if r[1]}
+
+    def dead_letters(self):
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT id, attempts, last_error, raw_output FROM jobs WHERE state = ? ORDER BY id", (DEAD,)
+            ).fetchall()
+        return [{"id": r[0], "attempts": r[1], "error": r[2], "raw_output": r[3]} for r in rows]
+
+    def requeue_dead(self):
+        def reset(conn):
+            cursor = conn.execute(
+                "UPDATE jobs SET state = ?, attempts = 0, owner = NULL, updated_at = ? WHERE state = ?",
+                (PENDING, time.time(), DEAD)
+            )
+            return cursor.rowcount
+        return self._transaction(reset)
+
+    def stats(self, ids=None):
+        counts = {PENDING: 0, LEASED: 0, DONE: 0, DEAD: 0}
+        with self._lock:
+            if ids is None:
+                counts.update(dict(self._conn.execute("SELECT state, COUNT(*) FROM jobs GROUP BY state").fetchall()))
+                return counts
+            rows = self._conn.execute("SELECT id, state FROM jobs").fetchall()
+        for job_id, state in rows:
+            if job_id in ids:
+                counts[state] += 1
+        return counts
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+if __name__ == "__main__":
+    import sys
+
+    command = sys.argv[1] if len(sys.argv) > 1 else "stats"
+    queue = WorkQueue(sys.argv[2] if len(sys.argv) > 2 else DEFAULT_QUEUE_PATH)
+    if command == "dead":
+        for letter in queue.dead_letters():
+            print(f"💀 {letter['id']} ({letter['attempts']} attempts): {letter['error']}")
+            if letter["raw_output"]:
+                print(letter["raw_output"])
+    elif command == "requeue":
+        print(f"🔁 Requeued {queue.requeue_dead()} dead jobs.")
+    else:
+        print(f"📋 {queue.path}: {queue.stats()}")
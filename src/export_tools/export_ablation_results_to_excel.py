@@ -1,50 +1,49 @@
 import json
 from pathlib import Path
-import pandas as pd
+from results_store import get_default_store, METRICS
+from excel_export import write_rows
 
 # Base de resultados
-BASE_DIR = Path("experiments")
 RESULTS_DIR = Path("results_excel/experiment4")
 RESULTS_DIR.mkdir(exist_ok=True)
+DIALOGS = "inline"  # "inline": diálogo en la fila | "sheet": hoja "Dialogs" aparte | "path": solo la ruta
+COLUMNS = ["Model", "Axis", "Spec Type", "Prompt Version", "Generated Dialog", *METRICS, "comments"]
 
-# Recoger todos los archivos *_scores.json
-score_files = list(BASE_DIR.rglob("*_scores.json"))
 
-rows = []
-for score_path in score_files:
+def score_fields(record):
+    # El JSON completo de puntuaciones: las claves que no son métricas también se exportan
     try:
-        with open(score_path, "r", encoding="utf-8") as f:
-            scores = json.load(f)
-    except Exception as e:
-        print(f"❌ Error leyendo {score_path.name}: {e}")
-        continue
+        scores = json.loads(record["content"])
+    except ValueError:
+        return {}
+    return scores if isinstance(scores, dict) else {}
 
-    parts = score_path.parts
-    if len(parts) < 6:
-        continue  # Estructura inesperada
-
-    version = score_path.stem.replace("_scores", "")
-    dialog_path = score_path.parent / f"{version}_dialog.txt"
-
-    try:
-        with open(dialog_path, "r", encoding="utf-8") as f:
-            dialog_text = f.read()
-    except:
-        dialog_text = "[Missing]"
 
+def to_row(record):
+    dialog = record["dialog"] if DIALOGS != "path" else record["dialog_path"]
     row = {
-        "Model": parts[1],            # llama3_8b o llama3_70b
-        "Axis": parts[2],             # tone / rol / subplot
-        "Spec Type": parts[3],        # humor / serious / etc
-        "Prompt Version": version,
-        "Generated Dialog": dialog_text
+        "Model": record["model"],            # llama3_8b o llama3_70b
+        "Axis": record["axis"],              # tone / rol / subplot
+        "Spec Type": record["variant"],      # humor / serious / etc
+        "Prompt Version": record["version"],
+        "Generated Dialog": dialog if dialog is not None else "[Missing]",
     }
-    row.update(scores)
-    rows.append(row)
+    row.update({key: record[key] for key in [*METRICS, "comments"]})
+    row.update(score_fields(record))
+    return row
+
+
+# Todas las puntuaciones *_scores.json (una por versión) con su diálogo, en streaming desde el almacén
+store = get_default_store()
+store.refresh()
+# Primera pasada solo para las columnas: en streaming la cabecera se escribe antes que las filas
+for record in store.iter_ablation(repeated=False):
+    COLUMNS.extend(key for key in score_fields(record) if key not in COLUMNS)
+rows = (to_row(r) for r in store.iter_ablation(repeated=False))
 
 # Guardar a Excel
-df = pd.DataFrame(rows)
 output_path = RESULTS_DIR / "ablation_all_scores_2.xlsx"
-df.to_excel(output_path, index=False)
+write_rows(output_path, COLUMNS, rows, dialog_column="Generated Dialog",
+           dialogs_sheet="Dialogs" if DIALOGS == "sheet" else None)
 
 print(f"✅ Archivo generado con diálogos: {output_path}")
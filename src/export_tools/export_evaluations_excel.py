@@ -0,0 +1,67 @@
+import json
+from pathlib import Path
+from results_store import get_default_store, METRICS
+from excel_export import parallel_map, write_rows
+
+# Todos los diálogos evaluados (evaluated_dialogs/*_eval.json) de todos los modelos
+# y variantes en un solo Excel. Los ficheros se leen en un pool de hilos y las
+# filas se escriben en streaming, así que la memoria no crece con el corpus.
+RESULTS_DIR = Path("results_excel")
+OUTPUT_PATH = RESULTS_DIR / "evaluations_all.xlsx"
+DIALOGS = "sheet"  # "inline": diálogo en la fila | "sheet": hoja "Dialogs" aparte | "path": solo la ruta
+COLUMNS = ["Model", "Axis", "Variant", "ID", "Generated Dialog", "Specification", *METRICS, "comments"]
+
+
+def read_text(path):
+    try:
+        return path.read_text(encoding="utf-8").strip()
+    except FileNotFoundError:
+        return None
+
+
+def read_evaluation(entry):
+    eval_path = Path(entry["path"])
+    variant_dir = eval_path.parent.parent
+    dialog_path = variant_dir / "generated_dialogs" / f"{entry['dialog_id']}_gen.txt"
+    spec_text = read_text(variant_dir / "specifications" / f"{entry['dialog_id']}_spec.json")
+    try:
+        scores = json.loads(read_text(eval_path) or "{}")
+    except ValueError as e:
+        print(f"❌ Error leyendo {eval_path.name}: {e}")
+        scores = {}
+
+    try:
+        spec = json.dumps(json.loads(spec_text), indent=2) if spec_text else ""
+    except ValueError:
+        spec = spec_text
+
+    if DIALOGS == "path":
+        dialog = dialog_path.as_posix()
+    else:
+        dialog = read_text(dialog_path) or "[Missing]"
+    row = {
+        "Model": entry["model"],
+        "Axis": entry["axis"],
+        "Variant": entry["variant"],
+        "ID": entry["dialog_id"],
+        "Generated Dialog": dialog,
+        "Specification": spec,
+        "comments": scores.get("comments", ""),
+    }
+    row.update({key: scores.get(key) for key in METRICS})
+    return row
+
+
+if __name__ == "__main__":
+    store = get_default_store()
+    store.refresh()
+    entries = (
+        dict(e, path=store.base_dir / e["path"])
+        for e in store.entries("scores", folder="evaluated_dialogs")
+    )
+    n_rows = write_rows(
+        OUTPUT_PATH, COLUMNS, parallel_map(read_evaluation, entries),
+        sheet_name="Evaluations", dialog_column="Generated Dialog",
+        dialogs_sheet="Dialogs" if DIALOGS == "sheet" else None,
+    )
+    print(f"✅ Archivo Excel generado con {n_rows} filas: {OUTPUT_PATH}")
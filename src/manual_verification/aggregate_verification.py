@@ -1,56 +1,33 @@
 import pandas as pd
 from pathlib import Path
+from results_store import get_default_store
 
 EXPERIMENTS_DIR = Path("results_excel/experiment3")
 OUTPUT_PATH = Path("verification_summary.xlsx")
 
-summary_rows = []
-
-for xlsx_path in sorted(EXPERIMENTS_DIR.glob("*.xlsx")):
-    try:
-        df = pd.read_excel(xlsx_path)
-        total = len(df)
-
-        # Extraer metadata desde el nombre del archivo
-        filename = xlsx_path.stem  # ej: evaluation_semantics_tone_humor_8b
-        parts = filename.split("_")
-
-        # Validación básica por si algún archivo no cumple formato
-        if len(parts) < 5:
-            print(f"⚠️ Nombre de archivo no válido: {filename}")
-            continue
-
-        category = parts[2]  # tone / rol / subplot
-        variant = parts[3]   # humor / serious / ...
-        model = parts[-1]    # 8b / 70b
-
-        # Contar ticks verdes por columna
-        topic_ok = df["Topic "].value_counts().get("✔️", 0)
-        subplot_ok = df["Subplot "].value_counts().get("✔️", 0)
-        imperfections_ok = df["Imperfections "].value_counts().get("✔️", 0)
-        overall_ok = df["Overall"].value_counts().get("✔️", 0)
-        prompt_ok = df["Prompt Type"].value_counts().get("✔️", 0)
-
-        row = {
-            "Model": f"llama3_{model}",
-            "Category": category,
-            "Variant": variant,
-            "Total Dialogs": total,
-            "Topic (%)": round(100 * topic_ok / total, 1),
-            "Subplot (%)": round(100 * subplot_ok / total, 1),
-            "Imperfections (%)": round(100 * imperfections_ok / total, 1),
-            "Prompt Type (%)": round(100 * prompt_ok / total, 1),
-            "Overall (%)": round(100 * overall_ok / total, 1)
-        }
-
-        summary_rows.append(row)
-
-    except Exception as e:
-        print(f"⚠️ Error processing {xlsx_path.name}: {e}")
+# Las hojas de verificación manual se cargan en el almacén de resultados (solo las
+# que cambiaron) y se leen de una vez como una única tabla
+store = get_default_store()
+store.ingest_verification(EXPERIMENTS_DIR)
+df = store.load_verification()
+
+# Contar ticks verdes por columna
+checks = {
+    "Topic (%)": "topic",
+    "Subplot (%)": "subplot",
+    "Imperfections (%)": "imperfections",
+    "Prompt Type (%)": "prompt_type",
+    "Overall (%)": "overall",
+}
+for label, column in checks.items():
+    df[label] = df[column] == "✔️"
 
 # Guardar resumen
-if summary_rows:
-    df_summary = pd.DataFrame(summary_rows)
+if len(df):
+    grouped = df.groupby(["model", "category", "variant"])
+    df_summary = (grouped[list(checks)].mean() * 100).round(1)
+    df_summary.insert(0, "Total Dialogs", grouped.size())
+    df_summary = df_summary.reset_index().rename(columns={"model": "Model", "category": "Category", "variant": "Variant"})
     df_summary.sort_values(by=["Model", "Category", "Variant"], inplace=True)
 
     with pd.ExcelWriter(OUTPUT_PATH) as writer:
@@ -2,28 +2,24 @@ import os
 import json
 import pandas as pd
 from pathlib import Path
+from results_store import get_default_store
 
 EXPERIMENTS_DIR = Path("experiments")
 OUTPUT_FILENAME = "verification_manual_template.xlsx"
 MAX_DIALOGS = 5  # Solo 5 diálogos por variante
 
-def process_variant(variant_path):
-    gen_dir = variant_path / "generated_dialogs"
-    spec_dir = variant_path / "specifications"
+def process_variant(dialogs, specs):
+    # Filas del catálogo de una variante: diálogos y specs ya cargados, sin leer ficheros
     output = []
+    spec_texts = dict(zip(specs["dialog_id"], specs["content"]))
 
-    dialog_files = sorted(gen_dir.glob("dialog_*_gen.txt"))[:MAX_DIALOGS]
-
-    for gen_file in dialog_files:
-        dialog_id = gen_file.stem.replace("_gen", "")
+    for dialog_id, dialog_text in list(zip(dialogs["dialog_id"], dialogs["content"]))[:MAX_DIALOGS]:
         try:
-            dialog_text = gen_file.read_text().strip()
-            spec_path = spec_dir / f"{dialog_id}_spec.json"
-            spec_json = json.loads(spec_path.read_text()) if spec_path.exists() else {}
+            spec_json = json.loads(spec_texts[dialog_id]) if dialog_id in spec_texts else {}
 
             row = {
                 "Dialog ID": dialog_id,
-                "Generated Dialog": dialog_text,
+                "Generated Dialog": dialog_text.strip(),
                 "Specification": json.dumps(spec_json, indent=2),
                 "Topic": "",
                 "Subplot": "",
@@ -40,18 +36,24 @@ def process_variant(variant_path):
     return output
 
 def main():
-    for model_dir in EXPERIMENTS_DIR.glob("llama3_*"):
-        for category in model_dir.glob("*"):
-            for variant in category.glob("*"):
-                print(f"📄 Generating editable .xlsx for manual eval: {variant.relative_to(EXPERIMENTS_DIR)}")
-                results = process_variant(variant)
-                if results:
-                    df = pd.DataFrame(results)
-                    out_path = variant / OUTPUT_FILENAME
-                    df.to_excel(out_path, index=False)
-                    print(f"✅ Saved: {out_path}")
-                else:
-                    print("⚠️ No dialogs found in this variant.")
+    store = get_default_store()
+    store.refresh()
+    dialogs = store.load("dialog", folder="generated_dialogs")
+    specs = store.load("spec", folder="specifications")
+    dialogs = dialogs[dialogs["model"].str.startswith("llama3_") & dialogs["dialog_id"].str.startswith("dialog_")]
+
+    for (model, category, variant_name), variant_dialogs in dialogs.groupby(["model", "axis", "variant"]):
+        variant = EXPERIMENTS_DIR / model / category / variant_name
+        print(f"📄 Generating editable .xlsx for manual eval: {variant.relative_to(EXPERIMENTS_DIR)}")
+        variant_specs = specs[(specs["model"] == model) & (specs["axis"] == category) & (specs["variant"] == variant_name)]
+        results = process_variant(variant_dialogs, variant_specs)
+        if results:
+            df = pd.DataFrame(results)
+            out_path = variant / OUTPUT_FILENAME
+            df.to_excel(out_path, index=False)
+            print(f"✅ Saved: {out_path}")
+        else:
+            print("⚠️ No dialogs found in this variant.")
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,44 @@
+import os
+import sys
+import json
+import pytest
+from pathlib import Path
+
+# Los módulos de src/core se importan sin paquete, como en los scripts (PYTHONPATH=src/core)
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT / "src" / "core"))
+sys.path.insert(0, str(ROOT / "src" / "batch_scripts"))
+
+# Los tests no tocan el almacén de resultados, el índice de duplicados ni el log de llamadas
+os.environ.setdefault("RESULTS_STORE", "0")
+os.environ.setdefault("NEAR_DUP_INDEX", "0")
+os.environ.setdefault("LLM_RUN_LOG", "0")
+
+
+@pytest.fixture
+def matrix_config(tmp_path):
+    # Configuración mínima de experiment_matrix sobre tmp_path: un modelo fake, una spec,
+    # prompts propios y rutas de salida por versión y repetición
+    import experiment_matrix
+
+    (tmp_path / "prompt_dialog.txt").write_text("Write a dialog following this specification:\n{SPECIFICATION_HERE}")
+    (tmp_path / "prompt_eval.txt").write_text("Evaluate this dialog:\n{GENERATED_DIALOG_HERE}")
+    (tmp_path / "specs.json").write_text(json.dumps({"tone": {"humor": {"turns": 4, "participants": 2}}}))
+
+    def build(**overrides):
+        config = dict(experiment_matrix.DEFAULTS, **{
+            "name": "test_matrix",
+            "models": {"fake": "fake"},
+            "axes": {"tone": ["humor"]},
+            "versions": ["v1"],
+            "eval_prompt": str(tmp_path / "prompt_eval.txt"),
+            "source": {"type": "spec_file", "path": str(tmp_path / "specs.json")},
+            "paths": {
+                "prompt": str(tmp_path / "prompt_dialog.txt"),
+                "dialog": str(tmp_path / "out" / "{version}" / "dialog_{repetition}.txt"),
+                "scores": str(tmp_path / "out" / "{version}" / "scores_{repetition}.json"),
+            },
+        })
+        config.update(overrides)
+        return config
+    return build
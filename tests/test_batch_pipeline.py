@@ -0,0 +1,29 @@
+import json
+import asyncio
+import batch_pipeline
+
+
+def _item(dialog_id, eval_result):
+    return {"dialog_id": dialog_id, "model_name": "llama3_8b", "exp": {"name": "tone"}, "variant": "tone_humor",
+            "base_dir": "experiments/llama3_8b/tone/tone_humor", "dialog": "P1: hi\nP2: hello",
+            "spec": {"turns": 2}, "eval": eval_result}
+
+
+def test_writer_survives_bad_item(tmp_path, monkeypatch):
+    # Un elemento que rompe result_row no puede dejar la cola sin consumidor
+    monkeypatch.setattr(batch_pipeline, "RESULTS_PATH", tmp_path / "results.jsonl")
+
+    async def run():
+        results_q = asyncio.Queue(1)
+        rows = {}
+        task = asyncio.create_task(batch_pipeline.writer(results_q, rows))
+        await results_q.put(_item("dialog_001", None))
+        await results_q.put(_item("dialog_002", {"fluency": 4}))
+        await asyncio.wait_for(results_q.join(), timeout=5)
+        task.cancel()
+        return rows
+
+    rows = asyncio.run(run())
+    assert [r["ID"] for r in rows["experiments/llama3_8b/tone/tone_humor"]] == ["dialog_002"]
+    written = [json.loads(line) for line in (tmp_path / "results.jsonl").read_text().splitlines()]
+    assert [r["ID"] for r in written] == ["dialog_002"]
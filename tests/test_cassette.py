@@ -0,0 +1,51 @@
+import itertools
+import pytest
+from cassette import Cassette, CassetteMiss, RecordingBackend, ReplayBackend
+from llm_backends import FakeBackend
+
+
+def ask(backend, prompt, seed=None):
+    response = backend.chat_completion([{"role": "user", "content": prompt}], temperature=0.8, seed=seed)
+    return response["choices"][0]["message"]["content"]
+
+
+def record_session(path, counter, prompts):
+    inner = FakeBackend(responder=lambda prompt: f"{prompt} → answer {next(counter)}")
+    backend = RecordingBackend(inner, Cassette(path))
+    return [ask(backend, p) for p in prompts]
+
+
+def test_replay_returns_the_recorded_responses(tmp_path):
+    path = str(tmp_path / "calls.sqlite")
+    recorded = record_session(path, itertools.count(), ["Write a dialog\nabout cats", "Write a dialog\nabout cats", "Evaluate"])
+    replay = ReplayBackend(model_name="fake", cassette_path=path)
+    assert replay.supports_n
+    # Peticiones idénticas se sirven en el orden en que se grabaron
+    assert [ask(replay, p) for p in ["Write a dialog\nabout cats", "Write a dialog\nabout cats", "Evaluate"]] == recorded
+    assert replay.cassette.hits == 3 and not replay.cassette.misses
+
+
+def test_a_second_session_appends_instead_of_overwriting(tmp_path):
+    path = str(tmp_path / "calls.sqlite")
+    counter = itertools.count()
+    first = record_session(path, counter, ["Write a dialog"])
+    second = record_session(path, counter, ["Write a dialog"])
+    assert first != second
+    assert Cassette(path).stats()[0]["responses"] == 2
+    replay = ReplayBackend(model_name="fake", cassette_path=path)
+    assert [ask(replay, "Write a dialog"), ask(replay, "Write a dialog")] == first + second
+
+
+def test_misses_say_where_the_request_differs(tmp_path):
+    path = str(tmp_path / "calls.sqlite")
+    record_session(path, itertools.count(), ["Write a dialog\nabout cats"])
+    replay = ReplayBackend(model_name="fake", cassette_path=path)
+
+    with pytest.raises(CassetteMiss, match="differs from the closest recording at line 2"):
+        ask(replay, "Write a dialog\nabout dogs")
+    with pytest.raises(CassetteMiss, match="different seed"):
+        ask(replay, "Write a dialog\nabout cats", seed=3)
+    ask(replay, "Write a dialog\nabout cats")
+    with pytest.raises(CassetteMiss, match="recorded 1 time"):
+        ask(replay, "Write a dialog\nabout cats")
+    assert replay.cassette.hits == 1 and len(replay.cassette.misses) == 3
@@ -0,0 +1,110 @@
+import pytest
+from conformance import parse_spec, parse_turns, check_dialog, summary, reason, REPORT_KEYS
+
+GOOD = "P1: Did you book the room?\nP2: Not yet, sorry.\nP1: We need it by Friday.\nP2: I'll do it today."
+
+
+@pytest.mark.parametrize("spec,expected", [
+    ({"turns": 4}, {"turns": 4}),
+    ('{"turns": 4, "participants": 2}', {"turns": 4, "participants": 2}),
+    ("{'turns': 4, 'participants': 3, 'tone': {'P1': 'dry'}}", {"turns": 4, "participants": 3, "tone": {"P1": "dry"}}),
+    ("topic: x, 'turns': 6, participants: 2 (broken", {"turns": 6, "participants": 2}),
+    (None, {}),
+])
+def test_parse_spec(spec, expected):
+    assert parse_spec(spec) == expected
+
+
+def test_parse_turns_handles_markdown_labels_and_stray_text():
+    dialog = ("Here is the generated dialog:\n\n**P1:** Hi there\nP2 (pausing): Hello\ncontinues here\n\n"
+              "a stray line\nP1: Bye\n---\n\nNote: the dialog has 3 turns.")
+    turns, preamble, unlabeled, trailing = parse_turns(dialog)
+    assert turns == [("P1", "Hi there"), ("P2", "Hello continues here"), ("P1", "Bye")]
+    assert preamble == ["Here is the generated dialog:"]
+    assert unlabeled == ["a stray line"]
+    assert trailing == ["Note: the dialog has 3 turns."]
+
+
+def test_clean_dialog_passes():
+    report = check_dialog(GOOD, {"turns": 4, "participants": 2})
+    assert report["ok"] and report["issues"] == [] and report["structural_score"] == 1.0
+
+
+def test_turns_read_as_exchanges():
+    # "turns": 2 en el sentido de pares P1/P2 también cuadra con 4 intervenciones
+    assert "turn_count" not in check_dialog(GOOD, {"turns": 2})["issues"]
+    assert "turn_count" in check_dialog(GOOD, {"turns": 10})["issues"]
+
+
+@pytest.mark.parametrize("dialog,spec,issue", [
+    ("", {"turns": 4}, "no_turns"),
+    ("P1: a\nP1: b\nP1: c", {"turns": 3}, "missing_speaker"),
+    (GOOD + "\nP3: who am I?", {"turns": 5}, "extra_speaker"),
+])
+def test_hard_issues_reject_regardless_of_score(dialog, spec, issue):
+    report = check_dialog(dialog, spec, min_score=0.0)
+    assert issue in report["issues"] and not report["ok"]
+
+
+def test_soft_issues_lower_the_score():
+    dialog = "Sure! Here it is:\nP1: a\nP2: b\nP2: c\nP1:\n\nI hope this helps."
+    report = check_dialog(dialog, {"turns": 4})
+    assert {"preamble", "repeated_speaker", "empty_turn", "trailing_text"} <= set(report["issues"])
+    assert report["structural_score"] < 1.0
+    assert report["repeated_speaker"] == 1 and report["empty_turns"] == 1
+
+
+def test_summary_and_reason():
+    report = check_dialog("P1: a", {"turns": 4})
+    assert list(summary(report)) == REPORT_KEYS
+    assert reason(report) == ", ".join(report["issues"])
+    assert reason(check_dialog(GOOD, {"turns": 4})) == "structural score 1.0"
+
+
+def _jobs(tmp_path, mode):
+    import json
+    import experiment_matrix
+
+    (tmp_path / "prompt_dialog.txt").write_text("Write a dialog following this specification:\n{SPECIFICATION_HERE}")
+    (tmp_path / "prompt_eval.txt").write_text("Evaluate this dialog:\n{GENERATED_DIALOG_HERE}")
+    (tmp_path / "specs.json").write_text(json.dumps({"tone": {"humor": {"turns": 4, "participants": 2}}}))
+    config = dict(experiment_matrix.DEFAULTS, **{
+        "name": "conformance_test", "models": {"fake": "fake"}, "axes": {"tone": ["humor"]}, "versions": ["v1"],
+        "seed": 1, "eval_prompt": str(tmp_path / "prompt_eval.txt"), "conformance": {"mode": mode},
+        "source": {"type": "spec_file", "path": str(tmp_path / "specs.json")},
+        "paths": {"prompt": str(tmp_path / "prompt_dialog.txt"), "dialog": str(tmp_path / "out" / "dialog.txt"),
+                  "scores": str(tmp_path / "out" / "scores.json")},
+    })
+    return experiment_matrix.expand_matrix(config)
+
+
+@pytest.mark.parametrize("mode,broken_replies,evaluated,regenerated,rejected", [
+    ("report", 1, 1, 0, 0),
+    ("reject", 1, 0, 0, 1),
+    ("regenerate", 1, 1, 1, 0),
+    ("regenerate", 5, 0, 1, 1),  # sigue roto tras max_regenerations: no llega al juez
+])
+def test_matrix_conformance_modes(tmp_path, mode, broken_replies, evaluated, regenerated, rejected):
+    import asyncio
+    from llm_backends import FakeBackend
+    from experiment_matrix import MatrixExecutor
+
+    executor = MatrixExecutor(backend="fake", max_concurrency=1, cache=False)
+    generator = executor._generator("fake")
+    replies = {"dialogs": 0}
+
+    def responder(prompt):
+        answer = FakeBackend.default_responder(prompt)
+        if prompt.startswith("Write a dialog"):
+            replies["dialogs"] += 1
+            return "Sure! P1 and P1 only:\nP1: hello" if replies["dialogs"] <= broken_replies else GOOD
+        return answer
+    generator.llm.responder = responder
+    executor._evaluator("fake").llm.responder = responder
+
+    rows = asyncio.run(executor.run(_jobs(tmp_path, mode)))
+    assert executor.stats["evaluated"] == evaluated
+    assert executor.stats["regenerated"] == regenerated
+    assert executor.stats["rejected"] == rejected
+    assert rows[0]["structural_score"] is not None
+    assert (rows[0]["fluency"] is not None) == bool(evaluated)
@@ -0,0 +1,44 @@
+import time
+import math
+import openpyxl
+from excel_export import parallel_map, write_rows
+
+
+def test_parallel_map_keeps_input_order_with_a_bounded_window():
+    started = []
+
+    def slow(i):
+        started.append(i)
+        time.sleep(0.01 * (5 - i % 5))
+        return i * i
+
+    results = parallel_map(slow, range(40), max_workers=4)
+    assert next(results) == 0
+    # Con el primer resultado entregado no se ha lanzado más que la ventana
+    assert len(started) <= 4 * 2
+    assert list(results) == [i * i for i in range(1, 40)]
+
+
+def test_rows_are_written_in_order_with_blanks_for_missing_values(tmp_path):
+    path = tmp_path / "out" / "scores.xlsx"
+    rows = [{"Model": "llama3_8b", "fluency": i, "comments": None if i else "first", "extra": "ignored"}
+            for i in range(3)]
+    rows.append({"Model": "llama3_70b", "fluency": math.nan, "comments": "x" * 40000})
+    assert write_rows(path, ["Model", "fluency", "comments"], rows) == 4
+    sheet = openpyxl.load_workbook(path).active
+    values = list(sheet.iter_rows(values_only=True))
+    assert values[:4] == [("Model", "fluency", "comments"), ("llama3_8b", 0, "first"),
+                          ("llama3_8b", 1, None), ("llama3_8b", 2, None)]
+    # NaN queda vacío y los textos se cortan en el límite de celda de Excel
+    assert values[4][:2] == ("llama3_70b", None) and len(values[4][2]) == 32767
+
+
+def test_dialogs_sheet_links_each_row_to_its_dialog(tmp_path):
+    path = tmp_path / "scores.xlsx"
+    rows = [{"Model": "llama3_8b", "Generated Dialog": f"A: dialog {i}"} for i in range(2)]
+    write_rows(path, ["Model", "Generated Dialog"], rows, dialog_column="Generated Dialog", dialogs_sheet="Dialogs")
+    workbook = openpyxl.load_workbook(path)
+    main, dialogs = workbook["Sheet1"], workbook["Dialogs"]
+    assert main["B2"].value == '=HYPERLINK("#\'Dialogs\'!B2","Dialogs #1")'
+    assert [tuple(r) for r in dialogs.iter_rows(values_only=True)] == [("Row", "Generated Dialog"),
+                                                                        (1, "A: dialog 0"), (2, "A: dialog 1")]
@@ -0,0 +1,147 @@
+import asyncio
+import itertools
+import pytest
+from pathlib import Path
+import experiment_matrix
+from experiment_matrix import (MatrixExecutor, expand_matrix, eval_key, dialog_key, dedupe, load_config, outputs_fresh,
+                               adaptive_settings, interval, stop_reason, run_adaptive)
+
+ROOT = Path(__file__).resolve().parent.parent
+# Trabajos que salen de cada configuración del repo (modelos × specs × versiones × repeticiones)
+CONFIG_JOBS = {
+    "ablation": 2 * 6 * 4,
+    "ablation_strict": 2 * 6 * 4,
+    "ablation_strict_5dialogs": 2 * 6 * 4 * 5,
+    "edge_cases": 72,
+    "intern_ablation": 4 * 5,
+}
+
+
+def _executor(counter):
+    # Cada diálogo generado tiene un texto distinto ("variant 0", "variant 1", ...)
+    executor = MatrixExecutor(backend="fake", max_concurrency=1, cache=False)
+    generator = executor._generator("fake")
+    default = generator.llm.responder
+    generator.llm.responder = lambda prompt: (f"P1: variant {next(counter)}\nP2: ok"
+                                              if prompt.startswith("Write a dialog") else default(prompt))
+    return executor
+
+
+def test_regenerated_dialog_is_evaluated_again(matrix_config):
+    jobs = expand_matrix(matrix_config(seed=None))
+    counter = itertools.count()
+    executor = _executor(counter)
+    asyncio.run(executor.run(jobs))
+    assert (executor.stats["generated"], executor.stats["evaluated"]) == (1, 1)
+    assert outputs_fresh(jobs[0], {"fluency": 4})
+
+    key = eval_key(jobs[0])
+    jobs[0]["dialog_path"].unlink()
+    assert not outputs_fresh(jobs[0], {"fluency": 4})
+    executor = _executor(counter)
+    rows = asyncio.run(executor.run(jobs))
+    assert rows[0]["dialog_text"] == "P1: variant 1\nP2: ok"
+    assert (executor.stats["generated"], executor.stats["evaluated"]) == (1, 1)
+    assert eval_key(jobs[0]) != key
+
+
+def test_repetitions_come_from_one_batch_with_the_first_repetition_seed(matrix_config):
+    jobs = expand_matrix(matrix_config(repetitions=3))
+    executor = _executor(itertools.count())
+    generator = executor._generator("fake")
+    batches = []
+    original = generator.agenerate_dialogs
+
+    async def agenerate_dialogs(spec, n, prompt_path, seed=None):
+        batches.append((n, seed))
+        return await original(spec, n, prompt_path=prompt_path, seed=seed)
+    generator.agenerate_dialogs = agenerate_dialogs
+
+    rows = asyncio.run(executor.run(jobs))
+    assert batches == [(3, jobs[0]["seed"])]
+    assert len({row["dialog_text"] for row in rows}) == 3
+
+
+@pytest.mark.parametrize("name", sorted(CONFIG_JOBS))
+def test_repo_configs_expand_to_distinct_outputs(name, monkeypatch):
+    monkeypatch.chdir(ROOT)
+    config = load_config(f"configs/experiments/{name}.json")
+    jobs = expand_matrix(config)
+    assert len(jobs) == CONFIG_JOBS[name]
+    unique, n_dialogs, n_evals = dedupe(jobs)
+    assert len(unique) == n_dialogs == n_evals == len(jobs)
+    assert all(job["prompt"].exists() and job["eval_prompt"].exists() for job in jobs)
+    if config["seed"] == "repetition":
+        assert {job["seed"] for job in jobs} == set(range(1, config["repetitions"] + 1))
+
+
+def test_config_without_required_keys_is_rejected(tmp_path):
+    (tmp_path / "broken.json").write_text('{"models": {"fake": "fake"}}')
+    with pytest.raises(ValueError, match="missing 'axes'"):
+        load_config(tmp_path / "broken.json")
+
+
+def test_dedupe_keeps_one_job_per_output_path(matrix_config, capsys):
+    first = expand_matrix(matrix_config(name="first", repetitions=2))
+    same = expand_matrix(matrix_config(name="same", repetitions=2))
+    unique, n_dialogs, n_evals = dedupe(first + same)
+    assert (len(unique), n_dialogs, n_evals) == (2, 2, 2)
+    assert capsys.readouterr().out == ""
+
+    # Mismas rutas con otras entradas: gana el último y se avisa
+    strict = expand_matrix(matrix_config(name="strict", repetitions=2, evaluate_with_spec=True))
+    unique, _, _ = dedupe(first + strict)
+    assert {job["experiment"] for job in unique} == {"strict"}
+    assert "strict overrides 2 outputs of first" in capsys.readouterr().out
+
+
+def test_eval_key_follows_every_evaluation_input(matrix_config, tmp_path):
+    job = expand_matrix(matrix_config())[0]
+    job["dialog_path"].parent.mkdir(parents=True)
+    job["dialog_path"].write_text("P1: hi\nP2: hello")
+    key = eval_key(job)
+    assert eval_key(dict(job)) == key
+    assert eval_key(dict(job, evaluate_with_spec=True)) != key
+    assert eval_key(dict(job, model_name="other")) != key
+    job["eval_prompt"].write_text("Evaluate this dialog strictly:\n{GENERATED_DIALOG_HERE}")
+    assert eval_key(job) != key
+    key = eval_key(job)
+    job["dialog_path"].write_text("P1: bye\nP2: bye")
+    assert eval_key(job) != key
+    # La clave del diálogo solo depende de lo que entra en la generación
+    assert dialog_key(job) == dialog_key(dict(job, eval_prompt=tmp_path / "other.txt"))
+    assert eval_key(dict(job, eval_prompt=None)) is None
+
+
+def test_interval_uses_student_t_and_the_sd_floor():
+    assert interval([4.0]) == (4.0, float("inf"))
+    mean, half = interval([3.0, 3.0, 3.0], sd_floor=0.25)
+    assert mean == 3.0 and round(half, 3) == round(4.303 * 0.25 / 3 ** 0.5, 3)
+    mean, half = interval([2.0, 4.0])
+    assert mean == 3.0 and round(half, 2) == round(12.706 * 2 ** 0.5 / 2 ** 0.5, 2)
+
+
+def test_stop_rule(matrix_config):
+    settings = adaptive_settings(matrix_config(repetitions=6))
+    assert (settings["min_samples"], settings["max_samples"]) == (3, 6)
+    scores = {"a": [4.0, 4.0], "b": [1.0, 1.0, 1.0], "c": [4.0] * 6}
+    assert stop_reason("a", scores, settings, []) is None          # todavía por debajo de min_samples
+    assert stop_reason("c", scores, settings, []) == "cap"
+    scores["a"] = [4.0, 4.5, 4.0]
+    assert stop_reason("a", scores, settings, []) is None          # intervalo aún ancho
+    assert stop_reason("a", scores, settings, ["b"]) == "separated"
+    scores["b"] = [1.0]
+    assert stop_reason("a", scores, settings, ["b"]) is None       # el rival no tiene intervalo todavía
+    scores["a"] = [4.0, 4.0, 4.0, 4.0]
+    assert stop_reason("a", scores, settings, ["b"]) == "narrow"
+    assert stop_reason("a", scores, dict(settings, separation=False), []) == "narrow"
+
+
+def test_adaptive_run_stops_cells_once_their_interval_is_narrow(matrix_config):
+    config = matrix_config(versions=["v1", "v2"], repetitions=6)
+    jobs = expand_matrix(config)
+    executor = _executor(itertools.count())
+    rows = asyncio.run(run_adaptive(executor, jobs, {config["name"]: adaptive_settings(config)}))
+    # Notas constantes del backend fake: con el suelo de 0.25 el intervalo baja de 1 punto a las 4 repeticiones
+    assert sorted((row["version"], row["run"]) for row in rows) == [(v, r) for v in ["v1", "v2"] for r in range(1, 5)]
+    assert executor.stats["adaptive_saved"] == 4
@@ -0,0 +1,60 @@
+import json
+import pytest
+import urllib.request
+import urllib.error
+from fake_openai_server import RateWindow, start_server
+from rate_limiter import is_rate_limit_error
+
+CORPUS = {"spec": ["{\"topic\": \"t\"}"], "dialog": ["P1: hi\nP2: hello"], "scores": ["{\"fluency\": 4}"]}
+
+
+@pytest.fixture
+def server():
+    server = start_server(port=0, corpus=CORPUS, latency_scale=0,
+                          limits={"requests_per_minute": 3, "tokens_per_minute": 200})
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def _post(server, content):
+    url = f"http://127.0.0.1:{server.server_address[1]}/openai/v1/chat/completions"
+    body = json.dumps({"model": "llama3-8b-8192", "messages": [{"role": "user", "content": content}]}).encode("utf-8")
+    request = urllib.request.Request(url, body, {"Content-Type": "application/json"})
+    try:
+        with urllib.request.urlopen(request) as response:
+            return response.status, dict(response.headers), json.loads(response.read())
+    except urllib.error.HTTPError as e:
+        return e.code, dict(e.headers), json.loads(e.read())
+
+
+def test_window_rejects_over_rpm_and_tpm():
+    window = RateWindow(requests_per_minute=2, tokens_per_minute=100)
+    assert window.try_acquire(60) is None
+    kind, used, wait = window.try_acquire(60)
+    assert (kind, used) == ("tokens", 60) and 0 < wait <= 60
+    assert window.try_acquire(30) is None
+    assert window.try_acquire(1)[0] == "requests"
+
+
+def test_request_larger_than_tpm_gets_413(server):
+    status, headers, body = _post(server, "x" * 4000)
+    assert status == 413
+    assert "retry-after" not in {k.lower() for k in headers}
+    assert body["error"]["message"].startswith("Request too large")
+    assert server.stats["too_large"] == 1 and server.stats["rate_limited"] == 0
+
+    # El cliente no lo trata como límite de peticiones: no reintenta
+    class APIError(Exception):
+        status_code = 413
+    assert not is_rate_limit_error(APIError(f"Error code: 413 - {json.dumps(body)}"))
+    assert not is_rate_limit_error(Exception(f"Error code: 413 - {json.dumps(body)}"))
+
+
+def test_rate_limited_request_gets_429_with_retry_after(server):
+    statuses = [_post(server, "write a dialog")[0] for _ in range(4)]
+    assert statuses == [200, 200, 200, 429]
+    status, headers, body = _post(server, "write a dialog")
+    assert status == 429 and int(headers["retry-after"]) > 0
+    assert body["error"]["code"] == "rate_limit_exceeded"
+    assert is_rate_limit_error(Exception(f"Error code: 429 - {json.dumps(body)}"))
@@ -0,0 +1,35 @@
+import json
+from pathlib import Path
+import pytest
+from json_repair import parse_json, strict_json
+
+CASES = json.loads((Path(__file__).parent / "fixtures" / "json_repair_cases.json").read_text(encoding="utf-8"))
+
+
+@pytest.mark.parametrize("case", CASES, ids=[c["name"] for c in CASES])
+def test_labelled_cases(case):
+    assert parse_json(case["text"]) == case["expected"]
+
+
+def test_annotated_bare_value_keeps_later_keys():
+    # Regresión: el ")" de "(good)" cerraba el objeto y se perdían las claves siguientes
+    assert parse_json('{"fluency": 4 (good), "coherence": 5}') == {"fluency": "4 (good)", "coherence": 5}
+
+
+def test_unbalanced_paren_closes_tuple():
+    assert parse_json("{'subplots': (a, b), 'turns': 2}") == {"subplots": ["a", "b"], "turns": 2}
+
+
+def test_bare_value_stops_at_newline():
+    assert parse_json('{"tone": calm\n"turns": 3}') == {"tone": "calm", "turns": 3}
+
+
+def test_valid_json_goes_through_json_loads():
+    text = 'prefix {"a": [1, 2], "b": {"c": null}} suffix'
+    assert strict_json(text) == {"a": [1, 2], "b": {"c": None}}
+    assert parse_json(text) == {"a": [1, 2], "b": {"c": None}}
+
+
+def test_no_object_raises():
+    with pytest.raises(ValueError):
+        parse_json("no json here")
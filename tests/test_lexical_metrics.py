@@ -0,0 +1,66 @@
+import math
+import numpy as np
+from lexical_metrics import LexicalCorpus, tokenize, summarize, GROUP_BY
+
+DIALOGS = [
+    ("v1", "P1: Hello there, how are you?\nP2: I am fine, thanks.\nP1: Good to hear."),
+    ("v1", "P1: Hello there, how are you?\nP2: Not great, to be honest."),
+    ("v1", "P1: The the the the."),
+    ("v2", "P1: Completely different words here.\nP2: Indeed they are!"),
+]
+
+
+def corpus():
+    docs = [{"model": "m", "axis": "tone", "variant": "humor", "version": v, "path": f"{i}.txt", "content": text}
+            for i, (v, text) in enumerate(DIALOGS)]
+    return LexicalCorpus(docs)
+
+
+def doc_tokens():
+    # Los n-gramas no cruzan diálogos pero sí turnos: tokens del diálogo en orden
+    return [[t for line in text.splitlines() for t in tokenize(line.split(":", 1)[1])] for _, text in DIALOGS]
+
+
+def ngrams(tokens, n):
+    return [tuple(tokens[i:i + n]) for i in range(len(tokens) - n + 1)]
+
+
+def test_distinct_n_matches_counting_by_hand():
+    lexical = corpus()
+    for n in (1, 2, 3):
+        expected = [len(set(ngrams(t, n))) / len(ngrams(t, n)) for t in doc_tokens()]
+        assert np.allclose(lexical.distinct(n), expected)
+    # Por grupo: n-gramas distintos sobre todo lo que generó cada versión
+    group, labels = lexical.group_codes(["version"])
+    assert labels == [("v1",), ("v2",)]
+    v1 = [g for t in doc_tokens()[:3] for g in ngrams(t, 2)]
+    assert np.isclose(lexical.distinct(2, group)[0], len(set(v1)) / len(v1))
+
+
+def test_self_bleu_matches_the_definition():
+    tokens = doc_tokens()
+    expected = []
+    for i, (version, _) in enumerate(DIALOGS):
+        others = [tokens[j] for j, (v, _) in enumerate(DIALOGS) if v == version and j != i]
+        if not others:
+            expected.append(math.nan)
+            continue
+        logs = []
+        for n in range(1, 5):
+            seen = {g for other in others for g in ngrams(other, n)}
+            own = ngrams(tokens[i], n)
+            logs.append(math.log((sum(g in seen for g in own) + 1) / (len(own) + 1)))
+        expected.append(math.exp(sum(logs) / 4))
+    assert np.allclose(corpus().self_bleu(), expected, equal_nan=True)
+
+
+def test_metrics_and_group_summary():
+    lexical = corpus()
+    frame = lexical.metrics()
+    assert list(frame["tokens"]) == [len(t) for t in doc_tokens()]
+    assert list(frame["turns"]) == [3, 2, 1, 2]
+    assert list(frame["question_rate"]) == [1 / 3, 1 / 2, 0, 0]
+    assert math.isnan(frame["turn_len_std"][2]) and frame["turn_len_max"][0] == 5
+    summary = summarize(frame, GROUP_BY, lexical)
+    assert list(summary["version"]) == ["v1", "v2"] and list(summary["dialogs"]) == [3, 1]
+    assert np.isclose(summary["group_distinct_1"][1], 1.0)
@@ -0,0 +1,52 @@
+import itertools
+import pytest
+from llm_client import LLMClient
+from llm_cache import ResponseCache
+
+
+@pytest.fixture
+def client(tmp_path):
+    counter = itertools.count()
+    client = LLMClient(backend="fake", model_name="fake", cache=ResponseCache(str(tmp_path / "cache.sqlite")))
+    client.llm.responder = lambda prompt: f"sample {next(counter)}"
+    return client
+
+
+def test_unseeded_sampling_is_not_replayed(client):
+    # Borrar un diálogo y regenerarlo tiene que dar una muestra nueva
+    first = client._complete("write a dialog", temperature=0.8)
+    second = client._complete("write a dialog", temperature=0.8)
+    assert first != second
+
+
+def test_seeded_and_greedy_calls_are_cached(client):
+    assert client._complete("write a dialog", temperature=0.8, seed=7) == client._complete("write a dialog", temperature=0.8, seed=7)
+    assert client._complete("evaluate", temperature=0) == client._complete("evaluate", temperature=0)
+
+
+def test_stochastic_cache_is_opt_in(tmp_path):
+    client = LLMClient(backend="fake", model_name="fake", cache=ResponseCache(str(tmp_path / "cache.sqlite")),
+                       cache_stochastic=True)
+    counter = itertools.count()
+    client.llm.responder = lambda prompt: f"sample {next(counter)}"
+    assert client._complete("write a dialog", temperature=0.8) == client._complete("write a dialog", temperature=0.8)
+
+
+def test_unseeded_batches_are_not_replayed(client):
+    first = client._complete_n("write a dialog", temperature=0.8, n=2)
+    second = client._complete_n("write a dialog", temperature=0.8, n=2)
+    assert not set(first) & set(second)
+
+
+def test_batch_samples_are_not_served_to_single_calls(client):
+    # Con `n`, la muestra 1 no es lo que daría una llamada suelta con semilla 8
+    batch = client._complete_n("write a dialog", temperature=0.8, n=2, seed=7)
+    assert client._complete_n("write a dialog", temperature=0.8, n=2, seed=7) == batch
+    assert client._complete("write a dialog", temperature=0.8, seed=8) not in batch
+    assert client._complete("write a dialog", temperature=0.8, seed=7) not in batch
+
+
+def test_growing_a_seeded_batch_keeps_the_cached_samples(client):
+    first = client._complete_n("write a dialog", temperature=0.8, n=2, seed=7)
+    grown = client._complete_n("write a dialog", temperature=0.8, n=3, seed=7)
+    assert grown[:2] == first and grown[2] not in first
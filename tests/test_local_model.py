@@ -0,0 +1,41 @@
+from pathlib import Path
+from local_model import (context_size, templates_context_size, prompt_templates, template_prefix,
+                         MIN_CONTEXT, MAX_CONTEXT, PROMPT_FILL_TOKENS, EXPECTED_OUTPUT_TOKENS)
+
+
+def test_context_size_rounds_and_clamps():
+    assert context_size(10, 10) == MIN_CONTEXT
+    assert context_size(2100, 0) == 2560
+    assert context_size(10_000) == MAX_CONTEXT
+
+
+def test_templates_context_size_uses_longest_template():
+    short = templates_context_size([100, 200])
+    longest = templates_context_size([100, 200, 900])
+    assert longest == context_size(900 + PROMPT_FILL_TOKENS, EXPECTED_OUTPUT_TOKENS)
+    assert short <= longest <= MAX_CONTEXT
+    assert templates_context_size([]) == context_size(PROMPT_FILL_TOKENS, EXPECTED_OUTPUT_TOKENS)
+    assert templates_context_size([3000], limit=MAX_CONTEXT) == MAX_CONTEXT
+
+
+def test_prompt_templates_reads_every_template(tmp_path):
+    (tmp_path / "prompts").mkdir()
+    (tmp_path / "prompts" / "prompt_a.txt").write_text("A {REAL_DIALOG_HERE}")
+    (tmp_path / "prompts" / "notes.md").write_text("ignored")
+    (tmp_path / "variants" / "rol").mkdir(parents=True)
+    (tmp_path / "variants" / "rol" / "prompt_b.txt").write_text("B")
+    templates = prompt_templates([tmp_path / "prompts", tmp_path / "variants", tmp_path / "missing"])
+    assert sorted(templates) == ["A {REAL_DIALOG_HERE}", "B"]
+
+
+def test_repo_templates_fit_in_context():
+    # Aproximación de 4 caracteres por token: la plantilla más larga cabe con margen
+    root = Path(__file__).resolve().parent.parent
+    templates = prompt_templates([root / "prompts", root / "prompts_variants"])
+    assert templates
+    assert templates_context_size([len(t) // 4 for t in templates]) <= MAX_CONTEXT
+
+
+def test_template_prefix_stops_at_first_marker():
+    assert template_prefix("Rate this.\n{GENERATED_DIALOG_HERE}\n{SPECIFICATION_HERE}") == "Rate this.\n"
+    assert template_prefix("no markers") == "no markers"
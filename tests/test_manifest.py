@@ -0,0 +1,55 @@
+import json
+from concurrent.futures import ProcessPoolExecutor
+from manifest import Manifest, get_manifest, fingerprint, MANIFEST_NAME
+
+
+def _record_many(variant_dir, worker, count):
+    # Un proceso worker: su propio Manifest en memoria, como cada worker de la cola
+    manifest = Manifest(variant_dir)
+    for i in range(count):
+        path = variant_dir / f"w{worker}_dialog_{i:03d}.txt"
+        path.write_text(f"dialog {worker} {i}")
+        manifest.record(path, f"inputs-{worker}-{i}", stage="test")
+    return count
+
+
+def test_concurrent_processes_do_not_lose_entries(tmp_path):
+    with ProcessPoolExecutor(max_workers=2) as pool:
+        done = list(pool.map(_record_many, [tmp_path, tmp_path], [0, 1], [150, 150]))
+    assert done == [150, 150]
+    entries = json.loads((tmp_path / MANIFEST_NAME).read_text())
+    assert len(entries) == 300
+    assert not list(tmp_path.glob("*.tmp"))
+
+
+def test_sees_entries_recorded_by_another_instance(tmp_path):
+    first, second = Manifest(tmp_path), Manifest(tmp_path)
+    artifact = tmp_path / "dialog_001.txt"
+    artifact.write_text("hello")
+    first.record(artifact, "a")
+    assert second.is_fresh(artifact, "a")
+    second.record(artifact, "b")
+    assert not first.is_fresh(artifact, "a") and first.is_fresh(artifact, "b")
+
+
+def test_freshness_and_adoption(tmp_path):
+    artifact = tmp_path / "specifications" / "dialog_001_spec.json"
+    manifest = Manifest(tmp_path)
+    assert not manifest.is_fresh(artifact, "x")
+    artifact.parent.mkdir()
+    artifact.write_text("{}")
+    # Fichero anterior al manifest: se adopta con las entradas actuales
+    assert manifest.is_fresh(artifact, "x")
+    assert manifest.entry(artifact)["stage"] == "adopted"
+    assert not Manifest(tmp_path, adopt_existing=False).is_fresh(tmp_path / "other.json", "x")
+    assert get_manifest(tmp_path) is get_manifest(str(tmp_path))
+
+
+def test_fingerprint_hashes_file_contents(tmp_path):
+    prompt = tmp_path / "prompt.txt"
+    prompt.write_text("v1")
+    before = fingerprint(prompt=prompt, spec={"b": 1, "a": 2})
+    assert before == fingerprint(spec={"a": 2, "b": 1}, prompt=prompt)
+    prompt.write_text("v2 longer")
+    assert fingerprint(prompt=prompt, spec={"b": 1, "a": 2}) != before
+    assert fingerprint(prompt=tmp_path / "missing.txt") == fingerprint(prompt=tmp_path / "other_missing.txt")
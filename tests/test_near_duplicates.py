@@ -0,0 +1,129 @@
+import itertools
+import numpy as np
+import pytest
+from near_duplicates import NearDuplicateIndex, shingles, signature, similarity, band_keys, BANDS
+
+WORDS = [f"w{i}" for i in range(2000)]
+
+
+def _dialog(words):
+    half = len(words) // 4
+    lines = [" ".join(words[i:i + half]) for i in range(0, len(words), half)]
+    return "\n".join(f"P{i % 2 + 1}: {line}" for i, line in enumerate(lines))
+
+
+def _jaccard(a, b):
+    a, b = shingles(a), shingles(b)
+    return len(a & b) / len(a | b)
+
+
+@pytest.fixture(scope="module")
+def corpus():
+    # 40 diálogos base y, de cada uno, una copia con 1-8 palabras cambiadas
+    rng = np.random.default_rng(0)
+    texts = {}
+    for d in range(40):
+        words = list(rng.choice(WORDS, 120))
+        texts[f"base_{d:02d}.txt"] = _dialog(words)
+        for position in rng.choice(120, size=d % 8 + 1, replace=False):
+            words[position] = "edited"
+        texts[f"copy_{d:02d}.txt"] = _dialog(words)
+    return texts
+
+
+@pytest.fixture
+def index(tmp_path, corpus):
+    index = NearDuplicateIndex(str(tmp_path / "index.sqlite"))
+    for path, text in corpus.items():
+        index.add(path, text, {"model": "llama3_8b", "version": path.split("_")[0]})
+    return index
+
+
+def test_shingles_use_turn_text_only():
+    text = "Here is the dialog:\nP1: one two three\nP2: four\n\nHope it helps!"
+    assert shingles(text) == {"one two three", "two three four"}
+    assert shingles("P1: hi") == {"hi"}
+    assert signature("") is None
+
+
+def test_signature_estimates_jaccard(corpus):
+    errors = []
+    for d in range(40):
+        a, b = corpus[f"base_{d:02d}.txt"], corpus[f"copy_{d:02d}.txt"]
+        errors.append(abs(float(similarity(signature(a), signature(b))) - _jaccard(a, b)))
+    assert np.mean(errors) < 0.04 and max(errors) < 0.15
+    assert np.array_equal(signature(corpus["base_00.txt"]), signature(corpus["base_00.txt"]))
+    assert len(band_keys(signature(corpus["base_00.txt"]))) == BANDS
+
+
+def test_lsh_candidate_recall(index, corpus):
+    a, b, scores, meta = index.pairs(threshold=0.0)
+    found = {frozenset((meta[x]["path"], meta[y]["path"])) for x, y in zip(a.tolist(), b.tolist())}
+    truth = {frozenset(pair) for pair in itertools.combinations(corpus, 2) if _jaccard(*(corpus[p] for p in pair)) >= 0.85}
+    assert len(truth) >= 15
+    assert len(truth & found) / len(truth) >= 0.95
+    # Diálogos sin relación (Jaccard ~0) no llegan a compartir banda
+    unrelated = {frozenset(("base_00.txt", "base_01.txt")), frozenset(("base_05.txt", "copy_09.txt"))}
+    assert not unrelated & found
+
+
+def test_query_and_duplicates_of(index, corpus):
+    matches = index.query(corpus["base_03.txt"], threshold=0.7)
+    assert [m["path"] for m in matches][:2] == ["base_03.txt", "copy_03.txt"]
+    assert matches[0]["similarity"] == 1.0 and matches[0]["version"] == "base"
+    assert [m["path"] for m in index.duplicates_of("base_03.txt", threshold=0.7)] == ["copy_03.txt"]
+    assert index.query("", threshold=0.0) == []
+
+
+def test_add_is_incremental(index, corpus):
+    before = index.stats()
+    assert not index.add("base_00.txt", corpus["base_00.txt"])
+    # Reescrito con otro texto: se sustituye, no se duplica
+    assert index.add("base_00.txt", corpus["base_01.txt"])
+    assert index.stats()["dialogs"] == before["dialogs"]
+    assert [m["path"] for m in index.duplicates_of("base_00.txt", threshold=0.99)] == ["base_01.txt"]
+    assert not index.add("empty.txt", "   ")
+
+
+def test_report_counts_pairs_and_clusters(tmp_path, corpus):
+    index = NearDuplicateIndex(str(tmp_path / "index.sqlite"))
+    for i in range(3):
+        index.add(f"a_{i}.txt", corpus["base_07.txt"], {"model": "m1"})
+    index.add("b_0.txt", corpus["base_07.txt"], {"model": "m2"})
+    index.add("b_1.txt", corpus["base_08.txt"], {"model": "m2"})
+    report = index.report(by=["model"], threshold=0.9).set_index("model")
+    assert report.loc["m1", "dialogs"] == 3 and report.loc["m1", "pairs"] == 3
+    assert report.loc["m1", "cross_group_pairs"] == 3 and report.loc["m2", "cross_group_pairs"] == 3
+    assert report.loc["m2", "with_duplicates"] == 1 and report.loc["m2", "duplicate_rate"] == 0.5
+    assert report.loc["m1", "clusters"] == 1 and report.loc["m1", "largest_cluster"] == 3
+
+
+def test_rewritten_to_empty_text_leaves_the_index(index, corpus):
+    assert not index.add("base_04.txt", "   ")
+    assert index.query(corpus["base_04.txt"], threshold=0.99) == []
+    assert index.stats()["dialogs"] == len(corpus) - 1
+
+
+def test_sync_follows_the_catalog(tmp_path, corpus):
+    from results_store import ResultsStore
+
+    experiments = tmp_path / "experiments"
+    folder = experiments / "llama3_8b" / "tone" / "tone_humor" / "generated_dialogs"
+    folder.mkdir(parents=True)
+    for d in range(3):
+        (folder / f"dialog_{d:03d}_gen.txt").write_text(corpus[f"base_{d:02d}.txt"])
+    index = NearDuplicateIndex(str(tmp_path / "index.sqlite"))
+    passes = itertools.count()
+
+    def sync():
+        # Un almacén nuevo por pasada: refresh() solo relee el disco una vez por instancia
+        return index.sync(ResultsStore(str(tmp_path / f"store_{next(passes)}.sqlite"), base_dir=experiments))
+
+    assert sync() == (3, 0)
+    assert sync() == (0, 0)
+    (folder / "dialog_001_gen.txt").unlink()
+    assert sync() == (0, 1)
+    assert index.stats()["dialogs"] == 2
+    a, _, _, meta = index.pairs(threshold=0.0)
+    assert "llama3_8b/tone/tone_humor/generated_dialogs/dialog_001_gen.txt" not in {m["path"] for m in meta.values()}
+    assert index.report(by=["model"])["dialogs"].sum() == 2
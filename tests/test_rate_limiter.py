@@ -0,0 +1,100 @@
+import json
+import asyncio
+import pytest
+import rate_limiter
+from rate_limiter import TokenBucket, RateLimiter, estimate_tokens, is_rate_limit_error, extract_wait_time
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    # Reloj manual: los cubos se rellenan solo cuando el test avanza el tiempo
+    now = [1000.0]
+    monkeypatch.setattr(rate_limiter.time, "monotonic", lambda: now[0])
+    return now
+
+
+def _groq_error(message, code="rate_limit_exceeded", status=429):
+    return Exception(f"Error code: {status} - " + json.dumps({"error": {"message": message, "type": "tokens", "code": code}}))
+
+
+def test_estimate_tokens():
+    assert estimate_tokens("") == 1
+    assert estimate_tokens("x" * 400) == 100
+
+
+def test_bucket_queues_concurrent_reservations_in_order(clock):
+    bucket = TokenBucket(capacity=60, refill_per_second=1)
+    assert bucket.reserve(60) == 0.0
+    # El saldo queda negativo: cada reserva espera detrás de la anterior
+    assert bucket.reserve(10) == pytest.approx(10)
+    assert bucket.reserve(10) == pytest.approx(20)
+    clock[0] += 20
+    assert bucket.reserve(0) == 0.0
+
+
+def test_bucket_refill_is_capped(clock):
+    bucket = TokenBucket(capacity=10, refill_per_second=1)
+    bucket.reserve(10)
+    clock[0] += 1000
+    assert bucket.reserve(10) == 0.0
+    assert bucket.reserve(1) == pytest.approx(1)
+
+
+def test_request_larger_than_capacity_does_not_wait_forever(clock):
+    bucket = TokenBucket(capacity=100, refill_per_second=1)
+    assert bucket.reserve(500) == 0.0
+    assert bucket.reserve(500) == pytest.approx(100)
+
+
+def test_drain_applies_provider_wait(clock):
+    bucket = TokenBucket(capacity=60, refill_per_second=2)
+    bucket.drain(5)
+    assert bucket.reserve(0) == pytest.approx(5)
+
+
+def test_limiter_waits_for_the_slowest_bucket(clock):
+    limiter = RateLimiter(requests_per_minute=60, tokens_per_minute=600)
+    assert limiter._delay(600) == 0.0
+    # Cuota de peticiones de sobra, pero los tokens tardan 10 s en volver (10 tokens/s)
+    assert limiter._delay(100) == pytest.approx(10)
+    limiter.penalize(30)
+    # 30 s de penalización más el segundo que cuesta la propia petición (1 petición/s)
+    assert limiter._delay(0) == pytest.approx(31)
+
+
+def test_acquire_async_sleeps_the_returned_delay(clock, monkeypatch):
+    slept = []
+
+    async def fake_sleep(seconds):
+        slept.append(seconds)
+    monkeypatch.setattr(rate_limiter.asyncio, "sleep", fake_sleep)
+    limiter = RateLimiter(requests_per_minute=1, tokens_per_minute=1000)
+    assert asyncio.run(limiter.acquire_async(10)) == 0.0
+    assert asyncio.run(limiter.acquire_async(10)) == pytest.approx(60)
+    assert slept == [pytest.approx(60)]
+
+
+def test_get_rate_limiter_is_shared_per_model():
+    assert rate_limiter.get_rate_limiter("llama3-70b-8192") is rate_limiter.get_rate_limiter("llama3-70b-8192")
+    assert rate_limiter.get_rate_limiter("llama3-70b-8192") is not rate_limiter.get_rate_limiter("llama3-8b-8192")
+
+
+def test_rate_limit_errors():
+    assert is_rate_limit_error(_groq_error("Rate limit reached for model `m` on tokens per minute (TPM)"))
+    assert not is_rate_limit_error(_groq_error("Invalid API key", code="invalid_api_key", status=401))
+    assert not is_rate_limit_error(ValueError("no payload"))
+
+    class StatusError(Exception):
+        status_code = 429
+    assert is_rate_limit_error(StatusError("Too Many Requests"))
+
+
+@pytest.mark.parametrize("message,expected", [
+    ("Rate limit reached ... Please try again in 4.94s. Visit https://console.groq.com/docs/rate-limits", 4.94),
+    ("Rate limit reached ... Please try again in 1m2.5s. Visit https://console.groq.com/docs/rate-limits", 62.5),
+    ("Rate limit reached ... Please try again in 7s.", 7.0),
+    ("Rate limit reached, no hint", 90),
+])
+def test_extract_wait_time(message, expected):
+    assert extract_wait_time(_groq_error(message)) == pytest.approx(expected)
+    assert extract_wait_time(ValueError("no payload")) == 90
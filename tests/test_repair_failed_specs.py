@@ -0,0 +1,52 @@
+import json
+import repair_failed_specs
+from manifest import Manifest, fingerprint
+
+
+def _variant(tmp_path):
+    variant = tmp_path / "experiments" / "llama3_8b" / "tone" / "tone_humor"
+    (variant / "specifications_failed").mkdir(parents=True)
+    (variant / "specifications").mkdir()
+    return variant
+
+
+def test_unrecorded_raw_output_does_not_overwrite_spec(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    variant = _variant(tmp_path)
+    spec = variant / "specifications" / "dialog_001_spec.json"
+    spec.write_text(json.dumps({"topic": "good spec"}))
+    (variant / "specifications_failed" / "dialog_001_raw_output.txt").write_text("{'topic': 'old raw'}")
+
+    repair_failed_specs.main()
+
+    assert json.loads(spec.read_text()) == {"topic": "good spec"}
+    assert Manifest(variant).entry(spec) is None
+
+
+def test_unrecorded_raw_output_repaired_without_fingerprint(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    variant = _variant(tmp_path)
+    (variant / "specifications_failed" / "dialog_002_raw_output.txt").write_text("{'topic': 'only raw'}")
+
+    repair_failed_specs.main()
+
+    spec = variant / "specifications" / "dialog_002_spec.json"
+    assert json.loads(spec.read_text()) == {"topic": "only raw"}
+    assert Manifest(variant).entry(spec) is None
+
+
+def test_recorded_failure_inherits_inputs_and_is_fresh(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    variant = _variant(tmp_path)
+    failed = variant / "specifications_failed" / "dialog_003_spec.txt"
+    failed.write_text('{topic: "broken", turns: 4,}')
+    inputs = fingerprint(model="m", prompt="p")
+    Manifest(variant).record(failed, inputs, stage="failed")
+
+    repair_failed_specs.main()
+
+    spec = variant / "specifications" / "dialog_003_spec.json"
+    assert json.loads(spec.read_text()) == {"topic": "broken", "turns": 4}
+    manifest = Manifest(variant)
+    assert manifest.entry(spec)["stage"] == "repair"
+    assert manifest.is_fresh(spec, inputs)
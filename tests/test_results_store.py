@@ -0,0 +1,81 @@
+import json
+import pytest
+from results_store import ResultsStore, describe
+
+
+def write(path, content):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(content if isinstance(content, str) else json.dumps(content), encoding="utf-8")
+    return path
+
+
+@pytest.fixture
+def experiments(tmp_path):
+    base = tmp_path / "experiments"
+    for model in ["llama3_8b", "llama3_70b"]:
+        for variant in ["tone_humor", "tone_serious"]:
+            variant_dir = base / model / "tone" / variant
+            for i in (1, 2):
+                write(variant_dir / "generated_dialogs" / f"dialog_{i}_gen.txt", f"A: {model} {variant} {i}")
+                write(variant_dir / "specifications" / f"dialog_{i}_spec.json", {"topic": "x"})
+                write(variant_dir / "evaluated_dialogs" / f"dialog_{i}_eval.json", {"fluency": i, "comments": "ok"})
+            write(variant_dir / "specifications_failed" / "dialog_3_raw_output.txt", "not json")
+    ablation = base / "llama3_8b" / "tone" / "tone_humor" / "ablation_outputs"
+    write(ablation / "v1_dialog.txt", "A: single run")
+    write(ablation / "v1_scores.json", {"fluency": 5, "coherence": "high"})
+    for run in (1, 2):
+        write(ablation / f"v2_dialog_{run:02}.txt", f"A: run {run}")
+        write(ablation / f"v2_scores_{run:02}.json", {"fluency": run})
+    return base
+
+
+def store_for(experiments):
+    return ResultsStore(str(experiments.parent / "results.sqlite"), base_dir=experiments)
+
+
+def test_describe_reads_metadata_from_the_path(experiments):
+    meta = describe(experiments / "llama3_8b" / "tone" / "tone_humor" / "ablation_outputs" / "v2_scores_02.json",
+                    experiments)
+    assert (meta["kind"], meta["model"], meta["axis"], meta["variant"], meta["version"], meta["run"]) == \
+        ("scores", "llama3_8b", "tone", "tone_humor", "v2", 2)
+    assert describe(experiments / "llama3_8b" / "notes.md", experiments) is None
+
+
+def test_find_matches_walking_the_tree(experiments):
+    store = store_for(experiments)
+    assert store.refresh()["total"] == 4 * 7 + 6
+    # Lo mismo que recorría batch_evaluate: <modelo>/<eje>/<variante>/generated_dialogs/dialog_*_gen.txt
+    for model in ["llama3_8b", "llama3_70b"]:
+        walked = [(c.name, v.name) for c in sorted((experiments / model).glob("*")) for v in sorted(c.glob("*"))]
+        assert [(a, v) for _, a, v in store.variants("dialog", model=model, folder="generated_dialogs")] == walked
+        for axis, variant in walked:
+            expected = sorted((experiments / model / axis / variant / "generated_dialogs").glob("dialog_*_gen.txt"))
+            assert store.find("dialog", model=model, axis=axis, variant=variant, folder="generated_dialogs") == expected
+    assert store.stats() == {"dialog": 11, "spec": 8, "scores": 11, "raw": 4}
+    with pytest.raises(ValueError, match="Unknown column"):
+        store.find("dialog", colour="red")
+
+
+def test_refresh_only_rereads_what_changed(experiments):
+    store = store_for(experiments)
+    store.build()
+    assert store.build() == {"updated": 0, "removed": 0, "total": 34}
+    scores = experiments / "llama3_8b" / "tone" / "tone_humor" / "evaluated_dialogs" / "dialog_1_eval.json"
+    write(scores, {"fluency": 3, "comments": "rewritten"})
+    (experiments / "llama3_70b" / "tone" / "tone_serious" / "generated_dialogs" / "dialog_2_gen.txt").unlink()
+    assert store.build() == {"updated": 1, "removed": 1, "total": 33}
+    row = store.iter_query("SELECT fluency, comments FROM artifacts WHERE path = ?",
+                           (scores.relative_to(experiments).as_posix(),))
+    assert list(row) == [{"fluency": 3.0, "comments": "rewritten"}]
+
+
+def test_ablation_scores_come_with_their_dialog(experiments):
+    store = store_for(experiments)
+    store.build()
+    single = list(store.iter_ablation(repeated=False))
+    assert [(r["version"], r["fluency"], r["coherence"], r["dialog"]) for r in single] == [("v1", 5, None, "A: single run")]
+    # El JSON original sigue en content para las claves que no son métricas
+    assert json.loads(single[0]["content"])["coherence"] == "high"
+    repeated = list(store.iter_ablation(folder="ablation_outputs", repeated=True))
+    assert [(r["run"], r["dialog"]) for r in repeated] == [(1, "A: run 1"), (2, "A: run 2")]
+    assert len(store.load_ablation()) == 3
@@ -0,0 +1,30 @@
+import llm_backends
+from schemas import SPEC_SCHEMA, SCORES_SCHEMA, validation_errors
+
+SCORES = {"fluency": 4, "coherence": 5, "realism": 3, "fidelity_to_specification": 4,
+          "engagement": 4, "originality": 2, "comments": "ok"}
+
+
+def test_json_schema_response_format_is_not_strict(monkeypatch):
+    # Los esquemas usan mapas libres y minimum/maximum: el modo estricto los rechazaría
+    monkeypatch.setenv("GROQ_API_KEY", "test")
+    backend = llm_backends.GroqBackend("llama3-8b-8192", json_schema=True)
+    params = backend.structured_params(SCORES_SCHEMA)
+    assert params["response_format"]["type"] == "json_schema"
+    assert params["response_format"]["json_schema"]["strict"] is False
+    assert params["response_format"]["json_schema"]["schema"] is SCORES_SCHEMA
+
+
+def test_score_ranges_checked_locally():
+    assert validation_errors(SCORES, SCORES_SCHEMA) == []
+    errors = validation_errors({**SCORES, "fluency": 7, "originality": 0}, SCORES_SCHEMA)
+    assert len(errors) == 2
+    assert errors[0].startswith("fluency:") and errors[1].startswith("originality:")
+
+
+def test_spec_free_maps_and_minimums():
+    spec = {"topic": "t", "turns": 6, "participants": 2, "tone": {"P1": "warm", "P2": "dry"},
+            "goals": {"P1": "a"}, "subplots": [], "imperfections": ["pause"]}
+    assert validation_errors(spec, SPEC_SCHEMA) == []
+    errors = validation_errors({**spec, "turns": 0, "tone": {"P1": 3}}, SPEC_SCHEMA)
+    assert [e.split(":")[0] for e in errors] == ["tone.P1", "turns"]
@@ -0,0 +1,84 @@
+import numpy as np
+import pandas as pd
+import pytest
+import score_analytics
+from score_analytics import ScoreTable
+
+METRICS = ["fluency", "coherence"]
+
+
+@pytest.fixture
+def frame():
+    rng = np.random.default_rng(3)
+    rows = []
+    for model, n in (("llama3_8b", 12), ("llama3_70b", 7), ("gemma", 1)):
+        for version in ("v1", "v2"):
+            for run in range(n):
+                rows.append({"model": model, "version": version, "run": run,
+                             "fluency": float(rng.integers(1, 6)), "coherence": float(rng.integers(1, 6))})
+    frame = pd.DataFrame(rows)
+    # Notas que faltan: NaN, no cero
+    frame.loc[[0, 5, 30], "coherence"] = np.nan
+    return frame
+
+
+def _table(frame):
+    return ScoreTable.from_frame(frame, metrics=METRICS, columns=["model", "version", "run"])
+
+
+def test_describe_matches_pandas(frame):
+    stats = _table(frame).describe(["model", "version"])
+    expected = frame.groupby(["model", "version"])[METRICS].agg(["count", "mean", "var"])
+    for g, label in enumerate(stats["labels"]):
+        for m, metric in enumerate(METRICS):
+            row = expected.loc[label, metric]
+            assert stats["n"][g, m] == row["count"]
+            assert stats["mean"][g, m] == pytest.approx(row["mean"])
+            if row["count"] < 2:
+                assert np.isnan(stats["var"][g, m])
+            else:
+                assert stats["var"][g, m] == pytest.approx(row["var"])
+
+
+def test_describe_without_grouping(frame):
+    stats = _table(frame).describe([])
+    assert stats["labels"] == [()]
+    assert stats["mean"][0] == pytest.approx(frame[METRICS].mean().to_numpy())
+
+
+def test_bootstrap_resamples_within_each_group(frame):
+    frame.loc[frame["model"] == "gemma", "fluency"] = 3.0
+    labels, means = _table(frame).bootstrap(["model"], n_boot=300, seed=1)
+    assert means.shape == (300, 3, 2)
+    gemma = labels.index(("gemma",))
+    assert np.all(means[:, gemma, 0] == 3.0)
+    for g, (model,) in enumerate(labels):
+        values = frame.loc[frame["model"] == model, "fluency"]
+        assert values.min() <= means[:, g, 0].min() and means[:, g, 0].max() <= values.max()
+        assert means[:, g, 0].mean() == pytest.approx(values.mean(), abs=0.1)
+
+
+def test_bootstrap_is_reproducible_and_independent_of_chunking(frame, monkeypatch):
+    table = _table(frame)
+    _, first = table.bootstrap(["model", "version"], n_boot=50, seed=7)
+    monkeypatch.setattr(score_analytics, "CHUNK_CELLS", 1)
+    _, chunked = table.bootstrap(["model", "version"], n_boot=50, seed=7)
+    np.testing.assert_array_equal(first, chunked)
+    _, other = table.bootstrap(["model", "version"], n_boot=50, seed=8)
+    assert not np.array_equal(first, other)
+
+
+def test_summarize_intervals_contain_the_mean(frame):
+    summary = _table(frame).summarize(["model"], n_boot=500, ci=95)
+    assert list(summary.columns) == ["model", "metric", "n", "mean", "var", "std", "ci_low", "ci_high"]
+    assert len(summary) == 3 * len(METRICS)
+    assert (summary["ci_low"] <= summary["mean"]).all() and (summary["mean"] <= summary["ci_high"]).all()
+    assert np.allclose(summary["std"] ** 2, summary["var"])
+
+
+def test_summarize_empty_and_without_bootstrap(frame):
+    table = _table(frame)
+    assert table.filter(np.zeros(len(table), dtype=bool)).summarize(["model"]).empty
+    summary = table.filter(frame["model"].to_numpy() == "gemma").summarize(["model"], n_boot=0)
+    assert "ci_low" not in summary.columns
+    assert summary["n"].tolist() == [2, 2]
@@ -0,0 +1,123 @@
+import itertools
+import numpy as np
+import pytest
+import significance
+from score_analytics import ScoreTable
+from significance import _unpaired, _paired, adjust, pairwise_tests, version_order
+
+A = [4.0, 5.0, 4.0, 5.0, 5.0]
+B = [3.0, 2.0, 4.0, 3.0, 2.0, 3.0]
+
+
+def _brute_unpaired(a, b):
+    # Todas las particiones de la muestra conjunta, una a una
+    z = np.array(a + b)
+    observed = abs(np.mean(a) - np.mean(b))
+    hits = total = 0
+    for chosen in itertools.combinations(range(len(z)), len(a)):
+        mask = np.zeros(len(z), dtype=bool)
+        mask[list(chosen)] = True
+        hits += abs(z[mask].mean() - z[~mask].mean()) >= observed - 1e-12
+        total += 1
+    return hits / total
+
+
+def _brute_paired(d):
+    observed = abs(np.mean(d))
+    flips = list(itertools.product([1, -1], repeat=len(d)))
+    return sum(abs(np.mean(np.array(s) * d)) >= observed - 1e-12 for s in flips) / len(flips)
+
+
+def _stack(values):
+    return np.array(values, dtype=np.float64)[None, :, None]
+
+
+def test_exact_unpaired_p_value_matches_brute_force():
+    result = _unpaired(_stack(A), _stack(B), n_perm=10000, rng=np.random.default_rng(0))
+    assert result["exact"]
+    assert result["p_value"][0, 0] == pytest.approx(_brute_unpaired(A, B))
+    assert result["diff"][0, 0] == pytest.approx(np.mean(A) - np.mean(B))
+
+
+def test_sampled_unpaired_p_value_approximates_exact():
+    # C(11, 5) = 462 particiones: con n_perm menor se muestrea
+    exact = _brute_unpaired(A, B)
+    result = _unpaired(_stack(A), _stack(B), n_perm=400, rng=np.random.default_rng(0))
+    assert not result["exact"]
+    assert result["p_value"][0, 0] == pytest.approx(exact, abs=0.02)
+    # Con permutaciones aleatorias la observada cuenta: p nunca es 0
+    assert result["p_value"][0, 0] >= 1 / 401
+
+
+def test_identical_groups_are_not_significant():
+    result = _unpaired(_stack([3.0, 4.0, 3.0]), _stack([3.0, 4.0, 3.0]), n_perm=1000, rng=np.random.default_rng(0))
+    assert result["p_value"][0, 0] == pytest.approx(1.0)
+
+
+def test_exact_paired_p_value_matches_brute_force():
+    a, b = [5.0, 4.0, 5.0, 4.0, 5.0, 3.0], [3.0, 4.0, 2.0, 3.0, 4.0, 3.0]
+    result = _paired(_stack(a), _stack(b), n_perm=10000, rng=np.random.default_rng(0))
+    assert result["exact"]
+    assert result["p_value"][0, 0] == pytest.approx(_brute_paired(np.array(a) - np.array(b)))
+    sampled = _paired(_stack(a), _stack(b), n_perm=32, rng=np.random.default_rng(0))
+    assert not sampled["exact"]
+
+
+def test_stacked_pairs_match_one_at_a_time():
+    rng = np.random.default_rng(5)
+    a = rng.integers(1, 6, size=(4, 5, 3)).astype(float)
+    b = rng.integers(1, 6, size=(4, 5, 3)).astype(float)
+    a[1, 2, 0] = np.nan
+    stacked = _unpaired(a, b, n_perm=10000, rng=np.random.default_rng(0))["p_value"]
+    for p in range(4):
+        single = _unpaired(a[p:p + 1], b[p:p + 1], n_perm=10000, rng=np.random.default_rng(0))["p_value"]
+        np.testing.assert_allclose(stacked[p], single[0])
+
+
+def test_p_values_independent_of_chunking(monkeypatch):
+    args = (_stack(A), _stack(B))
+    before = _unpaired(*args, n_perm=10000, rng=np.random.default_rng(0))["p_value"]
+    monkeypatch.setattr(significance, "CHUNK_CELLS", 1)
+    after = _unpaired(*args, n_perm=10000, rng=np.random.default_rng(0))["p_value"]
+    np.testing.assert_array_equal(before, after)
+
+
+@pytest.mark.parametrize("method,expected", [
+    ("bonferroni", [0.04, 0.12, 0.16, 1.0]),
+    ("holm", [0.04, 0.09, 0.09, 0.5]),
+    ("fdr_bh", [0.04, 0.04 * 4 / 3, 0.04 * 4 / 3, 0.5]),
+    ("none", [0.01, 0.03, 0.04, 0.5]),
+])
+def test_adjust(method, expected):
+    assert adjust([0.01, 0.03, 0.04, 0.5], method) == pytest.approx(expected)
+
+
+def test_adjust_keeps_order_and_nan():
+    out = adjust([0.5, np.nan, 0.01], "holm")
+    assert out[0] == pytest.approx(0.5) and np.isnan(out[1]) and out[2] == pytest.approx(0.02)
+    with pytest.raises(ValueError):
+        adjust([0.1], "sidak")
+
+
+def test_version_order():
+    assert sorted(["v10", "v2", "v5_no_instructions", "v1"], key=version_order) == ["v1", "v2", "v5_no_instructions", "v10"]
+
+
+def test_pairwise_tests_over_a_table():
+    keys = {k: [] for k in ("model", "axis", "variant", "dialog_id", "version", "run")}
+    scores = []
+    for version, values in (("v1", A), ("v2", B[:5]), ("v10", [4.0])):
+        for run, value in enumerate(values, 1):
+            for k, v in (("model", "llama3_8b"), ("axis", "tone"), ("variant", "humor"), ("dialog_id", None),
+                         ("version", version), ("run", run)):
+                keys[k].append(v)
+            scores.append([value] * 6)
+    result = pairwise_tests(ScoreTable(keys, scores), n_perm=10000)
+    # v10 tiene una sola repetición: no entra en ninguna pareja
+    assert set(zip(result["version_a"], result["version_b"])) == {("v1", "v2")}
+    assert len(result) == 6
+    assert result["exact"].all()
+    assert result["p_value"].iloc[0] == pytest.approx(_brute_unpaired(A, B[:5]))
+    assert (result["p_adjusted"] == result["p_value"]).all()  # una sola pareja por familia
+    paired = pairwise_tests(ScoreTable(keys, scores), paired=True, n_perm=10000)
+    assert paired["p_value"].iloc[0] == pytest.approx(_brute_paired(np.array(A) - np.array(B[:5])))
@@ -0,0 +1,46 @@
+import json
+import pytest
+from pathlib import Path
+from dialog_generator import DialogGenerator
+from llm_backends import FAKE_SPEC
+
+ROOT = Path(__file__).resolve().parent.parent
+SPEC_PROMPT = "prompts/prompt_generate_specification.txt"
+VALID = json.dumps(FAKE_SPEC)
+BROKEN = "Sorry, I cannot produce that."
+
+
+@pytest.fixture
+def generator(monkeypatch):
+    # Los prompts se leen con rutas relativas a la raíz del repo, como en los scripts
+    monkeypatch.chdir(ROOT)
+    return DialogGenerator(backend="fake", model_name="fake", cache=False, format_fix_model="fake")
+
+
+def scripted(generator, spec_outputs, fix_output=BROKEN):
+    # Salidas por orden para el prompt de la spec; el formateador siempre responde fix_output
+    outputs = iter(spec_outputs)
+    generator.llm.responder = lambda prompt: fix_output if "JSON formatter" in prompt[:200] else next(outputs)
+
+
+@pytest.mark.parametrize("outputs, fix_output, tier", [
+    ([VALID], BROKEN, "direct"),
+    ([VALID[:-1] + ",}"], BROKEN, "local_repair"),
+    ([BROKEN], VALID, "format_fix"),
+    ([BROKEN, VALID], BROKEN, "regenerate"),
+])
+def test_recovered_spec_leaves_no_failed_output(generator, tmp_path, outputs, fix_output, tier):
+    scripted(generator, outputs, fix_output)
+    spec, _, resolved = generator.generate_specification_with_recovery("A: hi\nB: hello", SPEC_PROMPT,
+                                                                       base_dir=str(tmp_path), dialog_id="d1")
+    assert spec == FAKE_SPEC and resolved == tier
+    assert generator.recovery_stats[tier] == 1
+    assert not (tmp_path / "specifications_failed").exists()
+
+
+def test_failed_spec_keeps_the_last_raw_output(generator, tmp_path):
+    scripted(generator, [BROKEN, "still not json"])
+    spec, raw, tier = generator.generate_specification_with_recovery("A: hi\nB: hello", SPEC_PROMPT,
+                                                                     base_dir=str(tmp_path), dialog_id="d1")
+    assert spec is None and tier == "failed" and raw == "still not json"
+    assert (tmp_path / "specifications_failed" / "d1_raw_output.txt").read_text() == "still not json"
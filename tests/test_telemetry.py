@@ -0,0 +1,51 @@
+from telemetry import RunLog, new_call, finish_call, read_events, summarize, percentile
+from llm_client import LLMClient
+from llm_cache import ResponseCache
+
+
+def event(stage="dialog", model="m", latency=None, **fields):
+    return dict(new_call(stage, model, "fake", variant="v1"), latency_s=latency, **fields)
+
+
+def test_percentile_is_nearest_rank():
+    values = list(range(1, 21))
+    assert (percentile(values, 50), percentile(values, 95), percentile(values, 100)) == (10, 19, 20)
+    assert percentile([], 50) is None
+
+
+def test_summary_per_stage_model_and_variant():
+    events = [event(latency=float(i), prompt_tokens=100, completion_tokens=10 * i, parse_ok=i != 3)
+              for i in range(1, 5)]
+    events += [event(cache_hit=True, prompt_tokens=999), event(error="Timeout", retries=2, rate_limit_wait_s=1.5)]
+    events.append(event(stage="evaluation", latency=0.5))
+    dialog, evaluation = summarize(events)
+    assert (dialog["stage"], dialog["model"], dialog["variant"]) == ("dialog", "m", "v1")
+    assert (dialog["events"], dialog["cache_hits"], dialog["errors"]) == (6, 1, 1)
+    # Los aciertos de caché no cuentan para latencias ni tokens
+    assert (dialog["latency_p50"], dialog["latency_p95"]) == (2.0, 4.0)
+    assert (dialog["prompt_tokens"], dialog["completion_tokens"], dialog["completion_tokens_p50"]) == (400, 100, 20)
+    assert (dialog["retries"], dialog["rate_limit_wait_s"], dialog["parse_ok"]) == (2, 1.5, "3/4")
+    assert evaluation["events"] == 1 and evaluation["parse_ok"] == ""
+    assert [row["model"] for row in summarize(events, by=["model"])] == ["m"]
+
+
+def test_events_are_written_once_and_filtered_by_run(tmp_path):
+    log = RunLog(str(tmp_path / "logs" / "calls.jsonl"))
+    call = new_call("dialog", "m", "fake")
+    finish_call(log, call, latency_s=0.1)
+    finish_call(log, call, latency_s=9.9)
+    finish_call(log, dict(new_call("dialog", "m", "fake"), run_id="other"))
+    events = list(read_events(log.path, run_id=call["run_id"]))
+    assert len(events) == 1 and events[0]["latency_s"] == 0.1
+    assert not any(key.startswith("_") for key in events[0])
+    assert len(list(read_events(log.path))) == 2
+
+
+def test_client_logs_one_event_per_call(tmp_path):
+    client = LLMClient(backend="fake", model_name="fake", cache=ResponseCache(str(tmp_path / "cache.sqlite")))
+    client.run_log = RunLog(str(tmp_path / "calls.jsonl"))
+    for _ in range(2):
+        client._complete("write a dialog", temperature=0)
+    client._complete_n("write a dialog", temperature=0.8, n=3, seed=1)
+    rows = summarize(read_events(client.run_log.path), by=["stage", "model", "n"])
+    assert [(r["n"], r["events"], r["cache_hits"]) for r in rows] == [(1, 2, 1), (3, 1, 0)]
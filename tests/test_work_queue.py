@@ -0,0 +1,134 @@
+import time
+import itertools
+import asyncio
+import pytest
+import experiment_matrix
+from work_queue import WorkQueue, PENDING, LEASED, DONE, DEAD
+
+
+@pytest.fixture
+def queue(tmp_path):
+    queue = WorkQueue(str(tmp_path / "queue.sqlite"), lease_seconds=0.2, max_attempts=2)
+    yield queue
+    queue.close()
+
+
+def test_enqueue_is_idempotent(queue):
+    assert queue.enqueue_many([("a", {"n": 1}), ("b", {"n": 2})]) == 2
+    assert queue.enqueue("a", {"n": 99}) == 0
+    leased = queue.lease("w1")
+    assert leased == {"id": "a", "payload": {"n": 1}, "attempt": 1}
+
+
+def test_leased_job_is_not_handed_out_twice(queue):
+    queue.enqueue("a", {})
+    assert queue.lease("w1")["id"] == "a"
+    assert queue.lease("w2") is None
+    assert queue.stats()[LEASED] == 1
+
+
+def test_lease_restricted_to_a_set_of_ids(queue):
+    queue.enqueue_many([("other", {}), ("mine", {})])
+    assert queue.lease("w1", {"mine"})["id"] == "mine"
+    assert queue.lease("w1", {"mine"}) is None
+    assert queue.stats({"mine"}) == {PENDING: 0, LEASED: 1, DONE: 0, DEAD: 0}
+    assert queue.stats()[PENDING] == 1
+
+
+def test_only_jobs_leaves_other_campaigns_pending(tmp_path, matrix_config):
+    queue_path = str(tmp_path / "queue.sqlite")
+    foreign = WorkQueue(queue_path)
+    foreign.enqueue("other-campaign", {"job": "not ours"})
+    foreign.close()
+    jobs = experiment_matrix.expand_matrix(matrix_config())
+    executor = experiment_matrix.MatrixExecutor(backend="fake", max_concurrency=1, cache=False)
+    rows = asyncio.run(experiment_matrix.arun_queue(executor, queue_path, jobs, only_jobs=True))
+    assert len(rows) == 1
+    queue = WorkQueue(queue_path)
+    assert queue.stats() == {PENDING: 1, LEASED: 0, DONE: 1, DEAD: 0}
+    queue.close()
+
+
+def test_expired_lease_is_taken_by_another_worker(queue):
+    queue.enqueue("a", {})
+    queue.lease("w1")
+    time.sleep(0.3)
+    leased = queue.lease("w2")
+    assert leased["id"] == "a" and leased["attempt"] == 2
+    # El worker original ya no puede renovar ni completar
+    assert not queue.heartbeat("a", "w1")
+    assert not queue.complete("a", "w1", {"ok": True})
+    assert queue.complete("a", "w2", {"ok": True})
+    assert queue.results() == {"a": {"ok": True}}
+
+
+def test_heartbeat_keeps_the_lease(queue):
+    queue.enqueue("a", {})
+    queue.lease("w1")
+    for _ in range(3):
+        time.sleep(0.1)
+        assert queue.heartbeat("a", "w1")
+    assert queue.lease("w2") is None
+
+
+def test_expired_lease_after_last_attempt_goes_to_dead_letters(queue):
+    queue.enqueue("a", {})
+    queue.lease("w1")
+    time.sleep(0.3)
+    queue.lease("w2")
+    time.sleep(0.3)
+    assert queue.lease("w3") is None
+    assert queue.dead_letters() == [{"id": "a", "attempts": 2, "error": "lease expired", "raw_output": None}]
+
+
+def test_fail_retries_then_dead_letters_with_raw_output(queue):
+    queue.enqueue("a", {})
+    queue.lease("w1")
+    assert queue.fail("a", "w1", "bad json", raw_output="{oops") == PENDING
+    queue.lease("w1")
+    assert queue.fail("a", "w1", "bad json again") == DEAD
+    assert queue.dead_letters()[0]["raw_output"] == "{oops"
+    assert queue.requeue_dead() == 1
+    assert queue.lease("w1")["attempt"] == 1
+
+
+def test_reopen_only_touches_done_jobs(queue):
+    queue.enqueue_many([("a", {}), ("b", {})])
+    queue.lease("w1")
+    queue.complete("a", "w1", {"ok": True})
+    assert queue.reopen(["a", "b", "missing"]) == 1
+    assert queue.stats() == {PENDING: 2, LEASED: 0, DONE: 0, DEAD: 0}
+
+
+def test_done_job_with_deleted_output_is_run_again(tmp_path, matrix_config):
+    jobs = experiment_matrix.expand_matrix(matrix_config(repetitions=2))
+    queue_path = str(tmp_path / "queue.sqlite")
+    counter = itertools.count()
+
+    def run():
+        executor = experiment_matrix.MatrixExecutor(backend="fake", max_concurrency=1, cache=False)
+        # Cada diálogo generado tiene un texto distinto
+        generator = executor._generator("fake")
+        default = generator.llm.responder
+        generator.llm.responder = lambda prompt: (f"P1: variant {next(counter)}\nP2: ok"
+                                                  if prompt.startswith("Write a dialog") else default(prompt))
+        rows = asyncio.run(experiment_matrix.arun_queue(executor, queue_path, jobs))
+        return executor.stats, rows
+
+    stats, rows = run()
+    assert stats["generated"] == 2 and stats["evaluated"] == 2 and len(rows) == 2
+
+    # Todo al día: nada se reabre ni se vuelve a llamar al modelo
+    stats, rows = run()
+    assert stats["generated"] == 0 and stats["evaluated"] == 0 and len(rows) == 2
+
+    jobs[0]["dialog_path"].unlink()
+    stats, rows = run()
+    assert jobs[0]["dialog_path"].exists()
+    # Diálogo regenerado con otro texto: sus notas ya no valen y se vuelve a evaluar
+    assert stats["generated"] == 1 and stats["evaluated"] == 1 and len(rows) == 2
+
+    jobs[1]["scores_path"].unlink()
+    stats, rows = run()
+    assert jobs[1]["scores_path"].exists()
+    assert stats["generated"] == 0 and stats["evaluated"] == 1 and len(rows) == 2